@@ -1,26 +1,37 @@
+import copy
 import re
+import time
 
 from flask import Flask, request, redirect, session, abort
 from flask_login import LoginManager
 from flask_wtf.csrf import CsrfProtect
 
-import dmapiclient
 from dmutils import init_app, flask_featureflags
 from dmutils.user import User
 
 from config import configs
-
-
-data_api_client = dmapiclient.DataAPIClient()
+from . import sessions, templating
+from .api_client import PooledDataAPIClient, RequestCachedAPIClient
+from .audit import audit_event_writer
+from .buckets import bucket_pool
+from .cache import TTLCache
+from .outbox import email_outbox
+from .single_flight import SingleFlight
+
+
+pooled_data_api_client = PooledDataAPIClient()
+# Data API reads made by several requests at once share one call
+data_api_flights = SingleFlight(share=copy.deepcopy)
+data_api_client = RequestCachedAPIClient(pooled_data_api_client, data_api_flights)
+# When the session was last refreshed, as a Unix timestamp
+SESSION_REFRESHED_AT_KEY = '_refreshed_at'
+# Users loaded for each session, kept for DM_USER_CACHE_TTL seconds so most requests don't ask the API for them
+user_cache = TTLCache(ttl=0)
 login_manager = LoginManager()
 feature_flags = flask_featureflags.FeatureFlag()
 csrf = CsrfProtect()
 
 
-from app.main.helpers.services import parse_document_upload_time
-from app.main.helpers.frameworks import question_references
-
-
 def create_app(config_name):
     application = Flask(__name__,
                         static_folder='static/',
@@ -33,8 +44,18 @@ def create_app(config_name):
         feature_flags=feature_flags,
         login_manager=login_manager,
     )
-
-    from .main import main as main_blueprint
+    templating.init_app(application)
+    email_outbox.init_app(application)
+    audit_event_writer.init_app(application, data_api_client)
+    bucket_pool.init_app(application)
+
+    from .main import main as main_blueprint, content_loader
+    from .main.helpers.communications import communications_cache
+    from .main.helpers.content import filtered_manifest_cache, filtered_message_cache
+    from .main.helpers.frameworks import question_references, framework_cache
+    from .main.helpers.services import parse_document_upload_time, signed_url_cache
+    from .main.helpers.uploads import reject_oversized_uploads
+    from .main.helpers.validation import declaration_state_cache
     from .status import status as status_blueprint
 
     application.register_blueprint(status_blueprint,
@@ -44,6 +65,19 @@ def create_app(config_name):
     login_manager.login_message_category = "must_login"
     main_blueprint.config = application.config.copy()
 
+    framework_cache.configure(ttl=application.config['DM_FRAMEWORK_CACHE_TTL'])
+    communications_cache.configure(ttl=application.config['DM_COMMUNICATIONS_CACHE_TTL'])
+    signed_url_cache.configure(ttl=application.config['DM_SIGNED_URL_CACHE_TTL'])
+    user_cache.configure(ttl=application.config['DM_USER_CACHE_TTL'], max_size=application.config['DM_USER_CACHE_SIZE'])
+    filtered_manifest_cache.configure(ttl=None, max_size=application.config['DM_FILTERED_MANIFEST_CACHE_SIZE'])
+    filtered_message_cache.configure(ttl=None, max_size=application.config['DM_FILTERED_MESSAGE_CACHE_SIZE'])
+    content_loader.reload_check_interval = application.config['DM_CONTENT_RELOAD_CHECK_INTERVAL']
+    declaration_state_cache.configure(ttl=application.config['DM_DECLARATION_STATE_CACHE_TTL'])
+    content_loader.preload(application.config['DM_PRELOAD_FRAMEWORK_CONTENT'])
+
+    sessions.init_app(application)
+    # registered before CSRF protection, which reads the whole request body
+    application.before_request(reject_oversized_uploads)
     csrf.init_app(application)
 
     @csrf.error_handler
@@ -68,8 +102,23 @@ def create_app(config_name):
 
     @application.before_request
     def refresh_session():
-        session.permanent = True
-        session.modified = True
+        """Keep sessions alive for PERMANENT_SESSION_LIFETIME after the user's last request.
+
+        Refreshing a session re-signs the cookie and sends it back, so sessions are only refreshed once
+        DM_SESSION_REFRESH_FRACTION of their lifetime has passed since the last refresh. A user is logged
+        out after being idle for between (1 - DM_SESSION_REFRESH_FRACTION) and 1 lifetimes. If it's 0 the
+        session is refreshed on every request.
+        """
+        if not session:
+            return
+        if not session.permanent:
+            session.permanent = True
+
+        now = int(time.time())
+        refresh_interval = (application.permanent_session_lifetime.total_seconds() *
+                            application.config['DM_SESSION_REFRESH_FRACTION'])
+        if now - session.get(SESSION_REFRESHED_AT_KEY, 0) >= refresh_interval:
+            session[SESSION_REFRESHED_AT_KEY] = now
 
     application.add_template_filter(question_references)
     application.add_template_filter(parse_document_upload_time)
@@ -79,7 +128,20 @@ def create_app(config_name):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.load_user(data_api_client, user_id)
+    """Load the logged in user, from `user_cache` if they were loaded recently.
+
+    Users who can't log in aren't cached. The cached `User` is shared by requests, so it mustn't be modified.
+
+    The cache belongs to this worker. Deactivating a user or creating one removes them from it, but other
+    workers, and changes made in other apps like locking an account, only see the change once the entry
+    expires, so a user can stay logged in for up to DM_USER_CACHE_TTL seconds after they're deactivated.
+    """
+    user = user_cache.get(int(user_id))
+    if user is None:
+        user = User.load_user(data_api_client, user_id)
+        if user is not None:
+            user_cache.set(int(user_id), user)
+    return user
 
 
 def config_attrs(config):
@@ -0,0 +1,371 @@
+import copy
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import g, has_request_context, current_app
+import dmapiclient
+from dmapiclient import APIError, DataAPIClient, HTTPError, InvalidResponse
+
+from .circuit_breaker import Bulkhead, CircuitBreaker
+
+try:
+    import urlparse
+except ImportError:
+    import urllib.parse as urlparse
+
+
+REQUEST_CACHE_ATTRIBUTE = '_data_api_request_cache'
+REQUEST_TIMINGS_ATTRIBUTE = '_data_api_request_timings'
+
+# The family of endpoints each Data API path belongs to, by the first part of the path. Each family has
+# its own circuit breaker and concurrency limit, and paths not listed here share the 'other' family's.
+ENDPOINT_FAMILIES = {
+    'frameworks': 'frameworks',
+    'services': 'services',
+    'draft-services': 'services',
+    'archived-services': 'services',
+    'briefs': 'briefs',
+    'brief-responses': 'briefs',
+    'users': 'users',
+    'suppliers': 'suppliers',
+}
+OTHER_ENDPOINTS = 'other'
+
+# dmutils sends the 'dmapiclient' logger's messages to the app's log handlers
+logger = logging.getLogger('dmapiclient.base')
+
+
+def get_request_api_timings():
+    """Return a list of (method name, duration in seconds, status) for each Data API call made for the request.
+
+    The status is 'ok', or the status code of the error the call raised.
+    """
+    if not has_request_context():
+        return []
+    if not hasattr(g, REQUEST_TIMINGS_ATTRIBUTE):
+        setattr(g, REQUEST_TIMINGS_ATTRIBUTE, [])
+    return getattr(g, REQUEST_TIMINGS_ATTRIBUTE)
+
+
+class RequestCachedAPIClient(object):
+    """Wraps a Data API client so that read-only calls are made at most once per request.
+
+    Calls to methods starting with one of `cached_method_prefixes`, and to the read-only methods
+    listed in `cached_methods`, are memoized on the method name and arguments for the life of the
+    current request. Calling any other public method may change data on the API, so it clears
+    everything cached for the request.
+
+    Cached responses are deep-copied on the way out, as views regularly modify the dictionaries
+    they get back from the API.
+
+    Each call that reaches the API is timed. Responses get a Server-Timing header with the total
+    time spent waiting for the API, and a warning is logged for requests that spent longer than
+    DM_API_SLOW_REQUEST_TIME seconds on API calls or made more than DM_API_SLOW_REQUEST_CALLS.
+
+    If it's given a `SingleFlight`, read-only calls that aren't cached for the request are shared with
+    other requests making the same call at the same time. Write calls stop later reads from sharing
+    calls that started before the write.
+    """
+    cached_method_prefixes = ('get_', 'find_')
+    cached_methods = ('is_supplier_eligible_for_brief',)
+    uncached_methods = ('init_app', 'get_status')
+
+    def __init__(self, client, flights=None):
+        self._client = client
+        self._flights = flights
+
+    def init_app(self, app):
+        self._client.init_app(app)
+        app.after_request(self._report_request_api_timings)
+        app.teardown_request(self._clear_request_cache)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or name in self.uncached_methods or not callable(attr):
+            return attr
+
+        if name.startswith(self.cached_method_prefixes) or name in self.cached_methods:
+            return self._cached(name, attr)
+
+        return self._invalidating(name, attr)
+
+    def _cached(self, name, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            cache = self._get_request_cache()
+            key = (name, args, tuple(sorted(kwargs.items())))
+            if cache is None or not _is_hashable(key):
+                return self._timed(name, method, args, kwargs)
+
+            if key not in cache:
+                result = self._timed(name, self._coalesced(key, method), args, kwargs)
+                cache[key] = copy.deepcopy(result)
+                return result
+
+            return copy.deepcopy(cache[key])
+
+        return wrapper
+
+    def _invalidating(self, name, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            self._clear_request_cache()
+            try:
+                return self._timed(name, method, args, kwargs)
+            finally:
+                self._clear_request_cache()
+                if self._flights is not None:
+                    self._flights.forget_all()
+
+        return wrapper
+
+    def _coalesced(self, key, method):
+        if self._flights is None:
+            return method
+        return lambda *args, **kwargs: self._flights.do(key, lambda: method(*args, **kwargs))
+
+    def _timed(self, name, method, args, kwargs):
+        status = 'ok'
+        start_time = time.time()
+        try:
+            return method(*args, **kwargs)
+        except APIError as e:
+            status = e.status_code
+            raise
+        finally:
+            get_request_api_timings().append((name, time.time() - start_time, status))
+
+    def _report_request_api_timings(self, response):
+        timings = get_request_api_timings()
+        if not timings:
+            return response
+
+        total_time = sum(duration for _, duration, _ in timings)
+        response.headers.add(
+            'Server-Timing', 'dataapi;dur={:.1f};desc="Data API ({} calls)"'.format(total_time * 1000, len(timings))
+        )
+
+        if (total_time > current_app.config['DM_API_SLOW_REQUEST_TIME'] or
+                len(timings) > current_app.config['DM_API_SLOW_REQUEST_CALLS']):
+            current_app.logger.warning(
+                "dataapi.slow_request: {api_call_count} calls took {api_time}s: {api_calls}",
+                extra={
+                    'api_call_count': len(timings),
+                    'api_time': round(total_time, 3),
+                    'api_calls': ", ".join(
+                        "{} {}s {}".format(name, round(duration, 3), status) for name, duration, status in timings
+                    ),
+                })
+
+        return response
+
+    def _get_request_cache(self):
+        if not has_request_context():
+            return None
+        if not hasattr(g, REQUEST_CACHE_ATTRIBUTE):
+            setattr(g, REQUEST_CACHE_ATTRIBUTE, {})
+        return getattr(g, REQUEST_CACHE_ATTRIBUTE)
+
+    def _clear_request_cache(self, exc=None):
+        if has_request_context() and hasattr(g, REQUEST_CACHE_ATTRIBUTE):
+            delattr(g, REQUEST_CACHE_ATTRIBUTE)
+
+
+class PooledDataAPIClient(DataAPIClient):
+    """A Data API client that keeps its connections to the API open and reuses them.
+
+    `DataAPIClient` makes each call with `requests.request`, which opens a new connection, with a new
+    TLS handshake, every time. This client makes calls through a `requests.Session` instead, created in
+    each worker the first time it's used, whose pool keeps up to DM_DATA_API_POOL_SIZE connections to
+    the API alive between calls. Calls made while all of them are busy open an extra connection, which
+    is closed afterwards, and are counted as saturated in `connection_stats`.
+
+    Calls time out if connecting takes longer than DM_DATA_API_CONNECT_TIMEOUT seconds, or if the API
+    doesn't respond for DM_DATA_API_READ_TIMEOUT seconds.
+
+    So that a slow or failing API doesn't tie up every worker thread, each family of endpoints (see
+    `ENDPOINT_FAMILIES`) has a circuit breaker and a bulkhead. Once DM_DATA_API_CIRCUIT_FAILURE_RATE of
+    the family's last DM_DATA_API_CIRCUIT_WINDOW calls have timed out or failed with a 5xx error, calls
+    to it fail straight away for DM_DATA_API_CIRCUIT_RESET_TIMEOUT seconds. No more than
+    DM_DATA_API_CONCURRENCY_LIMIT calls to a family are made at once, or DM_DATA_API_POOL_SIZE if that's
+    None. Calls over the limit wait up to DM_DATA_API_CONCURRENCY_TIMEOUT seconds for another call to the
+    family to finish before failing. Calls that fail raise `ServiceUnavailable`, which views show as a 503.
+
+    `_request` replaces dmapiclient's to send calls through the session. It was written against the
+    version of dmapiclient pinned in requirements.txt, and has to be checked when that changes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PooledDataAPIClient, self).__init__(*args, **kwargs)
+        self.pool_size = 10
+        self.timeouts = None
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._stats = {'calls': 0, 'in_flight': 0, 'peak_in_flight': 0, 'saturated': 0}
+        self._circuit_breakers = {family: CircuitBreaker(family) for family in _endpoint_family_names()}
+        self._bulkheads = {family: Bulkhead(family) for family in _endpoint_family_names()}
+
+    def init_app(self, app):
+        super(PooledDataAPIClient, self).init_app(app)
+        self.pool_size = app.config['DM_DATA_API_POOL_SIZE']
+        self.timeouts = (app.config['DM_DATA_API_CONNECT_TIMEOUT'], app.config['DM_DATA_API_READ_TIMEOUT'])
+        with self._lock:
+            self._session = None
+        self._circuit_breakers = {
+            family: CircuitBreaker(
+                family,
+                window=app.config['DM_DATA_API_CIRCUIT_WINDOW'],
+                minimum_calls=app.config['DM_DATA_API_CIRCUIT_MINIMUM_CALLS'],
+                failure_rate=app.config['DM_DATA_API_CIRCUIT_FAILURE_RATE'],
+                reset_timeout=app.config['DM_DATA_API_CIRCUIT_RESET_TIMEOUT'],
+                is_failure=_is_unavailable_error,
+            )
+            for family in _endpoint_family_names()
+        }
+        concurrency_limit = app.config['DM_DATA_API_CONCURRENCY_LIMIT']
+        if concurrency_limit is None:
+            concurrency_limit = self.pool_size
+        self._bulkheads = {
+            family: Bulkhead(family, concurrency_limit, timeout=app.config['DM_DATA_API_CONCURRENCY_TIMEOUT'])
+            for family in _endpoint_family_names()
+        }
+
+    def connection_stats(self):
+        """Counts of calls made through the pool, and of the connections it has opened and reused."""
+        with self._lock:
+            stats = dict(self._stats, pool_size=self.pool_size, connections_opened=0, connections_reused=0)
+            session = self._session
+
+        if session is not None:
+            pools = session.get_adapter('https://').poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    stats['connections_opened'] += pool.num_connections
+                    stats['connections_reused'] += pool.num_requests - pool.num_connections
+        return stats
+
+    def endpoint_stats(self):
+        """The state of each endpoint family's circuit breaker and bulkhead."""
+        return {
+            family: {
+                'circuit': self._circuit_breakers[family].stats(),
+                'bulkhead': self._bulkheads[family].stats(),
+            }
+            for family in _endpoint_family_names()
+        }
+
+    def _request(self, method, url, data=None, params=None):
+        if not self.enabled:
+            return None
+
+        family = _endpoint_family(url)
+        url = urlparse.urljoin(self.base_url, url)
+
+        logger.debug("API request {method} {url}",
+                     extra={'method': method, 'url': url})
+
+        headers = {
+            "Content-type": "application/json",
+            "Authorization": "Bearer {}".format(self.auth_token),
+            "User-agent": "DM-API-Client/{}".format(dmapiclient.__version__),
+        }
+        headers = self._add_request_id_header(headers)
+
+        with self._bulkheads[family], self._circuit_breakers[family].guard():
+            response = self._send(method, url, headers, data, params)
+
+        try:
+            return response.json()
+        except ValueError:
+            raise InvalidResponse(response, message="No JSON object could be decoded")
+
+    def _send(self, method, url, headers, data, params):
+        session = self._get_session()
+        self._start_call()
+        start_time = time.time()
+        try:
+            response = session.request(method, url, headers=headers, json=data, params=params, timeout=self.timeouts)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            api_error = HTTPError.create(e)
+            elapsed_time = time.time() - start_time
+            logger.log(
+                logging.INFO if api_error.status_code == 404 else logging.WARNING,
+                "API {api_method} request on {api_url} failed with {api_status} '{api_error}'",
+                extra={
+                    'api_method': method,
+                    'api_url': url,
+                    'api_status': api_error.status_code,
+                    'api_error': '{} raised {}'.format(api_error.message, str(e)),
+                    'api_time': elapsed_time,
+                })
+            raise api_error
+        else:
+            elapsed_time = time.time() - start_time
+            logger.info(
+                "API {api_method} request on {api_url} finished in {api_time}",
+                extra={
+                    'api_method': method,
+                    'api_url': url,
+                    'api_status': response.status_code,
+                    'api_time': elapsed_time,
+                })
+        finally:
+            self._end_call()
+
+        return response
+
+    def _get_session(self):
+        with self._lock:
+            # connections opened before the worker was forked are shared with the parent process
+            if self._session is None or self._pid != os.getpid():
+                self._session = self._create_session()
+                self._pid = os.getpid()
+            return self._session
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _start_call(self):
+        with self._lock:
+            if self._stats['in_flight'] >= self.pool_size:
+                self._stats['saturated'] += 1
+            self._stats['calls'] += 1
+            self._stats['in_flight'] += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._stats['in_flight'])
+
+    def _end_call(self):
+        with self._lock:
+            self._stats['in_flight'] -= 1
+
+
+def _endpoint_family(url):
+    first_part = urlparse.urlparse(url).path.lstrip('/').split('/', 1)[0]
+    return ENDPOINT_FAMILIES.get(first_part, OTHER_ENDPOINTS)
+
+
+def _endpoint_family_names():
+    return sorted(set(ENDPOINT_FAMILIES.values())) + [OTHER_ENDPOINTS]
+
+
+def _is_unavailable_error(exception):
+    return isinstance(exception, APIError) and exception.status_code >= 500
+
+
+def _is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
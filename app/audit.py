@@ -0,0 +1,196 @@
+import atexit
+import errno
+import json
+import os
+import threading
+import time
+import uuid
+
+from dmapiclient.audit import AuditTypes
+from six.moves import queue
+
+from .files import make_private_directory
+
+
+class AuditEventWriter(object):
+    """Creates audit events on the Data API from a background thread, so that requests don't wait for it.
+
+    `record` takes the same arguments as `create_audit_event`, with the Data API client to use first.
+    Events are held in a queue of up to DM_AUDIT_EVENT_QUEUE_SIZE events per worker, and a flusher
+    thread sends them in batches of up to DM_AUDIT_EVENT_BATCH_SIZE, at least every
+    DM_AUDIT_EVENT_FLUSH_INTERVAL seconds. The queue is flushed when the worker exits.
+
+    Events that can't be sent, or that don't fit in the queue, are written to DM_AUDIT_EVENT_SPILL_DIR
+    and sent once the API is creating events again. Without a spill directory they're created during
+    the request instead. Spilled events hold users' email addresses and are sent with the app's API
+    token, so only the app's user may have access to the directory.
+
+    If DM_AUDIT_EVENT_QUEUE_SIZE is 0, events are created during the request and errors from the API
+    are raised to the caller, as they were before.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._data_api_client = None
+        self._queue = None
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._flush_at_exit = False
+        self._stats = {'recorded': 0, 'sent': 0, 'spilled': 0, 'batches': 0}
+
+    def init_app(self, app, data_api_client):
+        self._app = app
+        self._data_api_client = data_api_client
+        self.batch_size = app.config['DM_AUDIT_EVENT_BATCH_SIZE']
+        self.flush_interval = app.config['DM_AUDIT_EVENT_FLUSH_INTERVAL']
+        self.spill_directory = app.config['DM_AUDIT_EVENT_SPILL_DIR']
+
+        queue_size = app.config['DM_AUDIT_EVENT_QUEUE_SIZE']
+        self._queue = queue.Queue(queue_size) if queue_size else None
+
+        if self.spill_directory:
+            make_private_directory(self.spill_directory)
+            for folder in ['tmp', 'events']:
+                make_private_directory(os.path.join(self.spill_directory, folder))
+        if self._queue is not None and not self._flush_at_exit:
+            # apps are created more than once in a worker, such as in tests, but only need flushing once
+            atexit.register(self.flush)
+            self._flush_at_exit = True
+
+    def record(self, data_api_client, **event):
+        if self._queue is None:
+            return data_api_client.create_audit_event(**event)
+
+        self._count('recorded')
+        try:
+            self._queue.put_nowait((data_api_client, event))
+        except queue.Full:
+            self._spill_or_create(data_api_client, event)
+        self._start_flusher()
+
+    def flush(self):
+        """Send every queued event now. Returns how many were sent."""
+        sent = 0
+        if self._queue is None:
+            return sent
+        with self._app.app_context():
+            while True:
+                batch = self._take_batch(block=False)
+                if not batch:
+                    return sent
+                sent += self._send_batch(batch)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        if self._queue is not None:
+            stats['queued'] = self._queue.qsize()
+        if self.spill_directory:
+            stats['spilled_pending'] = len(os.listdir(os.path.join(self.spill_directory, 'events')))
+        return stats
+
+    def _count(self, stat, count=1):
+        with self._lock:
+            self._stats[stat] += count
+
+    def _start_flusher(self):
+        # the thread is started on first use so that each gunicorn worker starts its own after forking
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run_flusher, name='audit-event-flusher')
+                self._flusher.daemon = True
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            batch = self._take_batch(block=True)
+            try:
+                with self._app.app_context():
+                    if batch:
+                        self._send_batch(batch)
+                    if self.spill_directory:
+                        self._send_spilled()
+            except Exception as e:
+                self._app.logger.error("auditevents.flusher_error: {error}", extra={'error': str(e)})
+
+    def _take_batch(self, block):
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _send_batch(self, batch):
+        sent = 0
+        for index, (data_api_client, event) in enumerate(batch):
+            try:
+                data_api_client.create_audit_event(**event)
+                sent += 1
+            except Exception as e:
+                self._app.logger.error(
+                    "auditevents.create_failed: {count} audit events not created: {error}",
+                    extra={'count': len(batch) - index, 'error': str(e)}
+                )
+                # the API is failing, so the rest of the batch is kept to try again later
+                for data_api_client, event in batch[index:]:
+                    self._spill_or_create(data_api_client, event, create=False)
+                break
+
+        self._count('sent', sent)
+        self._count('batches')
+        return sent
+
+    def _spill_or_create(self, data_api_client, event, create=True):
+        if self.spill_directory:
+            self._spill(event)
+        elif create:
+            data_api_client.create_audit_event(**event)
+            self._count('sent')
+        else:
+            self._app.logger.error(
+                "auditevents.lost: {audit_type} audit event for {object_type} {object_id} was not created",
+                extra={
+                    'audit_type': event['audit_type'].value,
+                    'object_type': event.get('object_type'),
+                    'object_id': event.get('object_id'),
+                }
+            )
+
+    def _spill(self, event):
+        filename = '{:017.6f}-{}.json'.format(time.time(), uuid.uuid4().hex)
+        temp_path = os.path.join(self.spill_directory, 'tmp', filename)
+        with open(temp_path, 'w') as f:
+            json.dump(dict(event, audit_type=event['audit_type'].value), f)
+        os.rename(temp_path, os.path.join(self.spill_directory, 'events', filename))
+        self._count('spilled')
+
+    def _send_spilled(self):
+        events_folder = os.path.join(self.spill_directory, 'events')
+        for filename in sorted(os.listdir(events_folder))[:self.batch_size]:
+            # claim the event, so that workers sharing the directory don't both send it
+            claimed_path = os.path.join(self.spill_directory, 'tmp', filename)
+            try:
+                os.rename(os.path.join(events_folder, filename), claimed_path)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    continue
+                raise
+
+            try:
+                with open(claimed_path) as f:
+                    event = json.load(f)
+                event['audit_type'] = AuditTypes(event['audit_type'])
+                self._data_api_client.create_audit_event(**event)
+            except Exception:
+                os.rename(claimed_path, os.path.join(events_folder, filename))
+                raise
+            os.remove(claimed_path)
+            self._count('sent')
+
+
+audit_event_writer = AuditEventWriter()
+record_audit_event = audit_event_writer.record
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import defaultdict
+
+from dmutils import s3
+from flask import g, has_request_context
+
+REQUEST_BUCKETS_ATTRIBUTE = '_s3_buckets'
+
+
+class BucketPool(object):
+    """Long-lived `dmutils.s3.S3` bucket clients, reused by the requests each worker handles.
+
+    Creating an S3 object opens a new connection to S3. Each connection keeps its HTTP connections
+    alive between calls, so reusing clients saves a TCP and TLS handshake on most S3 calls.
+
+    `get` checks a client out for the rest of the request, so a client is only used by one thread at
+    a time and repeated calls in a request get the same client. Clients are returned to the pool when
+    the request ends. Up to DM_S3_POOL_SIZE idle clients are kept for each bucket, and extra ones are
+    closed. If DM_S3_POOL_SIZE is 0, a new client is created every time, as before.
+    """
+
+    def __init__(self):
+        self.pool_size = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def init_app(self, app):
+        self.pool_size = app.config['DM_S3_POOL_SIZE']
+        self._reset()
+        app.teardown_request(self._release_request_buckets)
+
+    def get(self, bucket_name):
+        if not self.pool_size or not has_request_context():
+            self._count('created')
+            return s3.S3(bucket_name)
+
+        request_buckets = getattr(g, REQUEST_BUCKETS_ATTRIBUTE, None)
+        if request_buckets is None:
+            request_buckets = {}
+            setattr(g, REQUEST_BUCKETS_ATTRIBUTE, request_buckets)
+        if bucket_name not in request_buckets:
+            request_buckets[bucket_name] = self._check_out(bucket_name)
+        return request_buckets[bucket_name]
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                idle=sum(len(clients) for clients in self._idle.values()),
+                pool_size=self.pool_size,
+            )
+
+    def _check_out(self, bucket_name):
+        with self._lock:
+            if self._pid != os.getpid():
+                # clients created before the worker was forked share their connections with the parent process
+                self._idle.clear()
+                self._pid = os.getpid()
+            idle = self._idle[bucket_name]
+            if idle:
+                self._stats['reused'] += 1
+                self._stats['in_use'] += 1
+                return idle.pop()
+
+        bucket = s3.S3(bucket_name)
+        with self._lock:
+            self._stats['created'] += 1
+            self._stats['in_use'] += 1
+        return bucket
+
+    def _check_in(self, bucket_name, bucket):
+        with self._lock:
+            self._stats['in_use'] -= 1
+            idle = self._idle[bucket_name]
+            if len(idle) < self.pool_size:
+                idle.append(bucket)
+                return
+            self._stats['discarded'] += 1
+        bucket.bucket.connection.close()
+
+    def _release_request_buckets(self, exc=None):
+        request_buckets = getattr(g, REQUEST_BUCKETS_ATTRIBUTE, None)
+        if not request_buckets:
+            return
+        delattr(g, REQUEST_BUCKETS_ATTRIBUTE)
+        for bucket_name, bucket in request_buckets.items():
+            self._check_in(bucket_name, bucket)
+
+    def _reset(self):
+        with self._lock:
+            self._pid = os.getpid()
+            self._idle = defaultdict(list)
+            self._stats = {'created': 0, 'reused': 0, 'discarded': 0, 'in_use': 0}
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+
+bucket_pool = BucketPool()
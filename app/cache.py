@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """A thread-safe, size-bounded cache whose entries expire `ttl` seconds after they were set.
+
+    When the cache is full the least recently used entry is evicted. A `ttl` of None means entries
+    never expire and a `ttl` of 0 turns the cache off, so every lookup is a miss.
+    """
+
+    def __init__(self, ttl=None, max_size=1000, clock=time.time):
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self.configure(ttl, max_size)
+
+    def configure(self, ttl=None, max_size=1000):
+        with self._lock:
+            self.ttl = ttl
+            self.max_size = max_size
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl != 0 and self.max_size > 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or self._has_expired(entry):
+                self.misses += 1
+                return default
+
+            # re-insert the entry to mark it as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._entries[key] = (value, self._clock())
+
+    def get_or_set(self, key, load):
+        """Return the cached value for `key`, calling `load()` to fetch and cache it on a miss.
+
+        `load` is called without holding the cache lock, so a slow load doesn't block other keys.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': float(self.hits) / lookups if lookups else None,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _has_expired(self, entry):
+        return self.ttl is not None and self._clock() - entry[1] >= self.ttl
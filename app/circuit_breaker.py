@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dmapiclient import APIError
+
+# dmutils sends the 'dmapiclient' logger's messages to the app's log handlers
+logger = logging.getLogger('dmapiclient.circuit_breaker')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ServiceUnavailable(APIError):
+    """Raised instead of making a call that a circuit breaker or bulkhead has turned away.
+
+    It's an `APIError` with a 503 status code, so views handle it like the API being unavailable
+    and show the 503 page straight away.
+    """
+    status_code = 503
+
+    def __init__(self, message):
+        super(ServiceUnavailable, self).__init__(None, message)
+
+
+class CircuitBreaker(object):
+    """Stops making calls for a while once too many of the recent ones have failed.
+
+    The breaker keeps the outcomes of the last `window` calls. Once at least `minimum_calls` of them
+    have been made and `failure_rate` or more of them failed, the breaker opens and calls are turned
+    away with `ServiceUnavailable` for `reset_timeout` seconds. After that one call is let through
+    as a probe. If it succeeds the breaker closes again, and if it fails the breaker stays open for
+    another `reset_timeout` seconds.
+
+    `is_failure(exception)` says whether an exception raised by a call counts as a failure. A
+    `window` of 0 turns the breaker off.
+    """
+
+    def __init__(self, name, window=0, minimum_calls=1, failure_rate=0.5, reset_timeout=30,
+                 is_failure=None, clock=time.time):
+        self.name = name
+        self.window = window
+        self.minimum_calls = min(minimum_calls, window)
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda exception: True)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probing = False
+        self._stats = {'calls': 0, 'rejected': 0, 'opened': 0}
+
+    @contextmanager
+    def guard(self):
+        """Run the `with` block as a call through the breaker, or raise `ServiceUnavailable`."""
+        probe = self._allow()
+        try:
+            yield
+        except BaseException as e:
+            self._record(self.is_failure(e), probe)
+            raise
+        else:
+            self._record(False, probe)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                state=self._state,
+                recent_calls=len(self._outcomes),
+                recent_failures=sum(self._outcomes),
+            )
+
+    def _allow(self):
+        """Count a call, returning whether it's the probe, or raise `ServiceUnavailable`."""
+        if not self.window:
+            return False
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            probe = self._state == HALF_OPEN and not self._probing
+            if self._state != CLOSED and not probe:
+                self._stats['rejected'] += 1
+                raise ServiceUnavailable("{} circuit is open".format(self.name))
+            self._probing = self._probing or probe
+            self._stats['calls'] += 1
+            return probe
+
+    def _record(self, failed, probe):
+        if not self.window:
+            return
+        with self._lock:
+            if probe:
+                self._probing = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    logger.info("{circuit} circuit closed", extra={'circuit': self.name})
+            elif self._state == CLOSED:
+                # calls finishing while the breaker is open or half open started before it opened, so are ignored
+                self._outcomes.append(failed)
+                if (len(self._outcomes) >= self.minimum_calls and
+                        sum(self._outcomes) >= self.failure_rate * len(self._outcomes)):
+                    self._open()
+
+    def _open(self):
+        logger.warning(
+            "{circuit} circuit opened after {circuit_failures} of {circuit_calls} calls failed",
+            extra={
+                'circuit': self.name,
+                'circuit_failures': sum(self._outcomes),
+                'circuit_calls': len(self._outcomes),
+            })
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self._stats['opened'] += 1
+
+
+class Bulkhead(object):
+    """Limits how many calls can be made at once, so a slow service can't tie up every thread.
+
+    Use it as a context manager around each call. Calls made while `limit` calls are already in
+    progress wait up to `timeout` seconds for one of them to finish, and raise `ServiceUnavailable`
+    if none does. A `limit` of 0 means calls aren't limited.
+    """
+
+    def __init__(self, name, limit=0, timeout=0, clock=time.time):
+        self.name = name
+        self.limit = limit
+        self.timeout = timeout
+        self._clock = clock
+        self._condition = threading.Condition(threading.Lock())
+        self._stats = {'in_use': 0, 'waited': 0, 'rejected': 0}
+
+    def __enter__(self):
+        with self._condition:
+            if self.limit and self._stats['in_use'] >= self.limit:
+                self._wait_for_a_free_slot()
+            self._stats['in_use'] += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._condition:
+            self._stats['in_use'] -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats, limit=self.limit)
+
+    def _wait_for_a_free_slot(self):
+        if self.timeout:
+            self._stats['waited'] += 1
+        deadline = self._clock() + self.timeout
+        while self._stats['in_use'] >= self.limit:
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                self._stats['rejected'] += 1
+                raise ServiceUnavailable("{} bulkhead is full".format(self.name))
+            self._condition.wait(remaining)
@@ -0,0 +1,31 @@
+import errno
+import os
+import stat
+
+
+def make_private_directory(directory):
+    """Create `directory` if it doesn't exist, so that only the app's user can access it.
+
+    Directories the app keeps data or code in mustn't be readable or writable by other users of the
+    machine, who could otherwise read what's in them or plant files for the app to use. An existing
+    directory is made private, and is refused with a `RuntimeError` if it isn't a directory belonging
+    to the app's user.
+    """
+    try:
+        os.makedirs(directory, stat.S_IRWXU)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    if not hasattr(os, 'getuid'):
+        return
+    try:
+        os.chmod(directory, stat.S_IRWXU)
+    except OSError:
+        pass
+    directory_stat = os.lstat(directory)
+    if (directory_stat.st_uid != os.getuid() or not stat.S_ISDIR(directory_stat.st_mode) or
+            stat.S_IMODE(directory_stat.st_mode) != stat.S_IRWXU):
+        raise RuntimeError(
+            "{} must be a directory that only its owner, the app's user, can access".format(directory)
+        )
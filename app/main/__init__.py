@@ -1,42 +1,45 @@
 from flask import Blueprint
-from dmcontent.content_loader import ContentLoader
+
+from .helpers.content import LazyContentLoader
 
 main = Blueprint('main', __name__)
 
-content_loader = ContentLoader('app/content')
-content_loader.load_manifest('g-cloud-6', 'services', 'edit_service')
-content_loader.load_messages('g-cloud-6', ['dates', 'urls'])
-
-content_loader.load_manifest('g-cloud-7', 'services', 'edit_service')
-content_loader.load_manifest('g-cloud-7', 'services', 'edit_submission')
-content_loader.load_manifest('g-cloud-7', 'declaration', 'declaration')
-content_loader.load_messages('g-cloud-7', ['dates', 'urls'])
-
-content_loader.load_manifest('digital-outcomes-and-specialists', 'declaration', 'declaration')
-content_loader.load_manifest('digital-outcomes-and-specialists', 'services', 'edit_submission')
-content_loader.load_manifest('digital-outcomes-and-specialists', 'briefs', 'edit_brief')
-content_loader.load_manifest('digital-outcomes-and-specialists', 'brief-responses', 'legacy_edit_brief_response')
-content_loader.load_manifest('digital-outcomes-and-specialists', 'brief-responses', 'edit_brief_response')
-content_loader.load_manifest('digital-outcomes-and-specialists', 'brief-responses', 'legacy_display_brief_response')
-content_loader.load_manifest('digital-outcomes-and-specialists', 'brief-responses', 'display_brief_response')
-content_loader.load_messages('digital-outcomes-and-specialists', ['dates', 'urls'])
-
-content_loader.load_manifest('digital-outcomes-and-specialists-2', 'declaration', 'declaration')
-content_loader.load_manifest('digital-outcomes-and-specialists-2', 'services', 'edit_submission')
-content_loader.load_manifest('digital-outcomes-and-specialists-2', 'briefs', 'edit_brief')
-content_loader.load_manifest('digital-outcomes-and-specialists-2', 'brief-responses', 'edit_brief_response')
-content_loader.load_manifest('digital-outcomes-and-specialists-2', 'brief-responses', 'display_brief_response')
-content_loader.load_messages('digital-outcomes-and-specialists-2', ['dates', 'urls'])
-
-content_loader.load_manifest('g-cloud-8', 'services', 'edit_service')
-content_loader.load_manifest('g-cloud-8', 'services', 'edit_submission')
-content_loader.load_manifest('g-cloud-8', 'declaration', 'declaration')
-content_loader.load_messages('g-cloud-8', ['dates', 'urls'])
-
-content_loader.load_manifest('g-cloud-9', 'services', 'edit_service')
-content_loader.load_manifest('g-cloud-9', 'services', 'edit_submission')
-content_loader.load_manifest('g-cloud-9', 'declaration', 'declaration')
-content_loader.load_messages('g-cloud-9', ['dates', 'urls'])
+# Content is loaded the first time it's used, or when the app is created for frameworks in
+# DM_PRELOAD_FRAMEWORK_CONTENT
+content_loader = LazyContentLoader('app/content')
+content_loader.declare_manifest('g-cloud-6', 'services', 'edit_service')
+content_loader.declare_messages('g-cloud-6', ['dates', 'urls'])
+
+content_loader.declare_manifest('g-cloud-7', 'services', 'edit_service')
+content_loader.declare_manifest('g-cloud-7', 'services', 'edit_submission')
+content_loader.declare_manifest('g-cloud-7', 'declaration', 'declaration')
+content_loader.declare_messages('g-cloud-7', ['dates', 'urls'])
+
+content_loader.declare_manifest('digital-outcomes-and-specialists', 'declaration', 'declaration')
+content_loader.declare_manifest('digital-outcomes-and-specialists', 'services', 'edit_submission')
+content_loader.declare_manifest('digital-outcomes-and-specialists', 'briefs', 'edit_brief')
+content_loader.declare_manifest('digital-outcomes-and-specialists', 'brief-responses', 'legacy_edit_brief_response')
+content_loader.declare_manifest('digital-outcomes-and-specialists', 'brief-responses', 'edit_brief_response')
+content_loader.declare_manifest('digital-outcomes-and-specialists', 'brief-responses', 'legacy_display_brief_response')
+content_loader.declare_manifest('digital-outcomes-and-specialists', 'brief-responses', 'display_brief_response')
+content_loader.declare_messages('digital-outcomes-and-specialists', ['dates', 'urls'])
+
+content_loader.declare_manifest('digital-outcomes-and-specialists-2', 'declaration', 'declaration')
+content_loader.declare_manifest('digital-outcomes-and-specialists-2', 'services', 'edit_submission')
+content_loader.declare_manifest('digital-outcomes-and-specialists-2', 'briefs', 'edit_brief')
+content_loader.declare_manifest('digital-outcomes-and-specialists-2', 'brief-responses', 'edit_brief_response')
+content_loader.declare_manifest('digital-outcomes-and-specialists-2', 'brief-responses', 'display_brief_response')
+content_loader.declare_messages('digital-outcomes-and-specialists-2', ['dates', 'urls'])
+
+content_loader.declare_manifest('g-cloud-8', 'services', 'edit_service')
+content_loader.declare_manifest('g-cloud-8', 'services', 'edit_submission')
+content_loader.declare_manifest('g-cloud-8', 'declaration', 'declaration')
+content_loader.declare_messages('g-cloud-8', ['dates', 'urls'])
+
+content_loader.declare_manifest('g-cloud-9', 'services', 'edit_service')
+content_loader.declare_manifest('g-cloud-9', 'services', 'edit_submission')
+content_loader.declare_manifest('g-cloud-9', 'declaration', 'declaration')
+content_loader.declare_messages('g-cloud-9', ['dates', 'urls'])
 
 
 @main.after_request
@@ -37,6 +37,11 @@ def page_not_found(e):
     return _render_error_page(404)
 
 
+@main.app_errorhandler(413)
+def request_entity_too_large(e):
+    return _render_error_page(413)
+
+
 @main.app_errorhandler(500)
 def internal_server_error(e):
     return _render_error_page(500)
@@ -51,6 +56,7 @@ def _render_error_page(status_code):
     template_map = {
         400: "errors/500.html",
         404: "errors/404.html",
+        413: "errors/413.html",
         500: "errors/500.html",
         503: "errors/500.html",
     }
@@ -0,0 +1,58 @@
+from flask import current_app
+
+from ...buckets import bucket_pool
+from ...cache import TTLCache
+from ...single_flight import SingleFlight
+
+# Listings of each framework's communications files, cached for DM_COMMUNICATIONS_CACHE_TTL seconds
+communications_cache = TTLCache(ttl=0)
+# Listings that miss the cache at the same time share one call to S3
+communications_listings = SingleFlight()
+
+
+class CommunicationsIndex(object):
+    """The files in a framework's communications bucket folder, indexed by file and folder path.
+
+    `key_list` is the listing from the communications bucket, oldest file first. Looking up a
+    folder gives the last modified time of the newest file anywhere inside it.
+    """
+
+    def __init__(self, framework_slug, key_list):
+        self.framework_slug = framework_slug
+        self._files = key_list
+        self._last_modified = {}
+
+        for key in key_list:
+            path = key['path']
+            self._last_modified[path] = key['last_modified']
+            folder_end = path.find('/')
+            while folder_end != -1:
+                self._last_modified[path[:folder_end + 1]] = key['last_modified']
+                folder_end = path.find('/', folder_end + 1)
+
+    def last_modified(self, path):
+        """Return the last modified time of a file, or of the newest file in a folder ending with '/'.
+
+        :param path: the file or folder path, relative to the framework's folder
+        :return: the timestamp, or None if there's no such file or folder
+        """
+        return self._last_modified.get('{}/{}'.format(self.framework_slug, path))
+
+    def files_in(self, folder):
+        """Return copies of the file keys inside `folder`, relative to the framework's folder, in listing order."""
+        path_starts_with = '{}/{}'.format(self.framework_slug, folder)
+        return [dict(key) for key in self._files if key['path'].startswith(path_starts_with)]
+
+
+def get_communications_index(framework_slug):
+    return communications_cache.get_or_set(
+        framework_slug,
+        lambda: communications_listings.do(framework_slug, lambda: _list_communications(framework_slug))
+    )
+
+
+def _list_communications(framework_slug):
+    return CommunicationsIndex(
+        framework_slug,
+        bucket_pool.get(current_app.config['DM_COMMUNICATIONS_BUCKET']).list(framework_slug, load_timestamps=True)
+    )
@@ -0,0 +1,55 @@
+import threading
+from multiprocessing.pool import ThreadPool
+
+from flask import current_app, request, g
+from flask_login import current_user
+
+from ...api_client import REQUEST_TIMINGS_ATTRIBUTE, get_request_api_timings
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_worker = threading.local()
+
+
+def _get_pool(size):
+    # The pool is created on first use so that each gunicorn worker gets its own threads after forking
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(size)
+        return _pool
+
+
+def fetch_concurrently(*calls):
+    """Run independent calls (eg to the Data API or S3) at the same time and return their results in order.
+
+    Each call runs on a worker thread from a bounded, per-process pool, inside its own request context
+    with the current user already loaded, so helpers can use `current_user` and `abort()` as usual. An
+    exception raised by any call is re-raised here.
+
+    Calls run one after another if DM_API_FANOUT_POOL_SIZE is less than 2, or if this is already being
+    called from a pool thread (which could otherwise deadlock waiting for the pool).
+    """
+    pool_size = current_app.config['DM_API_FANOUT_POOL_SIZE']
+    if pool_size < 2 or len(calls) < 2 or getattr(_in_worker, 'active', False):
+        return [call() for call in calls]
+
+    app = current_app._get_current_object()
+    environ = dict(request.environ)
+    user = current_user._get_current_object()
+    api_timings = get_request_api_timings()
+
+    def run(call):
+        _in_worker.active = True
+        try:
+            with app.request_context(environ) as ctx:
+                ctx.user = user
+                # so that the Data API calls made by the worker are timed as part of this request
+                setattr(g, REQUEST_TIMINGS_ATTRIBUTE, api_timings)
+                return call()
+        finally:
+            _in_worker.active = False
+
+    pool = _get_pool(pool_size)
+    pending = [pool.apply_async(run, (call,)) for call in calls]
+    return [result.get() for result in pending]
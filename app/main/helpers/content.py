@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from dmcontent.content_loader import ContentLoader
+
+from ...cache import TTLCache
+
+# Filtered content manifests never go stale, so they're only evicted once DM_FILTERED_MANIFEST_CACHE_SIZE
+# more recently used ones are cached
+filtered_manifest_cache = TTLCache(ttl=None)
+# Messages filtered for a context, keyed on the version of their file as well, so they're filtered again when
+# the file changes. Old versions are evicted once DM_FILTERED_MESSAGE_CACHE_SIZE more recent ones are cached.
+filtered_message_cache = TTLCache(ttl=None)
+
+
+def get_filtered_manifest(content_loader, framework_slug, manifest_name, context):
+    """Return a manifest filtered for a service or draft, reusing earlier filters with the same answers.
+
+    Which questions are shown only depends on the context keys named in the manifest's `depends`
+    rules (usually just the lot), so the filtered manifest is cached on the values of those keys.
+    It's filtered with only those keys, so it holds none of the rest of the service's data and
+    can be shared by every request. It mustn't be modified.
+    """
+    filter_keys = filtered_manifest_cache.get_or_set(
+        (framework_slug, manifest_name),
+        lambda: _get_filter_keys(content_loader.get_manifest(framework_slug, manifest_name))
+    )
+    filter_context = {key: context[key] for key in filter_keys if key in context}
+
+    return filtered_manifest_cache.get_or_set(
+        (framework_slug, manifest_name, json.dumps(filter_context, sort_keys=True)),
+        lambda: content_loader.get_manifest(framework_slug, manifest_name).filter(filter_context)
+    )
+
+
+def get_filtered_message(content_loader, framework_slug, block, context):
+    """Return a block of messages filtered with `context`, loading the block when it's first used or has changed.
+
+    The block doesn't need to be declared up front. The filtered messages are cached, so they mustn't be modified.
+    """
+    version = content_loader.load_messages_if_changed(framework_slug, block)
+    return filtered_message_cache.get_or_set(
+        (framework_slug, block, version, json.dumps(context, sort_keys=True)),
+        lambda: content_loader.get_message(framework_slug, block).filter(context)
+    )
+
+
+def _get_filter_keys(manifest):
+    filter_keys = set()
+    questions = [question for section in manifest.sections for question in section.questions]
+    while questions:
+        question = questions.pop()
+        filter_keys.update(depends['on'] for depends in question.get('depends') or [])
+        questions.extend(getattr(question, 'questions', None) or [])
+
+    return frozenset(filter_keys)
+
+
+class LazyContentLoader(ContentLoader):
+    """A ContentLoader that loads each declared manifest and set of messages the first time it's used.
+
+    Manifests and messages are declared up front, the same way they'd be loaded by a ContentLoader,
+    but the YAML isn't read until a page needs it. Workers start faster, and frameworks that nobody
+    looks at any more are never loaded. `preload` loads everything declared for some frameworks
+    straight away.
+
+    Blocks of messages that aren't declared, like contract variations, can be loaded with
+    `load_messages_if_changed`, which loads them again if their file is changed.
+
+    `load_times` records how long each manifest and set of messages took to load, in seconds.
+    """
+    # How often, in seconds, `load_messages_if_changed` checks whether a block's file has changed
+    reload_check_interval = 0
+
+    def __init__(self, content_path):
+        super(LazyContentLoader, self).__init__(content_path)
+        self._lock = threading.RLock()
+        self._declared_manifests = defaultdict(dict)
+        self._declared_messages = defaultdict(list)
+        self._loaded = set()
+        # the modification time of each block loaded by `load_messages_if_changed`, and when it was checked
+        self._message_versions = {}
+        self.load_times = {}
+
+    def declare_manifest(self, framework_slug, question_set, manifest):
+        self._declared_manifests[framework_slug][manifest] = question_set
+
+    def declare_messages(self, framework_slug, blocks):
+        self._declared_messages[framework_slug].extend(blocks)
+
+    def declared_frameworks(self):
+        return sorted(set(self._declared_manifests) | set(self._declared_messages))
+
+    def preload(self, framework_slugs):
+        for framework_slug in framework_slugs:
+            for manifest in self._declared_manifests[framework_slug]:
+                self._load_declared_manifest(framework_slug, manifest)
+            self._load_declared_messages(framework_slug)
+
+    def get_manifest(self, framework_slug, manifest):
+        self._load_declared_manifest(framework_slug, manifest)
+        return super(LazyContentLoader, self).get_manifest(framework_slug, manifest)
+
+    def get_builder(self, framework_slug, manifest):
+        self._load_declared_manifest(framework_slug, manifest)
+        return super(LazyContentLoader, self).get_builder(framework_slug, manifest)
+
+    def get_question(self, framework_slug, question_set, question):
+        # questions are read when a manifest using their question set is loaded
+        for manifest, manifest_question_set in list(self._declared_manifests[framework_slug].items()):
+            if manifest_question_set == question_set:
+                self._load_declared_manifest(framework_slug, manifest)
+        return super(LazyContentLoader, self).get_question(framework_slug, question_set, question)
+
+    def get_message(self, framework_slug, block, key=None):
+        self._load_declared_messages(framework_slug)
+        return super(LazyContentLoader, self).get_message(framework_slug, block, key)
+
+    def load_messages_if_changed(self, framework_slug, block):
+        """Load a block of messages the first time it's used, and again if its file has been modified since.
+
+        The file is checked at most once every `reload_check_interval` seconds, so pages using the block
+        don't touch the disk on every request. Returns the modification time of the loaded file.
+        """
+        key = ('messages', framework_slug, block)
+        version, checked_at = self._message_versions.get(key, (None, None))
+        now = time.time()
+        if checked_at is not None and now - checked_at < self.reload_check_interval:
+            return version
+
+        modified_at = _get_modified_time(self._message_path(framework_slug, block))
+        with self._lock:
+            version, _ = self._message_versions.get(key, (None, None))
+            if modified_at is None or modified_at != version:
+                start_time = time.time()
+                self.load_messages(framework_slug, [block])
+                self.load_times[key] = time.time() - start_time
+            self._message_versions[key] = (modified_at, now)
+        return modified_at
+
+    def _load_declared_manifest(self, framework_slug, manifest):
+        question_set = self._declared_manifests.get(framework_slug, {}).get(manifest)
+        if question_set is not None:
+            self._load_once(
+                ('manifest', framework_slug, manifest), self.load_manifest, framework_slug, question_set, manifest
+            )
+
+    def _load_declared_messages(self, framework_slug):
+        blocks = self._declared_messages.get(framework_slug)
+        if blocks:
+            self._load_once(('messages', framework_slug), self.load_messages, framework_slug, blocks)
+
+    def _load_once(self, key, load, *args):
+        if key in self._loaded:
+            return
+        with self._lock:
+            if key not in self._loaded:
+                start_time = time.time()
+                load(*args)
+                self.load_times[key] = time.time() - start_time
+                self._loaded.add(key)
+
+
+def _get_modified_time(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
@@ -0,0 +1,116 @@
+import mimetypes
+import os
+import uuid
+from datetime import datetime
+
+from flask import current_app, render_template, request
+from dmutils.formats import DATETIME_FORMAT
+
+from .uploads import has_format, sniff_format
+
+# Files uploaded straight to S3 are put under this folder until they've been checked. Buckets need a
+# lifecycle rule that expires objects under it after a day, to remove uploads that are never completed
+STAGING_FOLDER = 'direct-uploads'
+# S3 replaces this in an uploaded object's key with the name of the file the user chose
+FILENAME_VARIABLE = '${filename}'
+
+
+class DirectUploadError(Exception):
+    """A file uploaded straight to S3 can't be used. `reason` is 'missing', 'format', 'size' or 'empty'."""
+
+    def __init__(self, reason):
+        super(DirectUploadError, self).__init__(reason)
+        self.reason = reason
+
+
+def staging_prefix(framework_slug, supplier_id):
+    return '{}/{}/{}/'.format(STAGING_FOLDER, framework_slug, supplier_id)
+
+
+def direct_upload_form(uploader, framework_slug, supplier_id, success_url):
+    """Return the `action` URL and hidden `fields` for a form that uploads a file straight to an S3 bucket.
+
+    The form is signed for a new folder under the supplier's staging prefix, only allows files up to
+    DM_MAX_UPLOAD_SIZE and expires after DM_DIRECT_UPLOAD_EXPIRY seconds. S3 redirects the browser to
+    `success_url` afterwards, adding `bucket`, `key` and `etag` query parameters. The page there posts
+    the key and etag back to the app, which passes them to `check_direct_upload` and `move_direct_upload`.
+    The file input has to be named 'file' and come last.
+    """
+    bucket = uploader.bucket
+    return bucket.connection.build_post_form_args(
+        bucket.name,
+        '{}{}/{}'.format(staging_prefix(framework_slug, supplier_id), uuid.uuid4().hex, FILENAME_VARIABLE),
+        expires_in=current_app.config['DM_DIRECT_UPLOAD_EXPIRY'],
+        acl='private',
+        success_action_redirect=success_url,
+        max_content_length=current_app.config['DM_MAX_UPLOAD_SIZE'] - 1,
+        http_method='https',
+    )
+
+
+def check_direct_upload(uploader, staging_key, etag, framework_slug, supplier_id, extensions):
+    """Check a file uploaded with a `direct_upload_form`, without downloading it.
+
+    `etag` is the one S3 gave the browser for the upload, so a file put there some other way isn't used.
+
+    :return: the name of the file the user uploaded
+    :raises DirectUploadError: if the file's missing, has changed or isn't valid. Invalid files are removed from S3.
+    """
+    if not staging_key or not staging_key.startswith(staging_prefix(framework_slug, supplier_id)):
+        raise DirectUploadError('missing')
+    key = uploader.bucket.get_key(staging_key)
+    if key is None or not etag or key.etag.strip('"') != etag.strip('"'):
+        raise DirectUploadError('missing')
+
+    filename = os.path.basename(staging_key)
+    error = None
+    if key.size == 0:
+        error = 'empty'
+    elif key.size >= current_app.config['DM_MAX_UPLOAD_SIZE']:
+        error = 'size'
+    else:
+        first_bytes = key.get_contents_as_string(headers={'Range': 'bytes=0-15'})
+        if not has_format(os.path.splitext(filename)[1].lower(), sniff_format(first_bytes), extensions):
+            error = 'format'
+
+    if error:
+        uploader.bucket.delete_key(staging_key)
+        raise DirectUploadError(error)
+    return filename
+
+
+def render_direct_upload_complete_page(framework, upload_url):
+    """Render the page S3 redirects to after an upload, with a form that posts the upload's key and etag back.
+
+    `upload_url` is the page to go back to to upload a different file.
+    """
+    staging_key = request.args.get('key', '')
+    return render_template(
+        "frameworks/direct_upload_complete.html",
+        framework=framework,
+        filename=os.path.basename(staging_key),
+        staging_key=staging_key,
+        etag=request.args.get('etag', ''),
+        upload_url=upload_url,
+    )
+
+
+def move_direct_upload(uploader, staging_key, etag, path, acl='private', download_filename=None,
+                       disposition_type='attachment'):
+    """Move a checked file from the staging folder to `path`, with the same headers `S3.save` would give it.
+
+    The file is copied inside the bucket, so it doesn't pass through the app. The copy only succeeds if the
+    file still has the `etag` it was checked with, so it can't be replaced between being checked and moved.
+    """
+    metadata = {
+        'Content-Type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+        'timestamp': datetime.utcnow().strftime(DATETIME_FORMAT),
+    }
+    if download_filename:
+        metadata['Content-Disposition'] = '{}; filename="{}"'.format(disposition_type, download_filename)
+
+    uploader.bucket.copy_key(path, uploader.bucket.name, staging_key, metadata=metadata, headers={
+        'x-amz-acl': acl,
+        'x-amz-copy-source-if-match': '"{}"'.format(etag.strip('"')),
+    })
+    uploader.bucket.delete_key(staging_key)
@@ -1,21 +1,59 @@
 # -*- coding: utf-8 -*-
+import copy
 import re
 
-from flask import abort
+from flask import abort, has_request_context, request
 from flask_login import current_user
 from dmapiclient import APIError
 
+from ...cache import TTLCache
+
+# Framework documents only change when an admin changes a framework, so they're cached across
+# requests. The TTL is set from DM_FRAMEWORK_CACHE_TTL when the app is created. `get_framework`
+# invalidates a framework whenever its status matters more than the time saved, so the TTL only
+# bounds how long other pages can show a framework's old details.
+framework_cache = TTLCache(ttl=0)
+
+
+def invalidate_framework_cache(framework_slug=None):
+    """Make the next lookup of a framework, or of every framework, fetch it from the API again."""
+    if framework_slug is None:
+        framework_cache.clear()
+    else:
+        framework_cache.invalidate(('framework', framework_slug))
+        framework_cache.invalidate(('frameworks',))
+
 
 def get_framework(client, framework_slug, allowed_statuses=None):
+    """Get a framework, from `framework_cache` if it was fetched recently, or abort with a 404 if it doesn't
+    have one of the `allowed_statuses`.
+
+    The framework is fetched from the API again, and the cache updated, for requests that change data, so
+    that answers aren't saved to a framework that has just closed. It's also fetched again before turning
+    a request away, in case its status has just changed to an allowed one.
+    """
     if allowed_statuses is None:
         allowed_statuses = ['open', 'pending', 'standstill', 'live']
 
-    framework = client.get_framework(framework_slug)['frameworks']
+    def is_allowed(framework):
+        return not allowed_statuses or framework['status'] in allowed_statuses
+
+    key = ('framework', framework_slug)
+    missing = object()
+    changes_data = has_request_context() and request.method not in ('GET', 'HEAD')
+    framework = missing if changes_data else framework_cache.get(key, missing)
 
-    if allowed_statuses and framework['status'] not in allowed_statuses:
+    if framework is missing or not is_allowed(framework):
+        if framework is not missing or changes_data:
+            # the framework may have changed, so the list of frameworks is fetched again too
+            invalidate_framework_cache(framework_slug)
+        framework = client.get_framework(framework_slug)['frameworks']
+        framework_cache.set(key, framework)
+
+    if not is_allowed(framework):
         abort(404)
 
-    return framework
+    return copy.deepcopy(framework)
 
 
 def get_framework_and_lot(client, framework_slug, lot_slug, allowed_statuses=None):
@@ -23,8 +61,15 @@ def get_framework_and_lot(client, framework_slug, lot_slug, allowed_statuses=Non
     return framework, get_framework_lot(framework, lot_slug)
 
 
+def get_frameworks(client):
+    return copy.deepcopy(framework_cache.get_or_set(
+        ('frameworks',),
+        lambda: client.find_frameworks()['frameworks']
+    ))
+
+
 def frameworks_by_slug(client):
-    framework_list = client.find_frameworks().get("frameworks")
+    framework_list = get_frameworks(client)
     frameworks = {}
     for framework in framework_list:
         frameworks[framework['slug']] = framework
@@ -42,20 +87,6 @@ def register_interest_in_framework(client, framework_slug):
     client.register_framework_interest(current_user.supplier_id, framework_slug, current_user.email_address)
 
 
-def get_last_modified_from_first_matching_file(key_list, framework_slug, prefix):
-    """
-    Takes a list of file keys and a string.
-    Returns the 'last_modified' timestamp for first file whose path starts with the passed-in string,
-    or None if no matching file is found.
-
-    :param key_list: list of file keys (from an s3 bucket)
-    :param path_starts_with: check for file paths which start with this string
-    :return: the timestamp of the first matching file key or None
-    """
-    path_starts_with = '{}/{}'.format(framework_slug, prefix)
-    return next((key for key in key_list if key.get('path').startswith(path_starts_with)), {}).get('last_modified')
-
-
 def get_first_question_index(content, section):
     questions_so_far = 0
     ind = content.sections.index(section)
@@ -1,15 +1,27 @@
 import re
+from collections import OrderedDict
 from datetime import datetime
 from flask import abort, current_app
 from flask_login import current_user
 
 from dmapiclient import APIError
 
+from ...buckets import bucket_pool
+from ...cache import TTLCache
+from .content import get_filtered_manifest
+
 try:
     import urlparse
 except ImportError:
     import urllib.parse as urlparse
 
+# Signed document URLs, rewritten to the assets host, keyed by bucket and path. URLs are signed to be valid
+# for DM_SIGNED_URL_EXPIRY seconds and cached for DM_SIGNED_URL_CACHE_TTL seconds, which is shorter, so a
+# cached URL always has some time left on it when a user is redirected to it.
+signed_url_cache = TTLCache(ttl=0)
+# The last DM_ASSETS_URL seen and its parsed form, so it isn't parsed for every document
+_assets_url = (None, None)
+
 
 def get_drafts(apiclient, framework_slug):
     try:
@@ -47,16 +59,64 @@ def count_unanswered_questions(service_attributes):
     return unanswered_required, unanswered_optional
 
 
+def count_unanswered_questions_for_drafts(content_loader, framework_slug, drafts):
+    """Count the unanswered required and optional questions in each of a list of drafts.
+
+    Gives the same counts as `count_unanswered_questions` does for each draft's summary, but the
+    manifest is only filtered once for all the drafts it applies to, and each question is checked
+    against every draft in one pass rather than building a summary of the whole manifest per draft.
+
+    :return: a list of (unanswered required, unanswered optional) tuples, in the same order as `drafts`
+    """
+    counts = [[0, 0] for draft in drafts]
+
+    drafts_by_manifest = OrderedDict()
+    for index, draft in enumerate(drafts):
+        content = get_filtered_manifest(content_loader, framework_slug, 'edit_submission', draft)
+        drafts_by_manifest.setdefault(id(content), (content, []))[1].append(index)
+
+    for content, indexes in drafts_by_manifest.values():
+        for section in content.sections:
+            for question in section.questions:
+                for index in indexes:
+                    question_summary = question.summary(drafts[index])
+                    if question_summary.answer_required:
+                        counts[index][0] += 1
+                    elif question_summary.value in ['', [], None]:
+                        counts[index][1] += 1
+
+    return [tuple(count) for count in counts]
+
+
 def is_service_associated_with_supplier(service):
     return service.get('supplierId') == current_user.supplier_id
 
 
-def get_signed_document_url(uploader, document_path):
-    url = uploader.get_signed_url(document_path)
-    if url is not None:
+def get_signed_document_url(bucket_name, document_path):
+    """Return a signed URL on the assets host for a document in an S3 bucket, or None if it doesn't exist.
+
+    URLs are cached, so the bucket is only asked to sign one on a cache miss.
+    """
+    cache_key = (bucket_name, document_path)
+    url = signed_url_cache.get(cache_key)
+    if url is None:
+        url = bucket_pool.get(bucket_name).get_signed_url(
+            document_path, expires_in=current_app.config['DM_SIGNED_URL_EXPIRY']
+        )
+        if url is None:
+            return None
         url = urlparse.urlparse(url)
-        base_url = urlparse.urlparse(current_app.config['DM_ASSETS_URL'])
-        return url._replace(netloc=base_url.netloc, scheme=base_url.scheme).geturl()
+        base_url = _parse_assets_url(current_app.config['DM_ASSETS_URL'])
+        url = url._replace(netloc=base_url.netloc, scheme=base_url.scheme).geturl()
+        signed_url_cache.set(cache_key, url)
+    return url
+
+
+def _parse_assets_url(assets_url):
+    global _assets_url
+    if _assets_url[0] != assets_url:
+        _assets_url = (assets_url, urlparse.urlparse(assets_url))
+    return _assets_url[1]
 
 
 def parse_document_upload_time(data):
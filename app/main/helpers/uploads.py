@@ -0,0 +1,191 @@
+import hashlib
+import os
+import tempfile
+
+from flask import abort, current_app, request
+from dmcontent.content_loader import ContentNotFoundError
+from dmutils.documents import upload_document
+
+# Read from each upload at a time
+CHUNK_SIZE = 64 * 1024
+# Room left in a request's Content-Length for the multipart boundaries and other form fields
+MULTIPART_ALLOWANCE = 64 * 1024
+
+
+def _service_submission_file_count(view_args):
+    """The number of upload questions in the section of a service being edited, or None if there isn't one."""
+    from .. import content_loader
+
+    try:
+        manifest = content_loader.get_manifest(view_args.get('framework_slug'), 'edit_submission')
+    except ContentNotFoundError:
+        return None
+    section = manifest.get_section(view_args.get('section_id'))
+    if section is None:
+        return None
+    return len(section.get_question_ids(type="upload"))
+
+
+# How many files can be uploaded to each view that takes uploads, worked out from the view's arguments
+UPLOAD_FILE_COUNTS = {
+    'main.upload_framework_agreement': lambda view_args: 1,
+    'main.signature_upload': lambda view_args: 1,
+    'main.edit_service_submission': _service_submission_file_count,
+}
+
+DOCUMENT_EXTENSIONS = ('.pdf', '.pda', '.odt', '.ods', '.odp')
+SIGNATURE_PAGE_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png')
+
+# The first bytes of the formats suppliers upload, and the extensions those formats are uploaded with
+FILE_SIGNATURES = [
+    (b'%PDF', ('.pdf', '.pda')),
+    (b'\x89PNG\r\n\x1a\n', ('.png',)),
+    (b'\xff\xd8\xff', ('.jpg', '.jpeg')),
+    # OpenDocument files are zip archives
+    (b'PK\x03\x04', ('.odt', '.ods', '.odp')),
+]
+# Files with these extensions must start with their format's signature
+SIGNED_EXTENSIONS = frozenset(extension for _, extensions in FILE_SIGNATURES for extension in extensions)
+
+
+class Upload(object):
+    """An uploaded file that's been read once, with what we need to know to validate it.
+
+    The contents are spooled to a temporary file (kept in memory while they're smaller than
+    DM_UPLOAD_SPOOL_MEMORY_SIZE), so an `Upload` can be saved to S3 like the original file.
+    Files larger than DM_MAX_UPLOAD_SIZE aren't read past the limit, so `size` and `checksum`
+    are only complete if `too_large` is False.
+    """
+
+    def __init__(self, filename, spool):
+        self.filename = filename
+        self.extension = os.path.splitext(filename or '')[1].lower()
+        self.size = 0
+        self.checksum = None
+        self.too_large = False
+        # the extensions used for the format the file's contents start with, or None if it's not recognised
+        self.format_extensions = None
+        self._spool = spool
+
+    @property
+    def empty(self):
+        return self.size == 0
+
+    def has_format(self, extensions):
+        """Whether the file has one of `extensions`, and its contents are in that extension's format."""
+        return has_format(self.extension, self.format_extensions, extensions)
+
+    def read(self, *args):
+        return self._spool.read(*args)
+
+    def seek(self, *args):
+        return self._spool.seek(*args)
+
+    def tell(self):
+        return self._spool.tell()
+
+    def close(self):
+        self._spool.close()
+
+
+def read_upload(file_storage):
+    """Read an uploaded file once, sniffing its format, measuring it and spooling it as it's read."""
+    max_size = current_app.config['DM_MAX_UPLOAD_SIZE']
+    upload = Upload(
+        file_storage.filename,
+        tempfile.SpooledTemporaryFile(max_size=current_app.config['DM_UPLOAD_SPOOL_MEMORY_SIZE'])
+    )
+    checksum = hashlib.md5()
+
+    chunk = file_storage.read(CHUNK_SIZE)
+    upload.format_extensions = sniff_format(chunk)
+    while chunk:
+        upload.size += len(chunk)
+        if upload.size >= max_size:
+            upload.too_large = True
+            break
+        checksum.update(chunk)
+        upload._spool.write(chunk)
+        chunk = file_storage.read(CHUNK_SIZE)
+
+    upload.seek(0)
+    if not upload.too_large:
+        upload.checksum = checksum.hexdigest()
+        current_app.logger.info(
+            "upload.read: {filename} ({size} bytes, md5 {checksum})",
+            extra={'filename': upload.filename, 'size': upload.size, 'checksum': upload.checksum}
+        )
+    return upload
+
+
+def upload_request_too_large(file_count=1):
+    """Whether the request's Content-Length is too big for it to hold `file_count` files that aren't too large."""
+    max_size = current_app.config['DM_MAX_UPLOAD_SIZE'] * file_count + MULTIPART_ALLOWANCE
+    return request.content_length is not None and request.content_length > max_size
+
+
+def reject_oversized_uploads():
+    """Turn uploads away with a 413 if their Content-Length is too big for the files the view takes.
+
+    This is a `before_request` hook, registered before CSRF protection. That reads and parses the whole
+    form to find the CSRF token, so this is the last point at which an oversized body hasn't been read.
+    """
+    if request.method != 'POST' or request.endpoint not in UPLOAD_FILE_COUNTS:
+        return
+    file_count = UPLOAD_FILE_COUNTS[request.endpoint](request.view_args or {})
+    if file_count and upload_request_too_large(file_count):
+        abort(413)
+
+
+def upload_service_documents(uploader, documents_url, service, request_files, section, public=True):
+    """Validate and upload the files for a section's upload questions, reading each file once.
+
+    Returns the same as `dmutils.documents.upload_service_documents`: a dictionary of document
+    URLs for the uploaded files, and a dictionary of errors.
+    """
+    uploads = {}
+    for field in section.get_question_ids(type="upload"):
+        if field in request_files:
+            upload = read_upload(request_files[field])
+            if not upload.empty:
+                uploads[field] = upload
+
+    errors = {}
+    for field, upload in uploads.items():
+        if not upload.has_format(DOCUMENT_EXTENSIONS):
+            errors[field] = 'file_is_open_document_format'
+        elif upload.too_large:
+            errors[field] = 'file_is_less_than_5mb'
+
+    if errors:
+        return None, errors
+
+    urls = {}
+    for field, upload in uploads.items():
+        url = upload_document(uploader, documents_url, service, field, upload, public=public)
+        if not url:
+            errors[field] = 'file_can_be_saved'
+        else:
+            urls[field] = url
+
+    return urls, errors
+
+
+def sniff_format(first_bytes):
+    """Return the extensions used for the format a file's first bytes belong to, or None if it's not recognised."""
+    for signature, extensions in FILE_SIGNATURES:
+        if first_bytes.startswith(signature):
+            return extensions
+
+
+def has_format(extension, format_extensions, extensions):
+    """Whether `extension` is one of `extensions` and matches the format the file's contents were sniffed as.
+
+    Extensions with a known signature need the contents to start with it, so a file that's been
+    renamed to look like a PDF or OpenDocument file is turned away.
+    """
+    if extension not in extensions:
+        return False
+    if format_extensions is None:
+        return extension not in SIGNED_EXTENSIONS
+    return extension in format_extensions
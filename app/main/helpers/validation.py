@@ -1,10 +1,19 @@
-from functools import reduce
-from operator import add
 import re
+from collections import OrderedDict
+
 import six
 from werkzeug.datastructures import ImmutableOrderedMultiDict
 
+from ...cache import TTLCache
+
 EMAIL_REGEX = r'^[^@^\s]+@[^@^\.^\s]+(\.[^@^\.^\s]+)+$'
+EMAIL_PATTERN = re.compile(EMAIL_REGEX)
+
+# Compiled declaration schemas, keyed on the validator class and the content they were compiled from
+declaration_schema_cache = TTLCache(ttl=None, max_size=50)
+# The DeclarationState last worked out for each supplier's declaration, kept for DM_DECLARATION_STATE_CACHE_TTL
+# seconds so that saving a page only checks the sections it affects again
+declaration_state_cache = TTLCache(ttl=0)
 
 
 def get_validator(framework, content, answers):
@@ -18,6 +27,78 @@ def get_validator(framework, content, answers):
         return validator_cls(content, answers)
 
 
+class DeclarationSchema(object):
+    """Everything about a declaration manifest that a validator needs, worked out once.
+
+    Holds the question ids in the order they appear, the question ids in each section, the ids
+    of text questions, the questions that are required unless a validator says otherwise, the
+    compiled format patterns and, for each question, how to describe it and its validation messages.
+    """
+
+    def __init__(self, validator_cls, content):
+        self.fields = []
+        self.section_fields = OrderedDict()
+        self.field_sections = {}
+        self.text_fields = []
+        self.labels = {}
+        self.messages = {}
+
+        for section in content:
+            section_start = len(self.fields)
+            for question in section.questions:
+                for field_question in getattr(question, 'questions', None) or [question]:
+                    self._add_question(field_question)
+
+            self.section_fields[section.id] = frozenset(self.fields[section_start:])
+            self.field_sections.update((field, section.id) for field in self.fields[section_start:])
+
+        self.required_fields = frozenset(self.fields) - frozenset(validator_cls.optional_fields or [])
+        self.format_patterns = [(field, EMAIL_PATTERN) for field in validator_cls.email_validation_fields or []]
+        self.format_patterns.extend(
+            (field, re.compile(r'^\d{{{0}}}$'.format(length)))
+            for field, length in validator_cls.number_string_fields or []
+        )
+
+    def _add_question(self, question):
+        question_id = question.id
+        self.fields.append(question_id)
+        if question.get('type') in ['text', 'textbox_large']:
+            self.text_fields.append(question_id)
+
+        question_number = question.get('number')
+        self.labels[question_id] = (
+            "Question {}".format(question_number) if question_number else question.get('question')
+        )
+        # the first validation with a name wins
+        self.messages[question_id] = dict(
+            (validation['name'], validation['message'])
+            for validation in reversed(question.get('validations') or [])
+        )
+
+
+def get_declaration_schema(validator_cls, content):
+    cache_key = (validator_cls, id(content))
+    # the cached content is compared as well as its id, as ids can be reused once an object is gone
+    cached_content, schema = declaration_schema_cache.get(cache_key, (None, None))
+    if cached_content is not content:
+        schema = DeclarationSchema(validator_cls, content)
+        declaration_schema_cache.set(cache_key, (content, schema))
+    return schema
+
+
+class DeclarationState(object):
+    """Which sections of a declaration had no errors, and the answers and required fields they were checked with."""
+
+    def __init__(self, answers, required_fields, section_validity):
+        self.answers = answers
+        self.required_fields = required_fields
+        self.section_validity = section_validity
+
+    @property
+    def complete(self):
+        return all(self.section_validity.values())
+
+
 class DeclarationValidator(object):
     email_validation_fields = []
     number_string_fields = []
@@ -27,33 +108,35 @@ class DeclarationValidator(object):
     def __init__(self, content, answers):
         self.content = content
         self.answers = answers
+        self._schema = None
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            self._schema = get_declaration_schema(type(self), self.content)
+        return self._schema
 
     def get_error_messages_for_page(self, section):
-        all_errors = self.get_error_messages()
-        page_ids = section.get_question_ids()
-        page_errors = ImmutableOrderedMultiDict(filter(lambda err: err[0] in page_ids, all_errors))
-        return page_errors
+        page_ids = set(section.get_question_ids())
+        return ImmutableOrderedMultiDict(self.get_error_messages(fields=page_ids))
 
-    def get_error_messages(self):
-        raw_errors_map = self.errors()
+    def get_error_messages(self, fields=None):
+        raw_errors_map = self.errors(fields)
         errors_map = list()
-        for question_id in self.all_fields():
+        for question_id in self.schema.fields:
             if question_id in raw_errors_map:
-                question_number = self.content.get_question(question_id).get('number')
-                validation_message = self.get_error_message(question_id, raw_errors_map[question_id])
                 errors_map.append((question_id, {
                     'input_name': question_id,
-                    'question': "Question {}".format(question_number)
-                    if question_number else self.content.get_question(question_id).get('question'),
-                    'message': validation_message,
+                    'question': self.schema.labels[question_id],
+                    'message': self.get_error_message(question_id, raw_errors_map[question_id]),
                 }))
 
         return errors_map
 
     def get_error_message(self, question_id, message_key):
-        for validation in self.content.get_question(question_id).get('validations', []):
-            if validation['name'] == message_key:
-                return validation['message']
+        message = self.schema.messages.get(question_id, {}).get(message_key)
+        if message is not None:
+            return message
         default_messages = {
             'answer_required': 'You need to answer this question.',
             'under_character_limit': 'Your answer must be no more than {} characters.'.format(self.character_limit),
@@ -62,25 +145,54 @@ class DeclarationValidator(object):
         return default_messages.get(
             message_key, 'There was a problem with the answer to this question')
 
-    def errors(self):
-        raise NotImplementedError("only a subclass should be used")
-
     def all_fields(self):
-        return reduce(add, (section.get_question_ids() for section in self.content))
+        return list(self.schema.fields)
 
     def fields_with_values(self):
         return set(key for key, value in self.answers.items()
                    if value is not None and (not isinstance(value, six.string_types) or len(value) > 0))
 
-    def errors(self):
+    def errors(self, fields=None, required_fields=None):
+        """Return a map of question id to error key, for all questions or only those in `fields`."""
         errors_map = {}
-        errors_map.update(self.character_limit_errors())
-        errors_map.update(self.formatting_errors(self.answers))
-        errors_map.update(self.answer_required_errors())
+        errors_map.update(self.character_limit_errors(fields))
+        errors_map.update(self.formatting_errors(self.answers, fields))
+        errors_map.update(self.answer_required_errors(fields, required_fields))
         return errors_map
 
-    def answer_required_errors(self):
-        req_fields = self.get_required_fields()
+    def validate_sections(self, previous_state=None):
+        """Work out which sections of the declaration have no errors.
+
+        Given the DeclarationState from an earlier call for the same declaration, only the
+        sections with answers that have changed, or with questions that have become required or
+        optional, are checked again. The rest keep their earlier result.
+
+        :return: a DeclarationState
+        """
+        required_fields = frozenset(self.get_required_fields())
+        if previous_state is None:
+            sections_to_check = set(self.schema.section_fields)
+            section_validity = {}
+        else:
+            changed_fields = set(required_fields.symmetric_difference(previous_state.required_fields))
+            changed_fields.update(
+                key for key in set(self.answers) | set(previous_state.answers)
+                if self.answers.get(key) != previous_state.answers.get(key)
+            )
+            sections_to_check = set(
+                self.schema.field_sections[field] for field in changed_fields if field in self.schema.field_sections
+            )
+            section_validity = dict(previous_state.section_validity)
+
+        for section_id in sections_to_check:
+            section_validity[section_id] = not self.errors(self.schema.section_fields[section_id], required_fields)
+
+        return DeclarationState(dict(self.answers), required_fields, section_validity)
+
+    def answer_required_errors(self, fields=None, required_fields=None):
+        req_fields = self.get_required_fields() if required_fields is None else required_fields
+        if fields is not None:
+            req_fields = req_fields & set(fields)
         filled_fields = self.fields_with_values()
         errors_map = {}
 
@@ -89,36 +201,35 @@ class DeclarationValidator(object):
 
         return errors_map
 
-    def character_limit_errors(self):
+    def character_limit_errors(self, fields=None):
         errors_map = {}
-        for question_id in self.all_fields():
-            if self.content.get_question(question_id).get('type') in ['text', 'textbox_large']:
-                answer = self.answers.get(question_id) or ''
-                if self.character_limit is not None and len(answer) > self.character_limit:
-                    errors_map[question_id] = "under_character_limit"
+        if self.character_limit is None:
+            return errors_map
+
+        for question_id in self.schema.text_fields:
+            if fields is not None and question_id not in fields:
+                continue
+            answer = self.answers.get(question_id) or ''
+            if len(answer) > self.character_limit:
+                errors_map[question_id] = "under_character_limit"
 
         return errors_map
 
-    def formatting_errors(self, answers):
+    def formatting_errors(self, answers, fields=None):
         errors_map = {}
-        if self.email_validation_fields is not None and len(self.email_validation_fields) > 0:
-            for field in self.email_validation_fields:
-                if self.answers.get(field) is None or not re.match(EMAIL_REGEX, self.answers.get(field, '')):
-                    errors_map[field] = 'invalid_format'
-
-        if self.number_string_fields is not None and len(self.number_string_fields) > 0:
-            for field, length in self.number_string_fields:
-                if self.answers.get(field) is None or not re.match(
-                        '^\d{{{0}}}$'.format(length), self.answers.get(field, '')
-                ):
-                    errors_map[field] = 'invalid_format'
+        for field, pattern in self.schema.format_patterns:
+            if fields is not None and field not in fields:
+                continue
+            if self.answers.get(field) is None or not pattern.match(self.answers.get(field, '')):
+                errors_map[field] = 'invalid_format'
         return errors_map
 
     def get_required_fields(self):
         try:
-            req_fields = self.required_fields
+            req_fields = set(self.required_fields)
         except AttributeError:
-            req_fields = set(self.all_fields())
+            # optional fields have already been removed from the schema's required fields
+            return set(self.schema.required_fields)
 
         #  Remove optional fields
         if self.optional_fields is not None:
@@ -9,31 +9,39 @@ import six
 
 from dmapiclient import APIError
 from dmapiclient.audit import AuditTypes
-from dmutils.email import send_email, MandrillException
+from dmutils.email import MandrillException
 from dmcontent.formats import format_service_price
 from dmutils.formats import datetimeformat
-from dmutils import s3
 from dmutils.documents import (
     RESULT_LETTER_FILENAME, AGREEMENT_FILENAME, SIGNED_AGREEMENT_PREFIX, SIGNED_SIGNATURE_PAGE_PREFIX,
     SIGNATURE_PAGE_FILENAME, get_document_path, generate_timestamped_document_upload_path,
-    degenerate_document_path_and_return_doc_name, get_signed_url, get_extension, file_is_less_than_5mb,
-    file_is_empty, file_is_image, file_is_pdf, sanitise_supplier_name
+    degenerate_document_path_and_return_doc_name, get_extension, sanitise_supplier_name
 )
 
 from ... import data_api_client, flask_featureflags
 from ...main import main, content_loader
+from ...audit import record_audit_event
+from ...buckets import bucket_pool
+from ...outbox import send_email
 from ..helpers import hash_email, login_required
+from ..helpers.communications import get_communications_index
+from ..helpers.concurrency import fetch_concurrently
+from ..helpers.content import get_filtered_manifest, get_filtered_message
+from ..helpers.direct_uploads import (
+    DirectUploadError, direct_upload_form, check_direct_upload, move_direct_upload, render_direct_upload_complete_page
+)
 from ..helpers.frameworks import (
-    get_declaration_status, get_last_modified_from_first_matching_file, register_interest_in_framework,
+    get_declaration_status, register_interest_in_framework,
     get_supplier_on_framework_from_info, get_declaration_status_from_info, get_supplier_framework_info,
     get_framework, get_framework_and_lot, count_drafts_by_lot, get_statuses_for_lot,
     return_supplier_framework_info_if_on_framework_or_abort, returned_agreement_email_recipients,
     check_agreement_is_related_to_supplier_framework_or_abort
 )
-from ..helpers.validation import get_validator
+from ..helpers.validation import get_validator, declaration_state_cache
 from ..helpers.services import (
-    get_signed_document_url, get_drafts, get_lot_drafts, count_unanswered_questions
+    get_signed_document_url, get_drafts, get_lot_drafts, count_unanswered_questions_for_drafts
 )
+from ..helpers.uploads import SIGNATURE_PAGE_EXTENSIONS, read_upload
 from ..forms.frameworks import SignerDetailsForm, ContractReviewForm, AcceptAgreementVariationForm
 
 CLARIFICATION_QUESTION_NAME = 'clarification_question'
@@ -64,9 +72,11 @@ def framework_dashboard(framework_slug):
                 extra={'error': six.text_type(e), 'supplier_id': current_user.supplier_id}
             )
 
-    drafts, complete_drafts = get_drafts(data_api_client, framework_slug)
-
-    supplier_framework_info = get_supplier_framework_info(data_api_client, framework_slug)
+    (drafts, complete_drafts), supplier_framework_info, communications = fetch_concurrently(
+        lambda: get_drafts(data_api_client, framework_slug),
+        lambda: get_supplier_framework_info(data_api_client, framework_slug),
+        lambda: get_communications_index(framework_slug),
+    )
     declaration_status = get_declaration_status_from_info(supplier_framework_info)
     supplier_is_on_framework = get_supplier_on_framework_from_info(supplier_framework_info)
 
@@ -98,9 +108,6 @@ def framework_dashboard(framework_slug):
             supplier_framework_info['agreementPath']
         )
 
-    key_list = s3.S3(current_app.config['DM_COMMUNICATIONS_BUCKET']).list(framework_slug, load_timestamps=True)
-    key_list.reverse()
-
     base_communications_files = {
         "invitation": {
             "path": "communications/",
@@ -134,11 +141,7 @@ def framework_dashboard(framework_slug):
     communications_files = {
         label: dict(
             d,
-            last_modified=get_last_modified_from_first_matching_file(
-                key_list,
-                framework_slug,
-                d["path"]+d.get("filename", ""),
-            ),
+            last_modified=communications.last_modified(d["path"] + d.get("filename", "")),
         )
         for label, d in six.iteritems(base_communications_files)
     }
@@ -238,12 +241,12 @@ def framework_submission_services(framework_slug, lot_slug):
                     framework_slug=framework_slug, lot_slug=lot_slug, service_id=draft['id'])
         )
 
-    for draft in chain(drafts, complete_drafts):
+    all_drafts = list(chain(drafts, complete_drafts))
+    for draft in all_drafts:
         draft['priceString'] = format_service_price(draft)
-        content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(draft)
-        sections = content.summary(draft)
 
-        unanswered_required, unanswered_optional = count_unanswered_questions(sections)
+    unanswered_counts = count_unanswered_questions_for_drafts(content_loader, framework_slug, all_drafts)
+    for draft, (unanswered_required, unanswered_optional) in zip(all_drafts, unanswered_counts):
         draft.update({
             'unanswered_required': unanswered_required,
             'unanswered_optional': unanswered_optional,
@@ -278,7 +281,8 @@ def framework_start_supplier_declaration(framework_slug):
 def framework_supplier_declaration(framework_slug, section_id=None):
     framework = get_framework(data_api_client, framework_slug, allowed_statuses=['open'])
 
-    content = content_loader.get_manifest(framework_slug, 'declaration').filter({})
+    # the filtered manifest is shared between requests, so its compiled validation schema is too
+    content = get_filtered_manifest(content_loader, framework_slug, 'declaration', {})
     status_code = 200
 
     if section_id is None:
@@ -316,10 +320,10 @@ def framework_supplier_declaration(framework_slug, section_id=None):
             status_code = 400
         else:
             validator = get_validator(framework, content, all_answers)
-            if validator.get_error_messages():
-                all_answers.update({"status": "started"})
-            else:
-                all_answers.update({"status": "complete"})
+            state_key = (current_user.supplier_id, framework_slug)
+            declaration_state = validator.validate_sections(declaration_state_cache.get(state_key))
+            declaration_state_cache.set(state_key, declaration_state)
+            all_answers.update({"status": "complete" if declaration_state.complete else "started"})
             try:
                 data_api_client.set_supplier_declaration(
                     current_user.supplier_id,
@@ -359,8 +363,8 @@ def framework_supplier_declaration(framework_slug, section_id=None):
 @main.route('/frameworks/<framework_slug>/files/<path:filepath>', methods=['GET'])
 @login_required
 def download_supplier_file(framework_slug, filepath):
-    uploader = s3.S3(current_app.config['DM_COMMUNICATIONS_BUCKET'])
-    url = get_signed_document_url(uploader, "{}/communications/{}".format(framework_slug, filepath))
+    url = get_signed_document_url(current_app.config['DM_COMMUNICATIONS_BUCKET'],
+                                  "{}/communications/{}".format(framework_slug, filepath))
     if not url:
         abort(404)
 
@@ -374,9 +378,8 @@ def download_agreement_file(framework_slug, document_name):
     if supplier_framework_info is None or not supplier_framework_info.get("declaration"):
         abort(404)
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
     path = get_document_path(framework_slug, current_user.supplier_id, 'agreements', document_name)
-    url = get_signed_url(agreements_bucket, path, current_app.config['DM_ASSETS_URL'])
+    url = get_signed_document_url(current_app.config['DM_AGREEMENTS_BUCKET'], path)
     if not url:
         abort(404)
 
@@ -394,8 +397,7 @@ def framework_updates(framework_slug, error_message=None, default_textbox_value=
                                    'user_id': current_user.id,
                                    'supplier_id': current_user.supplier_id})
 
-    communications_bucket = s3.S3(current_app.config['DM_COMMUNICATIONS_BUCKET'])
-    file_list = communications_bucket.list('{}/communications/updates/'.format(framework_slug), load_timestamps=True)
+    file_list = get_communications_index(framework_slug).files_in('communications/updates/')
     files = {
         'communications': [],
         'clarifications': [],
@@ -515,7 +517,8 @@ def framework_updates_email_clarification_question(framework_slug):
         # Zendesk will handle this instead
         audit_type = AuditTypes.send_application_question
 
-    data_api_client.create_audit_event(
+    record_audit_event(
+        data_api_client,
         audit_type=audit_type,
         user=current_user.email_address,
         object_type="suppliers",
@@ -578,9 +581,10 @@ def upload_framework_agreement(framework_slug):
     supplier_framework = return_supplier_framework_info_if_on_framework_or_abort(data_api_client, framework_slug)
 
     upload_error = None
-    if not file_is_less_than_5mb(request.files['agreement']):
+    agreement = read_upload(request.files['agreement'])
+    if agreement.too_large:
         upload_error = "Document must be less than 5MB"
-    elif file_is_empty(request.files['agreement']):
+    elif agreement.empty:
         upload_error = "Document must not be empty"
 
     if upload_error is not None:
@@ -592,8 +596,8 @@ def upload_framework_agreement(framework_slug):
             agreement_filename=AGREEMENT_FILENAME,
         ), 400
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
-    extension = get_extension(request.files['agreement'].filename)
+    agreements_bucket = bucket_pool.get(current_app.config['DM_AGREEMENTS_BUCKET'])
+    extension = agreement.extension
 
     path = generate_timestamped_document_upload_path(
         framework_slug,
@@ -603,7 +607,7 @@ def upload_framework_agreement(framework_slug):
     )
     agreements_bucket.save(
         path,
-        request.files['agreement'],
+        agreement,
         acl='private',
         download_filename='{}-{}-{}{}'.format(
             sanitise_supplier_name(current_user.supplier_name),
@@ -737,7 +741,7 @@ def signature_upload(framework_slug, agreement_id):
     agreement = data_api_client.get_framework_agreement(agreement_id)['agreement']
     check_agreement_is_related_to_supplier_framework_or_abort(agreement, supplier_framework)
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
+    agreements_bucket = bucket_pool.get(current_app.config['DM_AGREEMENTS_BUCKET'])
     signature_page = agreements_bucket.get_key(agreement.get('signedAgreementPath'))
     upload_error = None
 
@@ -745,16 +749,17 @@ def signature_upload(framework_slug, agreement_id):
         # No file chosen for upload and file already exists on s3 so can use existing and progress
         if not request.files['signature_page'].filename and signature_page:
             return redirect(url_for(".contract_review", framework_slug=framework_slug, agreement_id=agreement_id))
-
-        if not file_is_image(request.files['signature_page']) and not file_is_pdf(request.files['signature_page']):
-            upload_error = "The file must be a PDF, JPG or PNG"
-        elif not file_is_less_than_5mb(request.files['signature_page']):
-            upload_error = "The file must be less than 5MB"
-        elif file_is_empty(request.files['signature_page']):
-            upload_error = "The file must not be empty"
+        else:
+            signature_page_file = read_upload(request.files['signature_page'])
+            if not signature_page_file.has_format(SIGNATURE_PAGE_EXTENSIONS):
+                upload_error = "The file must be a PDF, JPG or PNG"
+            elif signature_page_file.too_large:
+                upload_error = "The file must be less than 5MB"
+            elif signature_page_file.empty:
+                upload_error = "The file must not be empty"
 
         if not upload_error:
-            extension = get_extension(request.files['signature_page'].filename)
+            extension = signature_page_file.extension
             upload_path = generate_timestamped_document_upload_path(
                 framework_slug,
                 current_user.supplier_id,
@@ -763,7 +768,7 @@ def signature_upload(framework_slug, agreement_id):
             )
             agreements_bucket.save(
                 upload_path,
-                request.files['signature_page'],
+                signature_page_file,
                 acl='private',
                 download_filename='{}-{}-{}{}'.format(
                     sanitise_supplier_name(current_user.supplier_name),
@@ -781,12 +786,93 @@ def signature_upload(framework_slug, agreement_id):
 
             return redirect(url_for(".contract_review", framework_slug=framework_slug, agreement_id=agreement_id))
 
+    return _render_signature_upload_page(agreements_bucket, framework, agreement, signature_page, upload_error)
+
+
+@main.route('/frameworks/<framework_slug>/<int:agreement_id>/signature-upload/complete', methods=['GET', 'POST'])
+@login_required
+def signature_upload_complete(framework_slug, agreement_id):
+    """S3 redirects here once a signature page has been uploaded straight to the agreements bucket.
+
+    The redirect is a GET that anyone could link to, so it only shows a form that posts the upload back here.
+    """
+    if not current_app.config['DM_DIRECT_UPLOADS']:
+        abort(404)
+    framework = get_framework(data_api_client, framework_slug, allowed_statuses=['standstill', 'live'])
+    if not framework.get('frameworkAgreementVersion'):
+        abort(404)
+    supplier_framework = return_supplier_framework_info_if_on_framework_or_abort(data_api_client, framework_slug)
+    agreement = data_api_client.get_framework_agreement(agreement_id)['agreement']
+    check_agreement_is_related_to_supplier_framework_or_abort(agreement, supplier_framework)
+
+    if request.method == 'GET':
+        return render_direct_upload_complete_page(
+            framework, url_for(".signature_upload", framework_slug=framework_slug, agreement_id=agreement_id)
+        )
+
+    agreements_bucket = bucket_pool.get(current_app.config['DM_AGREEMENTS_BUCKET'])
+    staging_key = request.form.get('key')
+    etag = request.form.get('etag')
+    try:
+        filename = check_direct_upload(
+            agreements_bucket, staging_key, etag, framework_slug, current_user.supplier_id, SIGNATURE_PAGE_EXTENSIONS
+        )
+    except DirectUploadError as e:
+        signature_page = agreements_bucket.get_key(agreement.get('signedAgreementPath'))
+        upload_error = {
+            'missing': "You must choose a file to upload",
+            'format': "The file must be a PDF, JPG or PNG",
+            'size': "The file must be less than 5MB",
+            'empty': "The file must not be empty",
+        }[e.reason]
+        return _render_signature_upload_page(agreements_bucket, framework, agreement, signature_page, upload_error)
+
+    extension = get_extension(filename)
+    upload_path = generate_timestamped_document_upload_path(
+        framework_slug,
+        current_user.supplier_id,
+        'agreements',
+        '{}{}'.format(SIGNED_AGREEMENT_PREFIX, extension)
+    )
+    move_direct_upload(
+        agreements_bucket,
+        staging_key,
+        etag,
+        upload_path,
+        acl='private',
+        download_filename='{}-{}-{}{}'.format(
+            sanitise_supplier_name(current_user.supplier_name),
+            current_user.supplier_id,
+            SIGNED_SIGNATURE_PAGE_PREFIX,
+            extension
+        ),
+        disposition_type='inline'
+    )
+
+    data_api_client.update_framework_agreement(agreement_id, {"signedAgreementPath": upload_path},
+                                               current_user.email_address)
+
+    session['signature_page'] = filename
+
+    return redirect(url_for(".contract_review", framework_slug=framework_slug, agreement_id=agreement_id))
+
+
+def _render_signature_upload_page(agreements_bucket, framework, agreement, signature_page, upload_error):
+    direct_upload = None
+    if current_app.config['DM_DIRECT_UPLOADS']:
+        direct_upload = direct_upload_form(
+            agreements_bucket, framework['slug'], current_user.supplier_id,
+            url_for('.signature_upload_complete', framework_slug=framework['slug'], agreement_id=agreement['id'],
+                    _external=True)
+        )
+
     return render_template(
         "frameworks/signature_upload.html",
         agreement=agreement,
         framework=framework,
         signature_page=signature_page,
         upload_error=upload_error,
+        direct_upload=direct_upload,
     ), 400 if upload_error else 200
 
 
@@ -810,7 +896,7 @@ def contract_review(framework_slug, agreement_id):
     ):
         abort(404)
 
-    agreements_bucket = s3.S3(current_app.config['DM_AGREEMENTS_BUCKET'])
+    agreements_bucket = bucket_pool.get(current_app.config['DM_AGREEMENTS_BUCKET'])
     signature_page = agreements_bucket.get_key(agreement['signedAgreementPath'])
 
     form = ContractReviewForm()
@@ -907,8 +993,10 @@ def view_contract_variation(framework_slug, variation_slug):
         abort(404)
 
     agreed_details = supplier_framework['agreedVariations'].get(variation_slug, {})
-    variation_content_name = 'contract_variation_{}'.format(variation_slug)
-    content_loader.load_messages(framework_slug, [variation_content_name])
+    supplier_name = supplier_framework['declaration']['nameOfOrganisation']
+    variation_content = get_filtered_message(
+        content_loader, framework_slug, 'contract_variation_{}'.format(variation_slug), {'supplier_name': supplier_name}
+    )
     form = AcceptAgreementVariationForm()
     form_errors = None
 
@@ -953,11 +1041,6 @@ def view_contract_variation(framework_slug, variation_slug):
                 {'question': form['accept_changes'].label.text, 'input_name': 'accept_changes'}
             ]
 
-    supplier_name = supplier_framework['declaration']['nameOfOrganisation']
-    variation_content = content_loader.get_message(framework_slug, variation_content_name).filter(
-        {'supplier_name': supplier_name}
-    )
-
     return render_template(
         "frameworks/contract_variation.html",
         form=form,
@@ -7,12 +7,14 @@ from flask_login import login_user
 from dmapiclient import HTTPError
 from dmapiclient.audit import AuditTypes
 from dmutils.user import User
-from dmutils.email import decode_invitation_token, generate_token, send_email, MandrillException
+from dmutils.email import decode_invitation_token, generate_token, MandrillException
 
 from .. import main
 from ..forms.auth_forms import EmailAddressForm, CreateUserForm
 from ..helpers import hash_email, login_required
-from ... import data_api_client
+from ... import data_api_client, user_cache
+from ...audit import record_audit_event
+from ...outbox import send_email
 
 
 @main.route('/create-user/<string:encoded_token>', methods=["GET"])
@@ -80,6 +82,7 @@ def submit_create_user(encoded_token):
             })
 
             user = User.from_json(user)
+            user_cache.invalidate(user.id)
             login_user(user)
 
         except HTTPError as e:
@@ -145,7 +148,8 @@ def send_invite_user():
                        'email_hash': hash_email(current_user.email_address)})
             abort(503, "Failed to send user invite reset")
 
-        data_api_client.create_audit_event(
+        record_audit_event(
+            data_api_client,
             audit_type=AuditTypes.invite_user,
             user=current_user.email_address,
             object_type='suppliers',
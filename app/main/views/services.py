@@ -1,17 +1,27 @@
+try:
+    import urlparse
+except ImportError:
+    import urllib.parse as urlparse
+
 from flask_login import current_user
 from flask import render_template, request, redirect, url_for, abort, flash, current_app
 
 from ... import data_api_client, flask_featureflags
 from ...main import main, content_loader
+from ...buckets import bucket_pool
 from ..helpers import login_required
+from ..helpers.content import get_filtered_manifest
 from ..helpers.services import is_service_associated_with_supplier, get_signed_document_url, count_unanswered_questions, \
     get_next_section_name
-from ..helpers.frameworks import get_framework_and_lot, get_declaration_status
+from ..helpers.frameworks import get_framework, get_framework_and_lot, get_declaration_status
+from ..helpers.direct_uploads import (
+    DirectUploadError, direct_upload_form, check_direct_upload, move_direct_upload, render_direct_upload_complete_page
+)
+from ..helpers.uploads import DOCUMENT_EXTENSIONS, upload_service_documents
 
 from dmcontent.content_loader import ContentNotFoundError
 from dmapiclient import HTTPError
-from dmutils import s3
-from dmutils.documents import upload_service_documents
+from dmutils.documents import generate_file_name
 
 
 @main.route('/services')
@@ -41,10 +51,10 @@ def edit_service(service_id):
     if not is_service_associated_with_supplier(service):
         abort(404)
 
-    framework = data_api_client.get_framework(service['frameworkSlug'])['frameworks']
+    framework = get_framework(data_api_client, service['frameworkSlug'], allowed_statuses=[])
 
     try:
-        content = content_loader.get_manifest(framework['slug'], 'edit_service').filter(service)
+        content = get_filtered_manifest(content_loader, framework['slug'], 'edit_service', service)
     except ContentNotFoundError:
         abort(404)
     remove_requested = bool(request.args.get('remove_requested'))
@@ -113,7 +123,7 @@ def edit_section(service_id, section_id):
         abort(404)
 
     try:
-        content = content_loader.get_manifest(service["frameworkSlug"], 'edit_service').filter(service)
+        content = get_filtered_manifest(content_loader, service["frameworkSlug"], 'edit_service', service)
     except ContentNotFoundError:
         abort(404)
     section = content.get_section(section_id)
@@ -141,7 +151,7 @@ def update_section(service_id, section_id):
         abort(404)
 
     try:
-        content = content_loader.get_manifest(service["frameworkSlug"], 'edit_service').filter(service)
+        content = get_filtered_manifest(content_loader, service["frameworkSlug"], 'edit_service', service)
     except ContentNotFoundError:
         abort(404)
     section = content.get_section(section_id)
@@ -182,9 +192,7 @@ def start_new_draft_service(framework_slug, lot_slug):
 
     framework, lot = get_framework_and_lot(data_api_client, framework_slug, lot_slug, allowed_statuses=['open'])
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(
-        {'lot': lot['slug']}
-    )
+    content = get_filtered_manifest(content_loader, framework_slug, 'edit_submission', {'lot': lot['slug']})
 
     section = content.get_section(content.get_next_editable_section_id())
 
@@ -203,9 +211,7 @@ def create_new_draft_service(framework_slug, lot_slug):
 
     framework, lot = get_framework_and_lot(data_api_client, framework_slug, lot_slug, allowed_statuses=['open'])
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(
-        {'lot': lot['slug']}
-    )
+    content = get_filtered_manifest(content_loader, framework_slug, 'edit_submission', {'lot': lot['slug']})
 
     section = content.get_section(content.get_next_editable_section_id())
 
@@ -250,9 +256,7 @@ def copy_draft_service(framework_slug, lot_slug, service_id):
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(
-        {'lot': lot['slug']}
-    )
+    content = get_filtered_manifest(content_loader, framework_slug, 'edit_submission', {'lot': lot['slug']})
 
     draft_copy = data_api_client.copy_draft_service(
         service_id,
@@ -342,8 +346,7 @@ def service_submission_document(framework_slug, supplier_id, document_name):
     if current_user.supplier_id != supplier_id:
         abort(404)
 
-    uploader = s3.S3(current_app.config['DM_SUBMISSIONS_BUCKET'])
-    s3_url = get_signed_document_url(uploader,
+    s3_url = get_signed_document_url(current_app.config['DM_SUBMISSIONS_BUCKET'],
                                      "{}/submissions/{}/{}".format(framework_slug, supplier_id, document_name))
     if not s3_url:
         abort(404)
@@ -368,7 +371,7 @@ def view_service_submission(framework_slug, lot_slug, service_id):
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework['slug'], 'edit_submission').filter(draft)
+    content = get_filtered_manifest(content_loader, framework['slug'], 'edit_submission', draft)
 
     sections = content.summary(draft)
 
@@ -418,7 +421,7 @@ def edit_service_submission(framework_slug, lot_slug, service_id, section_id, qu
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(draft)
+    content = get_filtered_manifest(content_loader, framework_slug, 'edit_submission', draft)
     section = content.get_section(section_id)
     if section and (question_slug is not None):
         section = section.get_question_as_section(question_slug)
@@ -431,7 +434,7 @@ def edit_service_submission(framework_slug, lot_slug, service_id, section_id, qu
         update_data = section.get_data(request.form)
 
         if request.files:
-            uploader = s3.S3(current_app.config['DM_SUBMISSIONS_BUCKET'])
+            uploader = bucket_pool.get(current_app.config['DM_SUBMISSIONS_BUCKET'])
             documents_url = url_for('.dashboard', _external=True) + '/assets/'
             uploaded_documents, document_errors = upload_service_documents(
                 uploader, documents_url, draft, request.files, section,
@@ -488,8 +491,123 @@ def edit_service_submission(framework_slug, lot_slug, service_id, section_id, qu
         force_return_to_summary=force_return_to_summary,
         one_service_limit=lot['oneServiceLimit'],
         errors=errors,
+        direct_upload_urls=_direct_upload_urls(framework_slug, lot_slug, service_id, section),
+    )
+
+
+def _direct_upload_urls(framework_slug, lot_slug, service_id, section):
+    if not current_app.config['DM_DIRECT_UPLOADS']:
+        return {}
+    return {
+        question_id: url_for('.upload_service_document', framework_slug=framework_slug, lot_slug=lot_slug,
+                             service_id=service_id, question_id=question_id)
+        for question_id in section.get_question_ids(type="upload")
+    }
+
+
+@main.route('/frameworks/<framework_slug>/submissions/<lot_slug>/<service_id>/documents/<question_id>',
+            methods=['GET'])
+@login_required
+def upload_service_document(framework_slug, lot_slug, service_id, question_id):
+    """A page that uploads a service document straight to the submissions bucket"""
+    framework, draft, section = _get_draft_document_section(framework_slug, lot_slug, service_id, question_id)
+    return _render_service_document_upload_page(framework, draft, section, question_id, errors=None)
+
+
+@main.route('/frameworks/<framework_slug>/submissions/<lot_slug>/<service_id>/documents/<question_id>/complete',
+            methods=['GET', 'POST'])
+@login_required
+def upload_service_document_complete(framework_slug, lot_slug, service_id, question_id):
+    """S3 redirects here once a service document has been uploaded straight to the submissions bucket.
+
+    The redirect is a GET that anyone could link to, so it only shows a form that posts the upload back here.
+    """
+    framework, draft, section = _get_draft_document_section(framework_slug, lot_slug, service_id, question_id)
+
+    if request.method == 'GET':
+        return render_direct_upload_complete_page(
+            framework, url_for('.upload_service_document', framework_slug=framework_slug, lot_slug=lot_slug,
+                               service_id=service_id, question_id=question_id)
+        )
+
+    uploader = bucket_pool.get(current_app.config['DM_SUBMISSIONS_BUCKET'])
+    staging_key = request.form.get('key')
+    etag = request.form.get('etag')
+    try:
+        filename = check_direct_upload(
+            uploader, staging_key, etag, framework_slug, current_user.supplier_id, DOCUMENT_EXTENSIONS
+        )
+    except DirectUploadError as e:
+        errors = section.get_error_messages({question_id: {
+            'missing': 'answer_required',
+            'format': 'file_is_open_document_format',
+            'size': 'file_is_less_than_5mb',
+            'empty': 'answer_required',
+        }[e.reason]})
+        return _render_service_document_upload_page(framework, draft, section, question_id, errors)
+
+    path = generate_file_name(
+        framework_slug, uploader.bucket_short_name, current_user.supplier_id, draft['id'], question_id, filename
+    )
+    move_direct_upload(uploader, staging_key, etag, path, acl='private')
+
+    documents_url = url_for('.dashboard', _external=True) + '/assets/'
+    data_api_client.update_draft_service(
+        service_id,
+        {question_id: urlparse.urljoin(documents_url, path)},
+        current_user.email_address,
+        page_questions=[question_id]
+    )
+
+    return redirect(url_for(".view_service_submission",
+                            framework_slug=framework['slug'],
+                            lot_slug=draft['lotSlug'],
+                            service_id=service_id,
+                            _anchor=section.id))
+
+
+def _get_draft_document_section(framework_slug, lot_slug, service_id, question_id):
+    if not current_app.config['DM_DIRECT_UPLOADS']:
+        abort(404)
+    framework, lot = get_framework_and_lot(data_api_client, framework_slug, lot_slug, allowed_statuses=['open'])
+
+    try:
+        draft = data_api_client.get_draft_service(service_id)['services']
+    except HTTPError as e:
+        abort(e.status_code)
+
+    if draft['lotSlug'] != lot_slug or draft['frameworkSlug'] != framework_slug:
+        abort(404)
+
+    if not is_service_associated_with_supplier(draft):
+        abort(404)
+
+    content = get_filtered_manifest(content_loader, framework_slug, 'edit_submission', draft)
+    for section in content.sections:
+        if section.editable and question_id in section.get_question_ids(type="upload"):
+            return framework, draft, section
+
+    abort(404)
+
+
+def _render_service_document_upload_page(framework, draft, section, question_id, errors):
+    direct_upload = direct_upload_form(
+        bucket_pool.get(current_app.config['DM_SUBMISSIONS_BUCKET']), framework['slug'], current_user.supplier_id,
+        url_for('.upload_service_document_complete', framework_slug=framework['slug'], lot_slug=draft['lotSlug'],
+                service_id=draft['id'], question_id=question_id, _external=True)
     )
 
+    return render_template(
+        "services/upload_document.html",
+        framework=framework,
+        service_data=draft,
+        service_id=draft['id'],
+        section=section,
+        question=section.get_question(question_id),
+        direct_upload=direct_upload,
+        errors=errors,
+    ), 400 if errors else 200
+
 
 @main.route('/frameworks/<framework_slug>/submissions/<lot_slug>/<service_id>/remove/<section_id>/<question_slug>',
             methods=['GET', 'POST'])
@@ -503,7 +621,7 @@ def remove_subsection(framework_slug, lot_slug, service_id, section_id, question
     if not is_service_associated_with_supplier(draft):
         abort(404)
 
-    content = content_loader.get_manifest(framework_slug, 'edit_submission').filter(draft)
+    content = get_filtered_manifest(content_loader, framework_slug, 'edit_submission', draft)
     section = content.get_section(section_id)
     containing_section = section
     if section and (question_slug is not None):
@@ -3,7 +3,7 @@ from flask import render_template, abort, flash, url_for, redirect, current_app
 
 from ..helpers import login_required
 from ...main import main
-from ... import data_api_client
+from ... import data_api_client, user_cache
 
 
 def get_current_suppliers_users():
@@ -73,6 +73,8 @@ def deactivate_user(user_id):
         abort(404)
 
     data_api_client.update_user(user_id=user_to_deactivate['id'], active=False, updater=current_user.email_address)
+    # logs the user out straight away on this worker. Other workers keep them until DM_USER_CACHE_TTL runs out
+    user_cache.invalidate(user_to_deactivate['id'])
 
     flash({
         'deactivate_user_name': user_to_deactivate['name'],
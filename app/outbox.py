@@ -0,0 +1,206 @@
+import errno
+import json
+import os
+import threading
+import time
+import uuid
+
+from dmutils import email
+from flask import current_app
+
+from .files import make_private_directory
+
+
+class EmailOutbox(object):
+    """Sends emails from background threads, so that requests don't wait for the mail provider.
+
+    `send_email` takes the same arguments as `dmutils.email.send_email`. If DM_EMAIL_OUTBOX_DIR is
+    set, the email is written to a file in that directory and the request carries on. Sender
+    threads in each worker take emails from the directory and send them. If sending fails, they
+    try again up to DM_EMAIL_OUTBOX_MAX_ATTEMPTS times, waiting DM_EMAIL_OUTBOX_RETRY_DELAY seconds
+    and then twice as long after each failure. Emails that still fail are moved to `failed/`.
+
+    Because emails are kept on disk until they're sent, emails queued by a worker that stops are
+    sent by the next one. Workers can share a directory: a sender claims an email by moving it
+    to `sending/`. Sender threads are started by `init_app`, so a new worker sends emails left
+    behind by an old one without waiting for another email to be queued.
+
+    The `api_key` isn't written to disk with the email. DM_MANDRILL_API_KEY is read from the app's
+    config when the email is delivered.
+
+    If DM_EMAIL_OUTBOX_DIR isn't set, emails are sent during the request as before, and errors
+    from the mail provider are raised to the caller.
+
+    When DM_EMAIL_TRANSPORT is 'file', emails are written to DM_EMAIL_FILE_TRANSPORT_DIR as JSON
+    instead of being sent, so the whole pipeline can be run without Mandrill.
+    """
+    poll_interval = 5
+    # emails left in sending/ for this long were being sent by a worker that has stopped
+    abandoned_after = 600
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._senders = []
+        self._stats = {'queued': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'last_send_time': None}
+
+    def init_app(self, app):
+        self._app = app
+        self.directory = app.config['DM_EMAIL_OUTBOX_DIR']
+        self.sender_count = app.config['DM_EMAIL_OUTBOX_SENDERS']
+        self.max_attempts = app.config['DM_EMAIL_OUTBOX_MAX_ATTEMPTS']
+        self.retry_delay = app.config['DM_EMAIL_OUTBOX_RETRY_DELAY']
+        self.transport = app.config['DM_EMAIL_TRANSPORT']
+        self.file_transport_directory = app.config['DM_EMAIL_FILE_TRANSPORT_DIR']
+
+        if self.directory:
+            make_private_directory(self.directory)
+            for folder in ['tmp', 'pending', 'sending', 'failed']:
+                make_private_directory(os.path.join(self.directory, folder))
+            self._start_senders()
+
+    def send_email(self, to_email_addresses, email_body, api_key, subject, from_email, from_name, tags, **kwargs):
+        message = dict(
+            kwargs,
+            to_email_addresses=to_email_addresses,
+            email_body=email_body,
+            subject=subject,
+            from_email=from_email,
+            from_name=from_name,
+            tags=tags,
+        )
+        if not self.directory:
+            return self.deliver(message)
+
+        self._write_pending({'message': message, 'attempts': 0}, time.time())
+        self._count('queued')
+        self._start_senders()
+        self._wakeup.set()
+
+    def deliver(self, message):
+        """Send an email straight away, using the configured transport."""
+        start_time = time.time()
+        if self.transport == 'file':
+            make_private_directory(self.file_transport_directory)
+            filename = '{:.6f}-{}.json'.format(time.time(), uuid.uuid4().hex)
+            with open(os.path.join(self.file_transport_directory, filename), 'w') as f:
+                json.dump(message, f, indent=2, sort_keys=True)
+        else:
+            email.send_email(api_key=current_app.config['DM_MANDRILL_API_KEY'], **message)
+
+        with self._lock:
+            self._stats['sent'] += 1
+            self._stats['last_send_time'] = time.time() - start_time
+
+    def send_pending(self):
+        """Send every pending email that's due. Returns how many emails were taken from the outbox."""
+        taken = 0
+        claimed = self._claim_next()
+        while claimed is not None:
+            taken += 1
+            self._send_claimed(claimed)
+            claimed = self._claim_next()
+        return taken
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        if self.directory:
+            stats['pending'] = len(os.listdir(os.path.join(self.directory, 'pending')))
+            stats['failed_total'] = len(os.listdir(os.path.join(self.directory, 'failed')))
+        return stats
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _start_senders(self):
+        # `send_email` calls this too, to replace threads that have died or were lost when the app was
+        # loaded before gunicorn forked its workers
+        with self._lock:
+            self._senders = [sender for sender in self._senders if sender.is_alive()]
+            while len(self._senders) < self.sender_count:
+                sender = threading.Thread(target=self._run_sender, name='email-outbox-sender')
+                sender.daemon = True
+                sender.start()
+                self._senders.append(sender)
+
+    def _run_sender(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    self._recover_abandoned()
+                    self.send_pending()
+            except Exception as e:
+                self._app.logger.error("emailoutbox.sender_error: {error}", extra={'error': str(e)})
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _write_pending(self, entry, send_at):
+        self._write(entry, 'pending', '{:017.6f}-{}.json'.format(send_at, uuid.uuid4().hex))
+
+    def _write(self, entry, folder, filename):
+        temp_path = os.path.join(self.directory, 'tmp', filename)
+        with open(temp_path, 'w') as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temp_path, os.path.join(self.directory, folder, filename))
+
+    def _claim_next(self):
+        now = time.time()
+        for filename in sorted(os.listdir(os.path.join(self.directory, 'pending'))):
+            if float(filename.split('-', 1)[0]) > now:
+                return None
+            sending_path = os.path.join(self.directory, 'sending', filename)
+            try:
+                os.rename(os.path.join(self.directory, 'pending', filename), sending_path)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    continue  # another sender claimed it first
+                raise
+            # renaming keeps the time the email was queued, which would make it look abandoned
+            os.utime(sending_path, None)
+            return sending_path
+
+    def _send_claimed(self, sending_path):
+        with open(sending_path) as f:
+            entry = json.load(f)
+
+        try:
+            self.deliver(entry['message'])
+        except Exception as e:
+            entry['attempts'] += 1
+            entry['last_error'] = str(e)
+            if entry['attempts'] >= self.max_attempts:
+                self._write(entry, 'failed', os.path.basename(sending_path))
+                self._count('failed')
+                current_app.logger.error(
+                    "emailoutbox.failed: gave up sending {subject} after {attempts} attempts: {error}",
+                    extra={'subject': entry['message']['subject'], 'attempts': entry['attempts'], 'error': str(e)}
+                )
+            else:
+                self._write_pending(entry, time.time() + self.retry_delay * 2 ** (entry['attempts'] - 1))
+                self._count('retried')
+                current_app.logger.warning(
+                    "emailoutbox.retry: sending {subject} failed on attempt {attempts}: {error}",
+                    extra={'subject': entry['message']['subject'], 'attempts': entry['attempts'], 'error': str(e)}
+                )
+
+        os.remove(sending_path)
+
+    def _recover_abandoned(self):
+        sending_folder = os.path.join(self.directory, 'sending')
+        for filename in os.listdir(sending_folder):
+            path = os.path.join(sending_folder, filename)
+            try:
+                if time.time() - os.path.getmtime(path) > self.abandoned_after:
+                    os.rename(path, os.path.join(self.directory, 'pending', filename))
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+
+email_outbox = EmailOutbox()
+send_email = email_outbox.send_email
@@ -0,0 +1,220 @@
+import base64
+import os
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+def init_app(app):
+    """Use the session interface chosen by DM_SESSION_STORE.
+
+    If it's None, sessions are kept in signed cookies. If it's 'memory' or 'sqlite', the cookie only
+    holds a signed session id and the session is kept in that store. Memory sessions are only seen by
+    the worker that created them, so they're for running a single worker. The SQLite store is a file
+    at DM_SESSION_STORE_PATH that all the workers on a machine can share.
+
+    The session cookie is shared with the other Digital Marketplace frontends, and users log in
+    through another one of them. A store only works if every frontend sharing the cookie uses it:
+    otherwise they can't read each other's sessions and overwrite each other's cookies.
+    """
+    store = app.config['DM_SESSION_STORE']
+    if store is None:
+        app.session_interface = ChangedSessionInterface()
+    elif store == 'memory':
+        app.session_interface = ServerSideSessionInterface(MemorySessionStore())
+    elif store == 'sqlite':
+        app.session_interface = ServerSideSessionInterface(SQLiteSessionStore(app.config['DM_SESSION_STORE_PATH']))
+    else:
+        raise ValueError("Unknown DM_SESSION_STORE: {}".format(store))
+
+
+class ChangedSessionInterface(SecureCookieSessionInterface):
+    """Signed cookie sessions that are only sent back to the browser when they've changed.
+
+    Flask re-signs the session and sends a new cookie with every response. Sessions that are still
+    fresh are left alone instead, so most responses don't have a Set-Cookie header. The
+    `refresh_session` hook marks a session as changed when it needs its expiry moving on.
+    """
+
+    def save_session(self, app, session, response):
+        if session and not session.modified:
+            return
+        return super(ChangedSessionInterface, self).save_session(app, session, response)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.modified = False
+        self.loaded_user_id = self.get('user_id')
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Sessions kept in a `store`, with only a signed, random session id in the cookie.
+
+    Like `ChangedSessionInterface`, a session is only saved, and the cookie only sent, when the
+    session has changed. Sessions are kept in the store for PERMANENT_SESSION_LIFETIME after they
+    were last saved. An emptied session is removed from the store.
+
+    When a user logs in or out, the session is saved with a new id and the old one is removed, so a
+    session id planted in a browser before login can't be used to take over the session.
+    """
+    salt = 'dm-session-id'
+    serializer = session_json_serializer
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = self._unsign(app, request.cookies.get(app.session_cookie_name))
+        if sid is not None:
+            data = self.store.load(sid)
+            if data is not None:
+                return ServerSideSession(self.serializer.loads(data), sid=sid)
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+
+        if session.sid is not None and session.get('user_id') != session.loaded_user_id:
+            self.store.delete(session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = _new_session_id()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), time.time() + lifetime)
+        response.set_cookie(
+            app.session_cookie_name,
+            self._get_signer(app).sign(session.sid.encode('ascii')).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+        )
+
+    def _get_signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _unsign(self, app, cookie):
+        if not cookie or not app.secret_key:
+            return None
+        try:
+            return self._get_signer(app).unsign(cookie).decode('ascii')
+        except (BadSignature, UnicodeError):
+            return None
+
+
+class MemorySessionStore(object):
+    """Sessions kept in a dictionary in the worker's memory."""
+    # how often, in seconds, expired sessions are removed when a session is saved
+    purge_interval = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._purged_at = time.time()
+
+    def load(self, sid):
+        with self._lock:
+            data, expires_at = self._sessions.get(sid, (None, None))
+            if data is not None and expires_at > time.time():
+                return data
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._sessions[sid] = (data, expires_at)
+            now = time.time()
+            if now - self._purged_at >= self.purge_interval:
+                self._sessions = {
+                    key: entry for key, entry in self._sessions.items() if entry[1] > now
+                }
+                self._purged_at = now
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(object):
+    """Sessions kept in an SQLite database file, which the workers on a machine can share.
+
+    Each thread opens its own connection the first time it's used.
+    """
+    purge_interval = 300
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._purged_at = time.time()
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # the connection used to create the table is closed, so it isn't shared with forked workers
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT, expires_at REAL)"
+                )
+        finally:
+            connection.close()
+
+    def load(self, sid):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, data, expires_at):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)", (sid, data, expires_at)
+            )
+            now = time.time()
+            if now - self._purged_at >= self.purge_interval:
+                connection.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+                self._purged_at = now
+
+    def delete(self, sid):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        # lets workers read sessions while another worker is saving one
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+
+def _new_session_id():
+    return base64.urlsafe_b64encode(os.urandom(24)).decode('ascii')
@@ -0,0 +1,84 @@
+import threading
+
+
+class _Flight(object):
+    def __init__(self):
+        self.landed = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Shares one call between the threads in a worker that make the same call at the same time.
+
+    The first thread to call `do` with a key makes the call. Threads that call `do` with the same key
+    before it has finished wait for it and get its result, or have its exception raised, instead of
+    making the call again. Once the call has finished, the next `do` with that key makes a new call.
+
+    Waiting threads are given `share(result)` rather than the object the calling thread got back, so
+    one thread changing a result doesn't change it for the others.
+    """
+
+    def __init__(self, share=None):
+        self.share = share
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {'calls': 0, 'coalesced': 0, 'in_flight': 0}
+
+    def do(self, key, call):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self._stats['calls'] += 1
+                self._stats['in_flight'] += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                self._stats['coalesced'] += 1
+                leader = False
+
+        if not leader:
+            flight.landed.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self._share(flight.result)
+
+        try:
+            result = call()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, result=result)
+        return result
+
+    def forget_all(self):
+        """Make calls from now on start again, rather than wait for the calls already in flight."""
+        with self._lock:
+            self._flights.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _land(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            self._stats['in_flight'] -= 1
+            waiters = flight.waiters
+
+        try:
+            if error is not None:
+                flight.error = error
+            elif waiters:
+                # no more threads can start waiting, so the result is only shared if it's needed
+                flight.result = self._share(result)
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.landed.set()
+
+    def _share(self, result):
+        return result if self.share is None else self.share(result)
@@ -1,10 +1,44 @@
 from flask import jsonify, current_app, request
 
 from . import status
-from .. import data_api_client
+from .. import data_api_client, data_api_flights, pooled_data_api_client, user_cache
+from ..audit import audit_event_writer
+from ..buckets import bucket_pool
+from ..outbox import email_outbox
+from ..templating import template_profile
+from ..main.helpers.communications import communications_cache, communications_listings
+from ..main.helpers.content import filtered_manifest_cache, filtered_message_cache
+from ..main.helpers.services import signed_url_cache
+from ..main.helpers.validation import declaration_schema_cache, declaration_state_cache
+from ..main.helpers.frameworks import framework_cache
 from dmutils.status import get_flags
 
 
+def get_template_profile():
+    if current_app.config['DM_PROFILE_TEMPLATES']:
+        return template_profile.stats()
+
+
+def get_cache_stats():
+    return {
+        'frameworks': framework_cache.stats(),
+        'communications': communications_cache.stats(),
+        'signed_urls': signed_url_cache.stats(),
+        'users': user_cache.stats(),
+        'filtered_manifests': filtered_manifest_cache.stats(),
+        'filtered_messages': filtered_message_cache.stats(),
+        'declaration_schemas': declaration_schema_cache.stats(),
+        'declaration_states': declaration_state_cache.stats(),
+    }
+
+
+def get_single_flight_stats():
+    return {
+        'data_api': data_api_flights.stats(),
+        'communications_listings': communications_listings.stats(),
+    }
+
+
 @status.route('/_status')
 def status():
 
@@ -21,7 +55,15 @@ def status():
             status="ok",
             version=version,
             api_status=api_status,
-            flags=get_flags(current_app)
+            flags=get_flags(current_app),
+            caches=get_cache_stats(),
+            template_profile=get_template_profile(),
+            email_outbox=email_outbox.stats(),
+            audit_events=audit_event_writer.stats(),
+            s3_buckets=bucket_pool.stats(),
+            data_api_connections=pooled_data_api_client.connection_stats(),
+            data_api_endpoints=pooled_data_api_client.endpoint_stats(),
+            single_flight=get_single_flight_stats(),
         )
 
     return jsonify(
@@ -29,5 +71,13 @@ def status():
         version=version,
         api_status=api_status,
         message="Error connecting to the (Data) API.",
-        flags=get_flags(current_app)
+        flags=get_flags(current_app),
+        caches=get_cache_stats(),
+        template_profile=get_template_profile(),
+        email_outbox=email_outbox.stats(),
+        audit_events=audit_event_writer.stats(),
+        s3_buckets=bucket_pool.stats(),
+        data_api_connections=pooled_data_api_client.connection_stats(),
+        data_api_endpoints=pooled_data_api_client.endpoint_stats(),
+        single_flight=get_single_flight_stats(),
     ), 500
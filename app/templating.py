@@ -0,0 +1,128 @@
+import os
+import tempfile
+import threading
+import time
+
+import jinja2
+from jinja2.runtime import Macro
+
+from .files import make_private_directory
+
+
+class SharedFileSystemBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """A Jinja bytecode cache in a directory that several worker processes can share.
+
+    Templates compiled by one worker are loaded from the directory by the others, and by workers
+    started later, instead of being compiled again. Each file is written to a temporary file and
+    renamed into place, so a worker never reads another worker's half-written file.
+
+    The cached bytecode is run by the app, so, like Jinja's default cache directory, the directory
+    must belong to the app's user and no one else can have access to it.
+    """
+
+    def __init__(self, directory):
+        make_private_directory(directory)
+        super(SharedFileSystemBytecodeCache, self).__init__(directory)
+
+    def dump_bytecode(self, bucket):
+        fd, temp_filename = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.rename(temp_filename, self._get_cache_filename(bucket))
+        except Exception:
+            os.remove(temp_filename)
+            raise
+
+
+class TemplateProfile(object):
+    """Per-worker totals of how long each template, included template and imported macro took to render.
+
+    Times include anything the template includes or calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    def record(self, name, duration):
+        with self._lock:
+            count, total, slowest = self._timings.get(name, (0, 0, 0))
+            self._timings[name] = (count + 1, total + duration, max(slowest, duration))
+
+    def clear(self):
+        with self._lock:
+            self._timings.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {'count': count, 'total': total, 'mean': total / count, 'max': slowest}
+                for name, (count, total, slowest) in self._timings.items()
+            }
+
+
+template_profile = TemplateProfile()
+
+
+class ProfilingLoader(jinja2.BaseLoader):
+    """Wraps a template loader so that every template it loads records its render times in a `TemplateProfile`."""
+
+    def __init__(self, loader, profile):
+        self.loader = loader
+        self.profile = profile
+
+    def get_source(self, environment, template):
+        return self.loader.get_source(environment, template)
+
+    def list_templates(self):
+        return self.loader.list_templates()
+
+    def load(self, environment, name, globals=None):
+        template = super(ProfilingLoader, self).load(environment, name, globals)
+        template.root_render_func = self._profiled_render_func(name, template.root_render_func)
+        return template
+
+    def _profiled_render_func(self, name, render_func):
+        profile = self.profile
+
+        def root_render_func(context):
+            start_time = time.time()
+            try:
+                for event in render_func(context):
+                    yield event
+            finally:
+                profile.record(name, time.time() - start_time)
+
+            # macros defined by the template are profiled when another template imports them
+            for key, value in list(context.vars.items()):
+                if isinstance(value, Macro):
+                    context.vars[key] = ProfiledMacro(value, '{}:{}'.format(name, value.name), profile)
+
+        return root_render_func
+
+
+class ProfiledMacro(object):
+    def __init__(self, macro, name, profile):
+        self._macro = macro
+        self._name = name
+        self._profile = profile
+
+    def __call__(self, *args, **kwargs):
+        start_time = time.time()
+        try:
+            return self._macro(*args, **kwargs)
+        finally:
+            self._profile.record(self._name, time.time() - start_time)
+
+    def __getattr__(self, name):
+        return getattr(self._macro, name)
+
+
+def init_app(app):
+    """Sets up the bytecode cache and template profiling, if they're turned on in the app's config."""
+    if app.config['DM_TEMPLATE_BYTECODE_CACHE_DIR']:
+        app.jinja_env.bytecode_cache = SharedFileSystemBytecodeCache(app.config['DM_TEMPLATE_BYTECODE_CACHE_DIR'])
+
+    if app.config['DM_PROFILE_TEMPLATES']:
+        app.jinja_env.loader = ProfilingLoader(app.jinja_env.loader, template_profile)
@@ -0,0 +1,80 @@
+"""Time validating a complete declaration.
+
+Run from the root of the repository, after the content has been built into app/content:
+
+    python -m benchmarks.declaration_validation --framework g-cloud-9
+
+Every question in the framework's declaration is answered, and the report has the time taken to
+compile the validation schema, to validate the whole declaration with the compiled schema, and to
+validate a single page of it.
+"""
+import time
+
+from app import create_app
+from app.main import content_loader
+from app.main.helpers.validation import VALIDATORS, DeclarationSchema
+
+from .report import new_argument_parser, build_report, finish
+
+
+def answer_for(question_id, question, validator_cls):
+    if question_id in (validator_cls.email_validation_fields or []):
+        return 'supplier@example.com'
+    for field, length in validator_cls.number_string_fields or []:
+        if field == question_id:
+            return '1' * length
+
+    options = [option.get('value', option.get('label')) for option in question.get('options') or []]
+    if question.get('type') == 'boolean':
+        return True
+    if question.get('type') == 'checkboxes':
+        return options[:1]
+    if question.get('type') == 'radios':
+        return options[0] if options else 'Answer'
+    return 'Answer'
+
+
+def make_declaration(content, validator_cls):
+    return {
+        question_id: answer_for(question_id, content.get_question(question_id), validator_cls)
+        for section in content
+        for question_id in section.get_question_ids()
+    }
+
+
+def _mean_time(func, runs):
+    start_time = time.time()
+    for _ in range(runs):
+        func()
+    return (time.time() - start_time) / runs
+
+
+def main():
+    parser = new_argument_parser(__doc__.splitlines()[0])
+    parser.add_argument('--framework', default='g-cloud-9')
+    parser.add_argument('--runs', type=int, default=100, help="Average over this many runs (default 100)")
+    args = parser.parse_args()
+
+    create_app('test')
+    content = content_loader.get_manifest(args.framework, 'declaration').filter({})
+    validator_cls = VALIDATORS[args.framework]
+    answers = make_declaration(content, validator_cls)
+    section = content.sections[-1]
+
+    timings = {
+        'compile_schema': _mean_time(lambda: DeclarationSchema(validator_cls, content), args.runs),
+        'validate_declaration': _mean_time(
+            lambda: validator_cls(content, answers).get_error_messages(), args.runs
+        ),
+        'validate_page': _mean_time(
+            lambda: validator_cls(content, answers).get_error_messages_for_page(section), args.runs
+        ),
+    }
+
+    finish(build_report(
+        'declaration_validation', timings, framework=args.framework, questions=len(answers), runs=args.runs
+    ), args)
+
+
+if __name__ == '__main__':
+    main()
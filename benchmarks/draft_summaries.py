@@ -0,0 +1,87 @@
+"""Compare counting unanswered questions one draft at a time with counting them for a whole lot at once.
+
+Run from the root of the repository, after the content has been built into app/content:
+
+    python -m benchmarks.draft_summaries --framework g-cloud-9 --lot cloud-hosting
+
+Synthetic drafts for the lot are generated, with a mix of answered and unanswered questions, and
+each way of counting is timed for 10, 100 and 1000 drafts.
+"""
+import random
+import time
+
+from app import create_app
+from app.main import content_loader
+from app.main.helpers.content import filtered_manifest_cache
+from app.main.helpers.services import count_unanswered_questions, count_unanswered_questions_for_drafts
+
+from .report import new_argument_parser, build_report, finish
+
+DRAFT_COUNTS = [10, 100, 1000]
+
+
+def make_drafts(content, lot, count):
+    """Make drafts that have answered about half of the text questions in the manifest."""
+    random.seed(count)
+    question_ids = [
+        question_id
+        for section in content.sections
+        for question_id in section.get_question_ids()
+        if content.get_question(question_id).type in ('text', 'textbox_large')
+    ]
+    return [
+        dict(
+            {question_id: 'Answer' for question_id in question_ids if random.random() < 0.5},
+            id=index, lot=lot, lotSlug=lot, status='not-submitted'
+        )
+        for index in range(count)
+    ]
+
+
+def count_each_draft(content_loader, framework_slug, drafts):
+    return [
+        count_unanswered_questions(content_loader.get_manifest(framework_slug, 'edit_submission').filter(
+            draft
+        ).summary(draft))
+        for draft in drafts
+    ]
+
+
+def _best_time(func, runs, *args):
+    times = []
+    for _ in range(runs):
+        start_time = time.time()
+        func(*args)
+        times.append(time.time() - start_time)
+    return min(times)
+
+
+def main():
+    parser = new_argument_parser(__doc__.splitlines()[0])
+    parser.add_argument('--framework', default='g-cloud-9')
+    parser.add_argument('--lot', default='cloud-hosting')
+    parser.add_argument('--runs', type=int, default=3, help="Report the fastest of this many runs (default 3)")
+    args = parser.parse_args()
+
+    create_app('test')
+    content = content_loader.get_manifest(args.framework, 'edit_submission').filter({'lot': args.lot})
+
+    timings = {}
+    for count in DRAFT_COUNTS:
+        drafts = make_drafts(content, args.lot, count)
+        assert (count_each_draft(content_loader, args.framework, drafts) ==
+                count_unanswered_questions_for_drafts(content_loader, args.framework, drafts))
+
+        filtered_manifest_cache.clear()
+        timings['{}_drafts'.format(count)] = {
+            'each_draft': _best_time(count_each_draft, args.runs, content_loader, args.framework, drafts),
+            'batch': _best_time(
+                count_unanswered_questions_for_drafts, args.runs, content_loader, args.framework, drafts
+            ),
+        }
+
+    finish(build_report('draft_summaries', timings, framework=args.framework, lot=args.lot), args)
+
+
+if __name__ == '__main__':
+    main()
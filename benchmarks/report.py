@@ -0,0 +1,84 @@
+"""Helpers for writing benchmark reports and checking them against a baseline.
+
+A report is a JSON document with some information about the run and a nested dictionary of
+`timings`, in seconds. Comparing two reports flattens the timings to dotted names and flags any
+timing that's got slower than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+
+def new_argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    parser.add_argument('--baseline', help="A previous JSON report to check this run against")
+    parser.add_argument(
+        '--tolerance', type=float, default=0.25,
+        help="Fail if a timing is more than this fraction slower than the baseline (default 0.25)"
+    )
+    parser.add_argument(
+        '--min-slowdown', type=float, default=0.005,
+        help="Ignore slowdowns smaller than this many seconds, to allow for noise (default 0.005)"
+    )
+    return parser
+
+
+def build_report(name, timings, **info):
+    report = {
+        'benchmark': name,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'timings': timings,
+    }
+    report.update(info)
+    return report
+
+
+def flatten_timings(timings, prefix=''):
+    flat = {}
+    for key, value in timings.items():
+        name = '{}{}'.format(prefix, key)
+        if isinstance(value, dict):
+            flat.update(flatten_timings(value, name + '.'))
+        else:
+            flat[name] = value
+    return flat
+
+
+def find_regressions(report, baseline, tolerance, min_slowdown):
+    """Return (name, baseline, current) for each timing that's slower than the baseline allows."""
+    current_timings = flatten_timings(report['timings'])
+    baseline_timings = flatten_timings(baseline['timings'])
+
+    regressions = []
+    for name in sorted(set(current_timings) & set(baseline_timings)):
+        current, previous = current_timings[name], baseline_timings[name]
+        if current - previous > max(previous * tolerance, min_slowdown):
+            regressions.append((name, previous, current))
+    return regressions
+
+
+def finish(report, args):
+    """Write the report and exit with a non-zero status if it's regressed against the baseline."""
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if not args.baseline:
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = find_regressions(report, baseline, args.tolerance, args.min_slowdown)
+    for name, previous, current in regressions:
+        sys.stderr.write('{}: {:.4f}s -> {:.4f}s\n'.format(name, previous, current))
+    if regressions:
+        sys.stderr.write('{} timing(s) slower than the baseline\n'.format(len(regressions)))
+        sys.exit(1)
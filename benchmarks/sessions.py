@@ -0,0 +1,70 @@
+"""Compare refreshing the session cookie on every request with refreshing it once part of its lifetime has passed.
+
+Run from the root of the repository:
+
+    python -m benchmarks.sessions --requests 1000
+
+A logged in session is made for each mode and the same lightweight page is requested with it. The
+report has the median time per request and, alongside the timings, the average size of the response
+headers and how many responses set the session cookie. It doesn't need the network.
+"""
+import time
+
+from app import create_app
+
+from .report import new_argument_parser, build_report, finish
+
+# The DM_SESSION_REFRESH_FRACTION for each mode. None uses the app's configured fraction.
+MODES = [
+    ('every_request', 0),
+    ('conditional', None),
+]
+URL = '/suppliers/_status?ignore-dependencies'
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def run_requests(app, count):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 123
+        session.permanent = True
+
+    times, header_sizes, cookies_set = [], [], 0
+    for _ in range(count):
+        start_time = time.time()
+        response = client.get(URL)
+        times.append(time.time() - start_time)
+
+        header_sizes.append(sum(len(name) + len(value) + 4 for name, value in response.headers.items()))
+        if any(cookie.startswith(app.session_cookie_name + '=')
+               for cookie in response.headers.getlist('Set-Cookie')):
+            cookies_set += 1
+
+    return _median(times), sum(header_sizes) / float(count), cookies_set
+
+
+def main():
+    parser = new_argument_parser(__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000, help="Requests to make in each mode (default 1000)")
+    args = parser.parse_args()
+
+    timings, response_headers = {}, {}
+    for name, fraction in MODES:
+        app = create_app('test')
+        if fraction is not None:
+            app.config['DM_SESSION_REFRESH_FRACTION'] = fraction
+        request_time, header_size, cookies_set = run_requests(app, args.requests)
+
+        timings[name] = {'request': request_time}
+        response_headers[name] = {'average_bytes': header_size, 'session_cookies_set': cookies_set}
+
+    finish(build_report('sessions', timings, requests=args.requests, response_headers=response_headers), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure how long a worker takes to start.
+
+Run from the root of the repository, after the content has been built into app/content:
+
+    python -m benchmarks.startup --config production --output startup.json
+    python -m benchmarks.startup --config production --baseline startup.json
+
+The report has the time taken to import the app, to run `create_app` (the first, cold run and the
+median of all the runs), to set up the template loader, to register each blueprint and to load each
+framework's manifests and messages. It doesn't need the network.
+"""
+import time
+
+from .report import new_argument_parser, build_report, finish
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def _time(func, *args, **kwargs):
+    start_time = time.time()
+    func(*args, **kwargs)
+    return time.time() - start_time
+
+
+def main():
+    parser = new_argument_parser(__doc__.splitlines()[0])
+    parser.add_argument('--config', default='development', help="The config to create the app with")
+    parser.add_argument('--runs', type=int, default=5, help="How many times to create the app (default 5)")
+    args = parser.parse_args()
+
+    # the app is imported here, rather than at the top of the module, so that importing it can be timed
+    start_time = time.time()
+    from flask import Flask
+    from app import create_app
+    from app.main import main as main_blueprint, content_loader
+    from app.status import status as status_blueprint
+    from config import configs
+    import_time = time.time() - start_time
+
+    create_app_times = [_time(create_app, args.config) for _ in range(args.runs)]
+
+    template_loader_time = _time(configs[args.config].init_app, Flask('app'))
+
+    blueprint_times = {}
+    for blueprint in [status_blueprint, main_blueprint]:
+        blueprint_times[blueprint.name] = _time(
+            Flask('app').register_blueprint, blueprint, url_prefix='/suppliers'
+        )
+
+    content_loader.preload(content_loader.declared_frameworks())
+    content_times = {}
+    for key, load_time in content_loader.load_times.items():
+        kind, framework_slug = key[:2]
+        content_times.setdefault(framework_slug, {})[key[2] if kind == 'manifest' else kind] = load_time
+
+    timings = {
+        'import_app': import_time,
+        'create_app': {
+            'first': create_app_times[0],
+            'median': _median(create_app_times),
+        },
+        'template_loader': template_loader_time,
+        'register_blueprint': blueprint_times,
+        'content': content_times,
+        'content_total': sum(content_loader.load_times.values()),
+    }
+
+    finish(build_report('startup', timings, config=args.config, runs=args.runs), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,10 @@ import jinja2
 from dmutils.status import enabled_since, get_version_label
 from dmutils.asset_fingerprint import AssetFingerprinter
 
+# Files shared by the app's workers on a machine, kept with the app rather than in the shared temp directory.
+# The app creates its folders here so that only the app's user can access them
+DATA_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'var')
+
 
 class Config(object):
 
@@ -17,12 +21,41 @@ class Config(object):
     SESSION_COOKIE_SECURE = True
 
     PERMANENT_SESSION_LIFETIME = 4*3600
+    # How much of PERMANENT_SESSION_LIFETIME passes before a user's next request refreshes their session
+    DM_SESSION_REFRESH_FRACTION = 0.05
+    # Where sessions are kept: None for signed cookies, 'memory' for the worker's memory (single worker only)
+    # or 'sqlite' for an SQLite file at DM_SESSION_STORE_PATH shared by the workers on a machine. The session
+    # cookie is shared with the other Digital Marketplace frontends, one of which logs users in, so a store
+    # can only be used if every frontend sharing the cookie uses the same one
+    DM_SESSION_STORE = None
+    DM_SESSION_STORE_PATH = None
 
     WTF_CSRF_ENABLED = True
     WTF_CSRF_TIME_LIMIT = None
 
     DM_DATA_API_URL = None
     DM_DATA_API_AUTH_TOKEN = None
+    # Connections to the Data API kept open by each worker, and how long calls wait to connect and for a response
+    DM_DATA_API_POOL_SIZE = 10
+    DM_DATA_API_CONNECT_TIMEOUT = 5
+    DM_DATA_API_READ_TIMEOUT = 30
+    # Calls to a family of Data API endpoints fail straight away once this fraction of the last
+    # DM_DATA_API_CIRCUIT_WINDOW calls have failed, for DM_DATA_API_CIRCUIT_RESET_TIMEOUT seconds. A window
+    # of 0 turns that check off
+    DM_DATA_API_CIRCUIT_FAILURE_RATE = 0.5
+    DM_DATA_API_CIRCUIT_WINDOW = 20
+    DM_DATA_API_CIRCUIT_MINIMUM_CALLS = 10
+    DM_DATA_API_CIRCUIT_RESET_TIMEOUT = 30
+    # How many calls to a family of endpoints each worker makes at once, and how many seconds extra calls
+    # wait for one of them to finish before failing. None limits them to DM_DATA_API_POOL_SIZE, and 0
+    # doesn't limit them
+    DM_DATA_API_CONCURRENCY_LIMIT = None
+    DM_DATA_API_CONCURRENCY_TIMEOUT = 5
+    # How long, in seconds, each worker keeps the logged in users it has loaded, and how many it keeps.
+    # Each worker has its own cache, so a deactivated or locked user can stay logged in for up to
+    # DM_USER_CACHE_TTL seconds on workers that have them cached
+    DM_USER_CACHE_TTL = 30
+    DM_USER_CACHE_SIZE = 2000
     DM_MANDRILL_API_KEY = None
     DM_CLARIFICATION_QUESTION_EMAIL = 'digitalmarketplace@mailinator.com'
     DM_FRAMEWORK_AGREEMENTS_EMAIL = 'enquiries@example.com'
@@ -33,6 +66,66 @@ class Config(object):
     DM_SUBMISSIONS_BUCKET = None
     DM_ASSETS_URL = None
 
+    # How long framework documents from the API are cached for, in seconds. Requests that save answers to
+    # a framework check its status with the API, but other pages can take this long to show changes
+    DM_FRAMEWORK_CACHE_TTL = 60
+    # How long the listing of each framework's communications files is cached for, in seconds
+    DM_COMMUNICATIONS_CACHE_TTL = 120
+    # How long signed document download URLs are valid for, and how long they're reused for, in seconds.
+    # The cache TTL has to be shorter than the expiry, so users aren't sent to URLs about to expire. A URL
+    # handed out always has at least the difference left, which matches the 30 seconds dmutils signs for
+    DM_SIGNED_URL_EXPIRY = 60
+    DM_SIGNED_URL_CACHE_TTL = 30
+    # How many idle S3 clients, with their open connections, each worker keeps for each bucket
+    DM_S3_POOL_SIZE = 10
+    # Threads per worker used to make independent API and S3 calls for a page at the same time
+    DM_API_FANOUT_POOL_SIZE = 8
+    # Log a warning for requests that spend longer than this many seconds on Data API calls, or make more calls
+    DM_API_SLOW_REQUEST_TIME = 1.0
+    DM_API_SLOW_REQUEST_CALLS = 20
+    # How many content manifests, filtered by lot and other answers, are kept per worker
+    DM_FILTERED_MANIFEST_CACHE_SIZE = 500
+    # How many messages, like contract variations filtered for a supplier, are kept per worker
+    DM_FILTERED_MESSAGE_CACHE_SIZE = 1000
+    # How often, in seconds, content that's loaded as it's needed is checked for changes to its files
+    DM_CONTENT_RELOAD_CHECK_INTERVAL = 60
+    # Frameworks whose content is loaded when the app starts, rather than when it's first used
+    DM_PRELOAD_FRAMEWORK_CONTENT = []
+    # How long to remember which sections of a supplier's declaration were complete, in seconds
+    DM_DECLARATION_STATE_CACHE_TTL = 3600
+    # Directory that workers share compiled templates through. Templates are compiled in each worker if it's None
+    DM_TEMPLATE_BYTECODE_CACHE_DIR = None
+    # Record how long each template, included template and imported macro takes to render, shown on /_status
+    DM_PROFILE_TEMPLATES = False
+    # Directory that emails are queued in to be sent by background threads. They're sent during the request if it's None
+    DM_EMAIL_OUTBOX_DIR = None
+    # Threads per worker sending queued emails
+    DM_EMAIL_OUTBOX_SENDERS = 2
+    # How many times to try sending a queued email, waiting DM_EMAIL_OUTBOX_RETRY_DELAY seconds after the
+    # first failure and twice as long after each one after that
+    DM_EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+    DM_EMAIL_OUTBOX_RETRY_DELAY = 30
+    # 'mandrill' to send emails, or 'file' to write them to DM_EMAIL_FILE_TRANSPORT_DIR as JSON instead
+    DM_EMAIL_TRANSPORT = 'mandrill'
+    DM_EMAIL_FILE_TRANSPORT_DIR = None
+    # Audit events waiting to be created by each worker's background flusher. They're created during the request if 0
+    DM_AUDIT_EVENT_QUEUE_SIZE = 1000
+    # Most audit events sent in one go, and the longest an event waits in the queue, in seconds
+    DM_AUDIT_EVENT_BATCH_SIZE = 50
+    DM_AUDIT_EVENT_FLUSH_INTERVAL = 1
+    # Directory for audit events that couldn't be created or queued, to be created later
+    DM_AUDIT_EVENT_SPILL_DIR = None
+    # Uploaded documents must be smaller than this many bytes. Uploads are kept in memory up to
+    # DM_UPLOAD_SPOOL_MEMORY_SIZE bytes while they're checked, and in a temporary file after that
+    DM_MAX_UPLOAD_SIZE = 5400000
+    DM_UPLOAD_SPOOL_MEMORY_SIZE = 1024 * 1024
+    # Have browsers upload signature pages and service documents straight to S3 using signed forms that
+    # expire after DM_DIRECT_UPLOAD_EXPIRY seconds, rather than through the app. Uploads are staged under
+    # direct-uploads/ in the bucket until the user confirms them, so the agreements and submissions buckets
+    # need a lifecycle rule expiring objects under direct-uploads/ after a day before this is turned on
+    DM_DIRECT_UPLOADS = False
+    DM_DIRECT_UPLOAD_EXPIRY = 3600
+
     DEBUG = False
 
     RESET_PASSWORD_EMAIL_NAME = 'Digital Marketplace Admin'
@@ -103,6 +196,16 @@ class Test(Config):
     FEATURE_FLAGS_NEW_SUPPLIER_FLOW = enabled_since('2016-11-29')
 
     DM_DATA_API_AUTH_TOKEN = 'myToken'
+    DM_FRAMEWORK_CACHE_TTL = 0
+    DM_COMMUNICATIONS_CACHE_TTL = 0
+    DM_SIGNED_URL_CACHE_TTL = 0
+    DM_S3_POOL_SIZE = 0
+    DM_DATA_API_CIRCUIT_WINDOW = 0
+    DM_DATA_API_CONCURRENCY_LIMIT = 0
+    DM_USER_CACHE_TTL = 0
+    DM_CONTENT_RELOAD_CHECK_INTERVAL = 0
+    DM_DECLARATION_STATE_CACHE_TTL = 0
+    DM_AUDIT_EVENT_QUEUE_SIZE = 0
 
     SECRET_KEY = 'not_very_secret'
 
@@ -131,6 +234,10 @@ class Development(Config):
     DM_ASSETS_URL = "https://{}.s3-eu-west-1.amazonaws.com".format(DM_SUBMISSIONS_BUCKET)
 
     DM_MANDRILL_API_KEY = "not_a_real_key"
+    DM_EMAIL_OUTBOX_DIR = os.path.join(DATA_DIR, 'outbox')
+    DM_AUDIT_EVENT_SPILL_DIR = os.path.join(DATA_DIR, 'audit-events')
+    DM_EMAIL_TRANSPORT = 'file'
+    DM_EMAIL_FILE_TRANSPORT_DIR = os.path.join(DATA_DIR, 'emails')
     SHARED_EMAIL_KEY = "very_secret"
     SECRET_KEY = 'verySecretKey'
 
@@ -143,6 +250,11 @@ class Live(Config):
 
     DM_FRAMEWORK_AGREEMENTS_EMAIL = 'enquiries@digitalmarketplace.service.gov.uk'
 
+    DM_PRELOAD_FRAMEWORK_CONTENT = ['g-cloud-9', 'digital-outcomes-and-specialists-2']
+    DM_TEMPLATE_BYTECODE_CACHE_DIR = os.path.join(DATA_DIR, 'templates')
+    DM_EMAIL_OUTBOX_DIR = os.path.join(DATA_DIR, 'outbox')
+    DM_AUDIT_EVENT_SPILL_DIR = os.path.join(DATA_DIR, 'audit-events')
+
 
 class Preview(Live):
     FEATURE_FLAGS_CONTRACT_VARIATION = enabled_since('2016-08-22')
@@ -0,0 +1,63 @@
+import mock
+
+from app.main.helpers.communications import CommunicationsIndex, communications_cache, get_communications_index
+from ...helpers import BaseApplicationTest
+
+
+def _key(path, last_modified):
+    return {'path': path, 'last_modified': last_modified}
+
+
+KEY_LIST = [
+    _key('g-cloud-8/communications/g-cloud-8-invitation.pdf', '2016-06-01T14:00:00.000Z'),
+    _key('g-cloud-8/communications/updates/communications/first.pdf', '2016-06-02T14:00:00.000Z'),
+    _key('g-cloud-8/communications/updates/clarifications/answers.pdf', '2016-06-03T14:00:00.000Z'),
+    _key('g-cloud-8/communications/updates/communications/second.pdf', '2016-06-04T14:00:00.000Z'),
+]
+
+
+class TestCommunicationsIndex(object):
+    def setup_method(self, method):
+        self.index = CommunicationsIndex('g-cloud-8', KEY_LIST)
+
+    def test_last_modified_for_a_file(self):
+        assert self.index.last_modified('communications/g-cloud-8-invitation.pdf') == '2016-06-01T14:00:00.000Z'
+
+    def test_last_modified_for_a_folder_is_the_newest_file_in_it(self):
+        assert self.index.last_modified('communications/updates/') == '2016-06-04T14:00:00.000Z'
+        assert self.index.last_modified('communications/updates/clarifications/') == '2016-06-03T14:00:00.000Z'
+
+    def test_last_modified_for_a_missing_file_is_none(self):
+        assert self.index.last_modified('communications/g-cloud-8-final-call-off.pdf') is None
+
+    def test_files_in_folder_keep_listing_order(self):
+        files = self.index.files_in('communications/updates/communications/')
+
+        assert [f['path'] for f in files] == [
+            'g-cloud-8/communications/updates/communications/first.pdf',
+            'g-cloud-8/communications/updates/communications/second.pdf',
+        ]
+
+    def test_files_in_folder_are_copies(self):
+        self.index.files_in('communications/updates/')[0]['path'] = 'changed'
+
+        assert self.index.files_in('communications/updates/')[0]['path'] != 'changed'
+
+
+@mock.patch('dmutils.s3.S3')
+class TestGetCommunicationsIndex(BaseApplicationTest):
+    def teardown_method(self, method):
+        communications_cache.configure(ttl=0)
+        super(TestGetCommunicationsIndex, self).teardown_method(method)
+
+    def test_bucket_is_listed_once_while_cached(self, s3):
+        communications_cache.configure(ttl=60)
+        s3.return_value.list.return_value = KEY_LIST
+
+        with self.app.app_context():
+            get_communications_index('g-cloud-8')
+            index = get_communications_index('g-cloud-8')
+
+        assert index.last_modified('communications/updates/') == '2016-06-04T14:00:00.000Z'
+        s3.assert_called_once_with('digitalmarketplace-communications-dev-dev')
+        s3.return_value.list.assert_called_once_with('g-cloud-8', load_timestamps=True)
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+from flask_login import current_user, login_user
+from werkzeug.exceptions import NotFound
+from flask import abort
+from dmutils.user import User
+
+from app.api_client import get_request_api_timings
+from app.main.helpers.concurrency import fetch_concurrently
+from ...helpers import BaseApplicationTest
+
+
+class TestFetchConcurrently(BaseApplicationTest):
+    def _login(self):
+        login_user(User.from_json(self.user(123, "email@email.com", 1234, u'Supplier Name', u'Name')))
+
+    def test_results_are_returned_in_order(self):
+        with self.app.test_request_context('/'):
+            self._login()
+            assert fetch_concurrently(lambda: 1, lambda: 2, lambda: 3) == [1, 2, 3]
+
+    def test_calls_run_on_pool_threads_with_the_current_user(self):
+        with self.app.test_request_context('/'):
+            self._login()
+            results = fetch_concurrently(
+                lambda: (threading.current_thread(), current_user.supplier_id),
+                lambda: (threading.current_thread(), current_user.supplier_id),
+            )
+
+        assert all(thread is not threading.current_thread() for thread, _ in results)
+        assert [supplier_id for _, supplier_id in results] == [1234, 1234]
+
+    def test_api_timings_from_pool_threads_are_kept_for_the_request(self):
+        with self.app.test_request_context('/'):
+            self._login()
+            fetch_concurrently(
+                lambda: get_request_api_timings().append(('get_framework', 0.1, 'ok')),
+                lambda: get_request_api_timings().append(('get_supplier', 0.1, 'ok')),
+            )
+
+            assert sorted(name for name, _, _ in get_request_api_timings()) == ['get_framework', 'get_supplier']
+
+    def test_exceptions_are_raised_in_the_calling_thread(self):
+        with self.app.test_request_context('/'):
+            self._login()
+            with pytest.raises(NotFound):
+                fetch_concurrently(lambda: 1, lambda: abort(404))
+
+    def test_calls_run_in_the_calling_thread_if_the_pool_is_disabled(self):
+        self.app.config['DM_API_FANOUT_POOL_SIZE'] = 1
+        with self.app.test_request_context('/'):
+            self._login()
+            results = fetch_concurrently(threading.current_thread, threading.current_thread)
+
+        assert results == [threading.current_thread(), threading.current_thread()]
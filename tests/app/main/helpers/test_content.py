@@ -0,0 +1,196 @@
+import os
+
+import pytest
+from dmcontent.content_loader import ContentManifest, ContentNotFoundError
+
+from app.main.helpers.content import (
+    get_filtered_manifest, filtered_manifest_cache, get_filtered_message, filtered_message_cache, LazyContentLoader
+)
+
+
+class StubContentLoader(object):
+    def __init__(self):
+        self.manifests_built = 0
+
+    def get_manifest(self, framework_slug, manifest):
+        self.manifests_built += 1
+        return ContentManifest([
+            {
+                'slug': 'service-name',
+                'name': 'Service name',
+                'questions': [{'id': 'serviceName', 'question': 'Service name', 'type': 'text'}],
+            },
+            {
+                'slug': 'pricing',
+                'name': 'Pricing',
+                'questions': [
+                    {
+                        'id': 'priceString',
+                        'question': 'Price',
+                        'type': 'text',
+                        'depends': [{'on': 'lot', 'being': ['SaaS']}],
+                    },
+                    {
+                        'id': 'vatIncluded',
+                        'question': 'VAT included',
+                        'type': 'boolean',
+                        'depends': [{'on': 'pricingModel', 'being': ['fixed']}],
+                    },
+                ],
+            },
+        ])
+
+
+class TestGetFilteredManifest(object):
+    def setup_method(self, method):
+        filtered_manifest_cache.configure(ttl=None, max_size=10)
+        self.content_loader = StubContentLoader()
+
+    def teardown_method(self, method):
+        filtered_manifest_cache.configure(ttl=None, max_size=0)
+
+    def test_manifest_is_filtered_by_the_keys_questions_depend_on(self):
+        content = get_filtered_manifest(
+            self.content_loader, 'g-cloud-8', 'edit_submission', {'lot': 'SaaS', 'pricingModel': 'fixed'}
+        )
+
+        assert content.get_question('priceString')
+        assert content.get_question('vatIncluded')
+
+    def test_drafts_with_the_same_answers_share_a_filtered_manifest(self):
+        drafts = [{'id': i, 'lot': 'SaaS', 'serviceName': 'Service {}'.format(i)} for i in range(200)]
+
+        manifests = [
+            get_filtered_manifest(self.content_loader, 'g-cloud-8', 'edit_submission', draft) for draft in drafts
+        ]
+
+        assert all(manifest is manifests[0] for manifest in manifests)
+        assert self.content_loader.manifests_built == 2
+
+    def test_drafts_with_different_answers_are_filtered_separately(self):
+        saas = get_filtered_manifest(self.content_loader, 'g-cloud-8', 'edit_submission', {'lot': 'SaaS'})
+        iaas = get_filtered_manifest(self.content_loader, 'g-cloud-8', 'edit_submission', {'lot': 'IaaS'})
+
+        assert saas.get_question('priceString')
+        assert iaas.get_question('priceString') is None
+        assert saas is not get_filtered_manifest(self.content_loader, 'g-cloud-9', 'edit_submission', {'lot': 'SaaS'})
+
+    def test_manifests_are_filtered_every_time_when_the_cache_is_off(self):
+        filtered_manifest_cache.configure(ttl=None, max_size=0)
+
+        get_filtered_manifest(self.content_loader, 'g-cloud-8', 'edit_submission', {'lot': 'SaaS'})
+        get_filtered_manifest(self.content_loader, 'g-cloud-8', 'edit_submission', {'lot': 'SaaS'})
+
+        assert self.content_loader.manifests_built == 4
+
+
+@pytest.fixture
+def content_path(tmpdir):
+    framework = tmpdir.mkdir('frameworks').mkdir('g-cloud-9')
+    framework.mkdir('manifests').join('edit_submission.yml').write('- name: About\n  questions:\n    - serviceName\n')
+    framework.mkdir('questions').mkdir('services').join('serviceName.yml').write('question: Service name\ntype: text\n')
+    messages = framework.mkdir('messages')
+    messages.join('dates.yml').write('framework_close_date: Tuesday\n')
+    messages.join('contract_variation_1.yml').write('title: Variation for {{ supplier_name }}\n')
+    return str(tmpdir)
+
+
+class TestLazyContentLoader(object):
+    def test_declared_content_is_not_loaded_straight_away(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+        content_loader.declare_manifest('g-cloud-9', 'services', 'edit_submission')
+        content_loader.declare_messages('g-cloud-9', ['dates'])
+
+        assert content_loader.load_times == {}
+
+    def test_manifest_is_loaded_on_first_use(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+        content_loader.declare_manifest('g-cloud-9', 'services', 'edit_submission')
+
+        assert content_loader.get_manifest('g-cloud-9', 'edit_submission').get_question('serviceName')
+        assert content_loader.get_manifest('g-cloud-9', 'edit_submission').get_question('serviceName')
+        assert list(content_loader.load_times) == [('manifest', 'g-cloud-9', 'edit_submission')]
+
+    def test_messages_are_loaded_on_first_use(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+        content_loader.declare_messages('g-cloud-9', ['dates'])
+
+        assert content_loader.get_message('g-cloud-9', 'dates', 'framework_close_date') == 'Tuesday'
+        assert list(content_loader.load_times) == [('messages', 'g-cloud-9')]
+
+    def test_preload_loads_everything_declared_for_a_framework(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+        content_loader.declare_manifest('g-cloud-9', 'services', 'edit_submission')
+        content_loader.declare_messages('g-cloud-9', ['dates'])
+
+        content_loader.preload(['g-cloud-9'])
+
+        assert set(content_loader.load_times) == {
+            ('manifest', 'g-cloud-9', 'edit_submission'),
+            ('messages', 'g-cloud-9'),
+        }
+
+    def test_undeclared_manifests_are_not_found(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+
+        with pytest.raises(ContentNotFoundError):
+            content_loader.get_manifest('g-cloud-9', 'edit_submission')
+
+    def test_undeclared_messages_are_loaded_once(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+
+        version = content_loader.load_messages_if_changed('g-cloud-9', 'contract_variation_1')
+        load_time = content_loader.load_times[('messages', 'g-cloud-9', 'contract_variation_1')]
+
+        assert content_loader.load_messages_if_changed('g-cloud-9', 'contract_variation_1') == version
+        assert content_loader.load_times[('messages', 'g-cloud-9', 'contract_variation_1')] is load_time
+        assert content_loader.get_message('g-cloud-9', 'contract_variation_1').filter(
+            {'supplier_name': 'Acme'}
+        ).title == 'Variation for Acme'
+
+    def test_undeclared_messages_are_reloaded_when_their_file_changes(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+        path = os.path.join(content_path, 'frameworks', 'g-cloud-9', 'messages', 'contract_variation_1.yml')
+
+        version = content_loader.load_messages_if_changed('g-cloud-9', 'contract_variation_1')
+        with open(path, 'w') as f:
+            f.write('title: Changed\n')
+        os.utime(path, (version + 10, version + 10))
+
+        assert content_loader.load_messages_if_changed('g-cloud-9', 'contract_variation_1') == version + 10
+        assert content_loader.get_message('g-cloud-9', 'contract_variation_1', 'title') == 'Changed'
+
+    def test_changes_are_not_checked_for_until_the_interval_has_passed(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+        content_loader.reload_check_interval = 60
+        path = os.path.join(content_path, 'frameworks', 'g-cloud-9', 'messages', 'contract_variation_1.yml')
+
+        version = content_loader.load_messages_if_changed('g-cloud-9', 'contract_variation_1')
+        os.utime(path, (version + 10, version + 10))
+
+        assert content_loader.load_messages_if_changed('g-cloud-9', 'contract_variation_1') == version
+
+    def test_missing_undeclared_messages_are_not_found(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+
+        with pytest.raises(ContentNotFoundError):
+            content_loader.load_messages_if_changed('g-cloud-9', 'contract_variation_2')
+
+
+class TestGetFilteredMessage(object):
+    def setup_method(self, method):
+        filtered_message_cache.configure(ttl=None, max_size=10)
+
+    def teardown_method(self, method):
+        filtered_message_cache.configure(ttl=None, max_size=0)
+
+    def test_messages_are_filtered_once_for_each_context(self, content_path):
+        content_loader = LazyContentLoader(content_path)
+
+        first = get_filtered_message(content_loader, 'g-cloud-9', 'contract_variation_1', {'supplier_name': 'Acme'})
+        second = get_filtered_message(content_loader, 'g-cloud-9', 'contract_variation_1', {'supplier_name': 'Acme'})
+        other = get_filtered_message(content_loader, 'g-cloud-9', 'contract_variation_1', {'supplier_name': 'Other'})
+
+        assert first is second
+        assert first.title == 'Variation for Acme'
+        assert other.title == 'Variation for Other'
@@ -0,0 +1,160 @@
+import hashlib
+
+import mock
+import pytest
+from flask import Flask
+
+from app.main.helpers.direct_uploads import (
+    DirectUploadError, direct_upload_form, check_direct_upload, move_direct_upload
+)
+from app.main.helpers.uploads import SIGNATURE_PAGE_EXTENSIONS
+
+
+class LocalKey(object):
+    def __init__(self, contents):
+        self.contents = contents
+        self.size = len(contents)
+        self.etag = '"{}"'.format(hashlib.md5(contents).hexdigest())
+
+    def get_contents_as_string(self, headers=None):
+        start, end = headers['Range'][len('bytes='):].split('-')
+        return self.contents[int(start):int(end) + 1]
+
+
+class LocalBucket(object):
+    """Enough of a boto bucket, kept in memory, to upload, check and move files"""
+
+    def __init__(self, name='digitalmarketplace-agreements-dev-dev'):
+        self.name = name
+        self.keys = {}
+        self.copies = []
+        self.connection = mock.Mock()
+
+    def get_key(self, path):
+        return self.keys.get(path)
+
+    def copy_key(self, new_key_name, src_bucket_name, src_key_name, metadata=None, headers=None):
+        assert src_bucket_name == self.name
+        self.keys[new_key_name] = self.keys[src_key_name]
+        self.copies.append((new_key_name, metadata, headers))
+
+    def delete_key(self, path):
+        self.keys.pop(path, None)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(DM_MAX_UPLOAD_SIZE=100, DM_DIRECT_UPLOAD_EXPIRY=600)
+    return app
+
+
+@pytest.fixture
+def uploader():
+    return mock.Mock(bucket=LocalBucket())
+
+
+STAGING_KEY = 'direct-uploads/g-cloud-8/1234/abc/signature.pdf'
+SIGNATURE = b'%PDF-1.4 signature'
+ETAG = hashlib.md5(SIGNATURE).hexdigest()
+
+
+class TestDirectUploadForm(object):
+    def test_form_is_signed_for_the_suppliers_staging_folder(self, app, uploader):
+        with app.app_context():
+            form = direct_upload_form(uploader, 'g-cloud-8', 1234, 'https://example.com/complete')
+
+        assert form == uploader.bucket.connection.build_post_form_args.return_value
+        args, kwargs = uploader.bucket.connection.build_post_form_args.call_args
+        bucket_name, key = args
+        assert bucket_name == 'digitalmarketplace-agreements-dev-dev'
+        assert key.startswith('direct-uploads/g-cloud-8/1234/')
+        assert key.endswith('/${filename}')
+        assert kwargs == {
+            'expires_in': 600,
+            'acl': 'private',
+            'success_action_redirect': 'https://example.com/complete',
+            'max_content_length': 99,
+            'http_method': 'https',
+        }
+
+    def test_each_form_uploads_to_a_new_folder(self, app, uploader):
+        with app.app_context():
+            direct_upload_form(uploader, 'g-cloud-8', 1234, 'https://example.com/complete')
+            direct_upload_form(uploader, 'g-cloud-8', 1234, 'https://example.com/complete')
+
+        first, second = uploader.bucket.connection.build_post_form_args.call_args_list
+        assert first[0][1] != second[0][1]
+
+
+class TestCheckDirectUpload(object):
+    def test_valid_upload_returns_the_uploaded_filename(self, app, uploader):
+        uploader.bucket.keys[STAGING_KEY] = LocalKey(SIGNATURE)
+
+        with app.app_context():
+            assert check_direct_upload(
+                uploader, STAGING_KEY, ETAG, 'g-cloud-8', 1234, SIGNATURE_PAGE_EXTENSIONS
+            ) == 'signature.pdf'
+
+        assert STAGING_KEY in uploader.bucket.keys
+
+    @pytest.mark.parametrize('etag', [None, '', hashlib.md5(b'another file').hexdigest()])
+    def test_uploads_that_dont_match_the_uploaded_etag_are_missing(self, app, uploader, etag):
+        uploader.bucket.keys[STAGING_KEY] = LocalKey(SIGNATURE)
+
+        with app.app_context(), pytest.raises(DirectUploadError) as e:
+            check_direct_upload(uploader, STAGING_KEY, etag, 'g-cloud-8', 1234, SIGNATURE_PAGE_EXTENSIONS)
+
+        assert e.value.reason == 'missing'
+        assert STAGING_KEY in uploader.bucket.keys
+
+    @pytest.mark.parametrize('key,supplier_id', [
+        (None, 1234),
+        ('direct-uploads/g-cloud-8/1234/abc/other.pdf', 1234),
+        (STAGING_KEY, 2345),
+        ('g-cloud-8/agreements/1234/signature.pdf', 1234),
+    ])
+    def test_uploads_outside_the_suppliers_staging_folder_are_missing(self, app, uploader, key, supplier_id):
+        uploader.bucket.keys[STAGING_KEY] = LocalKey(SIGNATURE)
+        uploader.bucket.keys['g-cloud-8/agreements/1234/signature.pdf'] = LocalKey(SIGNATURE)
+
+        with app.app_context(), pytest.raises(DirectUploadError) as e:
+            check_direct_upload(uploader, key, ETAG, 'g-cloud-8', supplier_id, SIGNATURE_PAGE_EXTENSIONS)
+
+        assert e.value.reason == 'missing'
+
+    @pytest.mark.parametrize('contents,filename,reason', [
+        (b'', 'signature.pdf', 'empty'),
+        (b'%PDF' + b'x' * 96, 'signature.pdf', 'size'),
+        (b'not really a pdf', 'signature.pdf', 'format'),
+        (b'\x89PNG\r\n\x1a\nimage', 'signature.pdf', 'format'),
+        (b'%PDF-1.4 signature', 'signature.txt', 'format'),
+    ])
+    def test_invalid_uploads_are_removed(self, app, uploader, contents, filename, reason):
+        key = 'direct-uploads/g-cloud-8/1234/abc/{}'.format(filename)
+        uploader.bucket.keys[key] = LocalKey(contents)
+
+        with app.app_context(), pytest.raises(DirectUploadError) as e:
+            check_direct_upload(
+                uploader, key, hashlib.md5(contents).hexdigest(), 'g-cloud-8', 1234, SIGNATURE_PAGE_EXTENSIONS
+            )
+
+        assert e.value.reason == reason
+        assert uploader.bucket.keys == {}
+
+
+class TestMoveDirectUpload(object):
+    def test_upload_is_moved_with_the_headers_it_would_be_saved_with(self, uploader):
+        uploader.bucket.keys[STAGING_KEY] = LocalKey(SIGNATURE)
+
+        move_direct_upload(
+            uploader, STAGING_KEY, ETAG, 'g-cloud-8/agreements/1234/signed.pdf',
+            acl='private', download_filename='Supplier-1234-signed.pdf', disposition_type='inline'
+        )
+
+        assert list(uploader.bucket.keys) == ['g-cloud-8/agreements/1234/signed.pdf']
+        path, metadata, headers = uploader.bucket.copies[0]
+        assert metadata['Content-Type'] == 'application/pdf'
+        assert metadata['Content-Disposition'] == 'inline; filename="Supplier-1234-signed.pdf"'
+        assert 'timestamp' in metadata
+        assert headers == {'x-amz-acl': 'private', 'x-amz-copy-source-if-match': '"{}"'.format(ETAG)}
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 import pytest
 import mock
+from flask import Flask
 from werkzeug.exceptions import HTTPException
 
 from app.main.helpers.frameworks import (
     get_statuses_for_lot, return_supplier_framework_info_if_on_framework_or_abort,
-    check_agreement_is_related_to_supplier_framework_or_abort
+    check_agreement_is_related_to_supplier_framework_or_abort, get_framework, get_frameworks,
+    framework_cache, invalidate_framework_cache
 )
 
 
@@ -364,3 +366,85 @@ def test_check_agreement_is_related_to_supplier_framework_or_abort_does_not_abor
     supplier_framework = {"supplierId": 212, "frameworkSlug": 'g-cloud-8'}
     agreement = {"supplierId": 212, "frameworkSlug": 'g-cloud-8'}
     check_agreement_is_related_to_supplier_framework_or_abort(agreement, supplier_framework)
+
+
+@pytest.yield_fixture
+def enabled_framework_cache():
+    framework_cache.configure(ttl=60)
+    yield framework_cache
+    framework_cache.configure(ttl=0)
+
+
+def test_get_framework_is_cached_across_calls(enabled_framework_cache):
+    data_api_client = mock.Mock()
+    data_api_client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-8', 'status': 'live'}}
+
+    get_framework(data_api_client, 'g-cloud-8')['status'] = 'changed'
+
+    assert get_framework(data_api_client, 'g-cloud-8') == {'slug': 'g-cloud-8', 'status': 'live'}
+    data_api_client.get_framework.assert_called_once_with('g-cloud-8')
+    assert enabled_framework_cache.stats()['hits'] == 1
+
+
+def test_get_framework_checks_allowed_statuses_against_cached_framework(enabled_framework_cache):
+    data_api_client = mock.Mock()
+    data_api_client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-8', 'status': 'live'}}
+
+    get_framework(data_api_client, 'g-cloud-8')
+    with pytest.raises(HTTPException):
+        get_framework(data_api_client, 'g-cloud-8', allowed_statuses=['open'])
+
+
+def test_get_frameworks_is_cached_across_calls(enabled_framework_cache):
+    data_api_client = mock.Mock()
+    data_api_client.find_frameworks.return_value = {'frameworks': [{'slug': 'g-cloud-8', 'status': 'live'}]}
+
+    get_frameworks(data_api_client)
+    get_frameworks(data_api_client)
+
+    assert data_api_client.find_frameworks.call_count == 1
+
+
+def test_invalidate_framework_cache(enabled_framework_cache):
+    data_api_client = mock.Mock()
+    data_api_client.get_framework.return_value = {'frameworks': {'slug': 'g-cloud-8', 'status': 'live'}}
+    data_api_client.find_frameworks.return_value = {'frameworks': [{'slug': 'g-cloud-8', 'status': 'live'}]}
+
+    get_framework(data_api_client, 'g-cloud-8')
+    get_frameworks(data_api_client)
+    invalidate_framework_cache('g-cloud-8')
+    get_framework(data_api_client, 'g-cloud-8')
+    get_frameworks(data_api_client)
+
+    assert data_api_client.get_framework.call_count == 2
+    assert data_api_client.find_frameworks.call_count == 2
+
+
+def test_get_framework_fetches_the_framework_again_before_turning_the_request_away(enabled_framework_cache):
+    data_api_client = mock.Mock()
+    data_api_client.get_framework.side_effect = [
+        {'frameworks': {'slug': 'g-cloud-8', 'status': 'coming'}},
+        {'frameworks': {'slug': 'g-cloud-8', 'status': 'open'}},
+    ]
+
+    get_framework(data_api_client, 'g-cloud-8', allowed_statuses=['coming'])
+
+    assert get_framework(data_api_client, 'g-cloud-8', allowed_statuses=['open'])['status'] == 'open'
+    assert get_framework(data_api_client, 'g-cloud-8')['status'] == 'open'
+    assert data_api_client.get_framework.call_count == 2
+
+
+def test_requests_that_change_data_check_the_framework_status_with_the_api(enabled_framework_cache):
+    data_api_client = mock.Mock()
+    data_api_client.get_framework.side_effect = [
+        {'frameworks': {'slug': 'g-cloud-8', 'status': 'open'}},
+        {'frameworks': {'slug': 'g-cloud-8', 'status': 'standstill'}},
+    ]
+    get_framework(data_api_client, 'g-cloud-8')
+
+    with Flask(__name__).test_request_context('/', method='GET'):
+        assert get_framework(data_api_client, 'g-cloud-8', allowed_statuses=['open'])['status'] == 'open'
+    with Flask(__name__).test_request_context('/', method='POST'), pytest.raises(HTTPException):
+        get_framework(data_api_client, 'g-cloud-8', allowed_statuses=['open'])
+    assert get_framework(data_api_client, 'g-cloud-8')['status'] == 'standstill'
+    assert data_api_client.get_framework.call_count == 2
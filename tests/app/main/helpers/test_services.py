@@ -0,0 +1,109 @@
+import mock
+import pytest
+from dmcontent.content_loader import ContentManifest
+from flask import Flask
+
+from app.main.helpers.content import filtered_manifest_cache
+from app.main.helpers.services import (
+    count_unanswered_questions, count_unanswered_questions_for_drafts, get_signed_document_url, signed_url_cache
+)
+
+
+class StubContentLoader(object):
+    def get_manifest(self, framework_slug, manifest):
+        return ContentManifest([
+            {
+                'slug': 'about',
+                'name': 'About',
+                'questions': [
+                    {'id': 'serviceName', 'question': 'Service name', 'type': 'text'},
+                    {'id': 'serviceSummary', 'question': 'Summary', 'type': 'textbox_large', 'optional': True},
+                ],
+            },
+            {
+                'slug': 'support',
+                'name': 'Support',
+                'questions': [
+                    {
+                        'id': 'supportTypes',
+                        'question': 'Support types',
+                        'type': 'checkboxes',
+                        'options': [{'label': 'Email'}, {'label': 'Phone'}],
+                        'depends': [{'on': 'lot', 'being': ['SaaS']}],
+                    },
+                    {
+                        'id': 'supportNotes',
+                        'question': 'Notes',
+                        'type': 'text',
+                        'optional': True,
+                        'depends': [{'on': 'lot', 'being': ['SaaS']}],
+                    },
+                ],
+            },
+        ])
+
+
+class TestCountUnansweredQuestionsForDrafts(object):
+    def setup_method(self, method):
+        filtered_manifest_cache.configure(ttl=None, max_size=10)
+        self.content_loader = StubContentLoader()
+
+    def teardown_method(self, method):
+        filtered_manifest_cache.configure(ttl=None, max_size=0)
+
+    def test_counts_match_counting_each_draft_summary(self):
+        drafts = [
+            {'lot': 'SaaS'},
+            {'lot': 'SaaS', 'serviceName': 'My service', 'supportTypes': ['Email']},
+            {'lot': 'IaaS', 'serviceSummary': 'A summary'},
+            {'lot': 'IaaS', 'serviceName': 'My service', 'serviceSummary': ''},
+            {'lot': 'SaaS', 'serviceName': 'My service', 'serviceSummary': 'A summary', 'supportNotes': 'Notes'},
+        ]
+
+        expected = [
+            count_unanswered_questions(self.content_loader.get_manifest('g-cloud-9', 'edit_submission').filter(
+                draft
+            ).summary(draft))
+            for draft in drafts
+        ]
+
+        assert count_unanswered_questions_for_drafts(self.content_loader, 'g-cloud-9', drafts) == expected
+        assert expected[0] == (2, 2)
+
+    def test_no_drafts(self):
+        assert count_unanswered_questions_for_drafts(self.content_loader, 'g-cloud-9', []) == []
+
+
+@pytest.yield_fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(DM_ASSETS_URL='https://assets.example.com', DM_SIGNED_URL_EXPIRY=60)
+    signed_url_cache.configure(ttl=30)
+    with app.app_context():
+        yield app
+    signed_url_cache.configure(ttl=0)
+
+
+@mock.patch('dmutils.s3.S3')
+class TestGetSignedDocumentUrl(object):
+    def test_url_is_signed_and_moved_to_the_assets_host(self, S3, app):
+        S3.return_value.get_signed_url.return_value = 'http://bucket.s3.amazonaws.com/path.pdf?Signature=abc'
+
+        assert get_signed_document_url('bucket', 'path.pdf') == 'https://assets.example.com/path.pdf?Signature=abc'
+        S3.assert_called_once_with('bucket')
+        S3.return_value.get_signed_url.assert_called_once_with('path.pdf', expires_in=60)
+
+    def test_signed_urls_are_reused_for_the_same_bucket_and_path(self, S3, app):
+        S3.return_value.get_signed_url.side_effect = ['http://s3/first?Signature=1', 'http://s3/second?Signature=2']
+
+        assert get_signed_document_url('bucket', 'first') == 'https://assets.example.com/first?Signature=1'
+        assert get_signed_document_url('bucket', 'first') == 'https://assets.example.com/first?Signature=1'
+        assert get_signed_document_url('other-bucket', 'first') == 'https://assets.example.com/second?Signature=2'
+        assert S3.call_count == 2
+
+    def test_missing_documents_are_not_cached(self, S3, app):
+        S3.return_value.get_signed_url.return_value = None
+
+        assert get_signed_document_url('bucket', 'missing.pdf') is None
+        assert get_signed_document_url('bucket', 'missing.pdf') is None
+        assert S3.return_value.get_signed_url.call_count == 2
@@ -0,0 +1,205 @@
+import hashlib
+from io import BytesIO
+
+import mock
+import pytest
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+from dmcontent.content_loader import ContentNotFoundError
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app.main.helpers.uploads import (
+    DOCUMENT_EXTENSIONS, SIGNATURE_PAGE_EXTENSIONS, read_upload, reject_oversized_uploads, upload_request_too_large,
+    upload_service_documents
+)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(DM_MAX_UPLOAD_SIZE=100, DM_UPLOAD_SPOOL_MEMORY_SIZE=10)
+    return app
+
+
+def file_storage(contents, filename='document.pdf'):
+    return FileStorage(BytesIO(contents), filename)
+
+
+class TestReadUpload(object):
+    def test_upload_is_measured_checksummed_and_spooled(self, app):
+        with app.app_context():
+            upload = read_upload(file_storage(b'%PDF-1.4 document'))
+
+        assert upload.size == 17
+        assert upload.checksum == hashlib.md5(b'%PDF-1.4 document').hexdigest()
+        assert upload.extension == '.pdf'
+        assert upload.format_extensions == ('.pdf', '.pda')
+        assert not upload.empty
+        assert not upload.too_large
+        assert upload.read() == b'%PDF-1.4 document'
+
+    def test_file_is_only_read_once(self, app):
+        stream = mock.Mock(wraps=BytesIO(b'%PDF-1.4 document'))
+        with app.app_context():
+            read_upload(FileStorage(stream, 'document.pdf'))
+
+        assert stream.seek.called is False
+        assert stream.read.call_count == 2
+
+    def test_reading_stops_once_the_upload_is_too_large(self, app):
+        with app.app_context():
+            with mock.patch('app.main.helpers.uploads.CHUNK_SIZE', 60):
+                upload = read_upload(file_storage(b'x' * 1000))
+
+        assert upload.too_large
+        assert upload.size == 120
+        assert upload.checksum is None
+
+    def test_empty_upload(self, app):
+        with app.app_context():
+            upload = read_upload(file_storage(b''))
+
+        assert upload.empty
+        assert upload.format_extensions is None
+
+    @pytest.mark.parametrize('contents,filename,extensions,has_format', [
+        (b'%PDF-1.4', 'signature.pdf', SIGNATURE_PAGE_EXTENSIONS, True),
+        (b'\xff\xd8\xff\xe0', 'signature.JPG', SIGNATURE_PAGE_EXTENSIONS, True),
+        (b'\x89PNG\r\n\x1a\n', 'signature.png', SIGNATURE_PAGE_EXTENSIONS, True),
+        (b'unrecognised', 'signature.png', SIGNATURE_PAGE_EXTENSIONS, False),
+        (b'\x89PNG\r\n\x1a\n', 'signature.pdf', SIGNATURE_PAGE_EXTENSIONS, False),
+        (b'%PDF-1.4', 'signature.txt', SIGNATURE_PAGE_EXTENSIONS, False),
+        (b'PK\x03\x04', 'pricing.ods', DOCUMENT_EXTENSIONS, True),
+        (b'PK\x03\x04', 'pricing.pdf', DOCUMENT_EXTENSIONS, False),
+        (b'%PDF-1.4', 'pricing.docx', DOCUMENT_EXTENSIONS, False),
+        (b'not a pdf', 'pricing.pdf', DOCUMENT_EXTENSIONS, False),
+        (b'<?xml version="1.0"?>', 'pricing.odt', DOCUMENT_EXTENSIONS, False),
+    ])
+    def test_has_format(self, app, contents, filename, extensions, has_format):
+        with app.app_context():
+            assert read_upload(file_storage(contents, filename)).has_format(extensions) is has_format
+
+
+class TestUploadRequestTooLarge(object):
+    @pytest.mark.parametrize('content_length,file_count,too_large', [
+        (None, 1, False),
+        (64 * 1024 + 100, 1, False),
+        (64 * 1024 + 101, 1, True),
+        (64 * 1024 + 101, 2, False),
+    ])
+    def test_content_length_is_checked(self, app, content_length, file_count, too_large):
+        request = mock.Mock(content_length=content_length)
+        with app.app_context(), mock.patch('app.main.helpers.uploads.request', request):
+            assert upload_request_too_large(file_count) is too_large
+
+
+class TestRejectOversizedUploads(object):
+    def setup_method(self, method):
+        self.content_loader_patch = mock.patch('app.main.content_loader')
+        self.content_loader = self.content_loader_patch.start()
+        self.manifest = self.content_loader.get_manifest.return_value
+        self.manifest.get_section.return_value.get_question_ids.return_value = [
+            'pricingDocumentURL', 'serviceDefinitionDocumentURL'
+        ]
+
+    def teardown_method(self, method):
+        self.content_loader_patch.stop()
+
+    @pytest.mark.parametrize('endpoint,method,content_length,rejected', [
+        ('main.signature_upload', 'POST', 64 * 1024 + 101, True),
+        ('main.signature_upload', 'POST', 64 * 1024 + 100, False),
+        ('main.signature_upload', 'GET', 64 * 1024 + 101, False),
+        ('main.edit_service_submission', 'POST', 64 * 1024 + 200, False),
+        ('main.edit_service_submission', 'POST', 64 * 1024 + 201, True),
+        ('main.update_supplier', 'POST', 64 * 1024 + 101, False),
+    ])
+    def test_oversized_uploads_are_rejected(self, app, endpoint, method, content_length, rejected):
+        request = mock.Mock(endpoint=endpoint, method=method, content_length=content_length,
+                            view_args={'framework_slug': 'g-cloud-7', 'section_id': 'documents'})
+        with app.app_context(), mock.patch('app.main.helpers.uploads.request', request):
+            if rejected:
+                with pytest.raises(RequestEntityTooLarge):
+                    reject_oversized_uploads()
+            else:
+                reject_oversized_uploads()
+
+    def test_service_submission_uploads_are_counted_from_the_section_being_edited(self, app):
+        request = mock.Mock(endpoint='main.edit_service_submission', method='POST', content_length=64 * 1024 + 201,
+                            view_args={'framework_slug': 'g-cloud-7', 'section_id': 'documents'})
+        with app.app_context(), mock.patch('app.main.helpers.uploads.request', request):
+            with pytest.raises(RequestEntityTooLarge):
+                reject_oversized_uploads()
+
+        self.content_loader.get_manifest.assert_called_once_with('g-cloud-7', 'edit_submission')
+        self.manifest.get_section.assert_called_once_with('documents')
+        self.manifest.get_section.return_value.get_question_ids.assert_called_once_with(type="upload")
+
+    @pytest.mark.parametrize('error', [ContentNotFoundError, None])
+    def test_service_submission_uploads_are_not_limited_without_a_section(self, app, error):
+        if error:
+            self.content_loader.get_manifest.side_effect = error
+        else:
+            self.manifest.get_section.return_value = None
+        request = mock.Mock(endpoint='main.edit_service_submission', method='POST', content_length=10 ** 9,
+                            view_args={'framework_slug': 'g-cloud-7', 'section_id': 'documents'})
+        with app.app_context(), mock.patch('app.main.helpers.uploads.request', request):
+            reject_oversized_uploads()
+
+
+class TestUploadServiceDocuments(object):
+    def setup_method(self, method):
+        self.section = mock.Mock()
+        self.section.get_question_ids.return_value = ['pricingDocumentURL', 'serviceDefinitionDocumentURL']
+        self.service = {'id': 1, 'frameworkSlug': 'g-cloud-7', 'supplierId': 1234}
+
+    @mock.patch('app.main.helpers.uploads.upload_document')
+    def test_documents_are_uploaded_and_empty_files_are_ignored(self, upload_document, app):
+        upload_document.return_value = 'http://example.com/pricing.pdf'
+        request_files = {
+            'pricingDocumentURL': file_storage(b'%PDF-1.4', 'pricing.pdf'),
+            'serviceDefinitionDocumentURL': file_storage(b'', 'definition.pdf'),
+            'unknownDocumentURL': file_storage(b'%PDF-1.4', 'unknown.pdf'),
+        }
+
+        with app.app_context():
+            urls, errors = upload_service_documents('uploader', 'http://example.com/', self.service, request_files,
+                                                    self.section, public=False)
+
+        assert urls == {'pricingDocumentURL': 'http://example.com/pricing.pdf'}
+        assert errors == {}
+        upload_document.assert_called_once_with(
+            'uploader', 'http://example.com/', self.service, 'pricingDocumentURL', mock.ANY, public=False
+        )
+        assert upload_document.call_args[0][4].read() == b'%PDF-1.4'
+
+    @mock.patch('app.main.helpers.uploads.upload_document')
+    def test_nothing_is_uploaded_if_any_document_is_invalid(self, upload_document, app):
+        request_files = {
+            'pricingDocumentURL': file_storage(b'%PDF-1.4' + b'x' * 200, 'pricing.pdf'),
+            'serviceDefinitionDocumentURL': file_storage(b'definition', 'definition.docx'),
+        }
+
+        with app.app_context():
+            urls, errors = upload_service_documents('uploader', 'http://example.com/', self.service, request_files,
+                                                    self.section)
+
+        assert urls is None
+        assert errors == {
+            'pricingDocumentURL': 'file_is_less_than_5mb',
+            'serviceDefinitionDocumentURL': 'file_is_open_document_format',
+        }
+        assert upload_document.called is False
+
+    @mock.patch('app.main.helpers.uploads.upload_document')
+    def test_a_file_renamed_to_look_like_a_document_is_turned_away(self, upload_document, app):
+        request_files = {
+            'pricingDocumentURL': file_storage(b'MZ\x90\x00 not really a pdf', 'pricing.pdf'),
+        }
+
+        with app.app_context():
+            urls, errors = upload_service_documents('uploader', 'http://example.com/', self.service, request_files,
+                                                    self.section)
+
+        assert urls is None
+        assert errors == {'pricingDocumentURL': 'file_is_open_document_format'}
+        assert upload_document.called is False
@@ -1,3 +1,4 @@
+import mock
 import pytest
 
 from app.main.helpers.validation import get_validator, G8Validator
@@ -99,3 +100,80 @@ def test_duns_number_validation(content, submission):
 def test_get_validator():
     validator = get_validator({"slug": "g-cloud-8"}, None, None)
     assert isinstance(validator, G8Validator)
+
+
+def test_schema_is_compiled_once_for_each_content(content, submission):
+    first = G8Validator(content, submission)
+    second = G8Validator(content, {})
+
+    assert first.schema is second.schema
+    assert G8Validator(content_loader.get_builder('g-cloud-8', 'declaration'), submission).schema is not first.schema
+
+
+def test_schema_has_fields_in_question_order(content):
+    schema = G8Validator(content, {}).schema
+
+    assert schema.fields == [
+        question_id for section in content for question_id in section.get_question_ids()
+    ]
+    assert 'dunsNumber' in schema.required_fields
+    assert 'mitigatingFactors' not in schema.required_fields
+
+
+def test_error_messages_are_in_question_order(content, submission):
+    del submission['nameOfOrganisation']
+    submission['dunsNumber'] = '1234'
+
+    errors = G8Validator(content, submission).get_error_messages()
+
+    schema_fields = G8Validator(content, submission).schema.fields
+    assert [question_id for question_id, _ in errors] == sorted(
+        ['nameOfOrganisation', 'dunsNumber'], key=schema_fields.index
+    )
+
+
+def test_page_errors_only_include_the_page(content, submission):
+    del submission['nameOfOrganisation']
+    submission['dunsNumber'] = '1234'
+    validator = G8Validator(content, submission)
+    section = next(section for section in content if 'dunsNumber' in section.get_question_ids())
+
+    page_errors = validator.get_error_messages_for_page(section)
+
+    assert list(page_errors.keys()) == [
+        question_id for question_id, _ in validator.get_error_messages() if question_id in section.get_question_ids()
+    ]
+    assert 'dunsNumber' in page_errors
+
+
+def test_validate_sections_marks_a_complete_declaration_complete(content, submission):
+    state = G8Validator(content, submission).validate_sections()
+
+    assert state.complete
+    assert set(state.section_validity) == set(section.id for section in content)
+
+
+def test_validate_sections_only_checks_sections_with_changed_answers(content, submission):
+    previous_state = G8Validator(content, submission).validate_sections()
+    submission['dunsNumber'] = '1234'
+    validator = G8Validator(content, submission)
+
+    with mock.patch.object(validator, 'errors', wraps=validator.errors) as errors:
+        state = validator.validate_sections(previous_state)
+
+    assert errors.call_count == 1
+    assert not state.complete
+    assert state.section_validity == G8Validator(content, submission).validate_sections().section_validity
+
+
+def test_validate_sections_checks_sections_with_questions_that_became_required(content, submission):
+    submission['establishedInTheUK'] = True
+    del submission['appropriateTradeRegisters']
+    previous_state = G8Validator(content, submission).validate_sections()
+    assert previous_state.complete
+
+    submission['establishedInTheUK'] = False
+    state = G8Validator(content, submission).validate_sections(previous_state)
+
+    assert not state.complete
+    assert state.section_validity == G8Validator(content, submission).validate_sections().section_validity
@@ -15,6 +15,8 @@ from dmapiclient.audit import AuditTypes
 from dmutils.email import MandrillException
 from dmutils.s3 import S3ResponseError
 
+from app.main.helpers.direct_uploads import DirectUploadError
+
 from ..helpers import BaseApplicationTest, FULL_G7_SUBMISSION, FakeMail
 
 
@@ -1780,15 +1782,14 @@ class TestFrameworkAgreementUpload(BaseApplicationTest):
 
             assert res.status_code == 404
 
-    @mock.patch('app.main.views.frameworks.file_is_less_than_5mb')
-    def test_page_returns_400_if_file_is_too_large(self, file_is_less_than_5mb, data_api_client, send_email, s3):
+    def test_page_returns_400_if_file_is_too_large(self, data_api_client, send_email, s3):
         with self.app.test_client():
             self.login()
 
             data_api_client.get_framework.return_value = self.framework(status='standstill')
             data_api_client.get_supplier_framework_info.return_value = self.supplier_framework(
                 on_framework=True)
-            file_is_less_than_5mb.return_value = False
+            self.app.config['DM_MAX_UPLOAD_SIZE'] = 3
 
             res = self.client.post(
                 '/suppliers/frameworks/g-cloud-7/agreement',
@@ -1800,15 +1801,37 @@ class TestFrameworkAgreementUpload(BaseApplicationTest):
             assert res.status_code == 400
             assert u'Document must be less than 5MB' in res.get_data(as_text=True)
 
-    @mock.patch('app.main.views.frameworks.file_is_empty')
-    def test_page_returns_400_if_file_is_empty(self, file_is_empty, data_api_client, send_email, s3):
+    @mock.patch('app.main.views.frameworks.read_upload')
+    def test_page_returns_413_without_reading_the_file_if_the_request_is_too_large(
+        self, read_upload, data_api_client, send_email, s3
+    ):
+        with self.app.test_client():
+            self.login()
+
+            data_api_client.get_framework.return_value = self.framework(status='standstill')
+            data_api_client.get_supplier_framework_info.return_value = self.supplier_framework(
+                on_framework=True)
+            self.app.config['DM_MAX_UPLOAD_SIZE'] = 3
+
+            res = self.client.post(
+                '/suppliers/frameworks/g-cloud-7/agreement',
+                data={
+                    'agreement': (StringIO(b'doc' * 100000), 'test.pdf'),
+                }
+            )
+
+            assert res.status_code == 413
+            assert u'File too large' in res.get_data(as_text=True)
+            assert read_upload.called is False
+            assert s3.return_value.save.called is False
+
+    def test_page_returns_400_if_file_is_empty(self, data_api_client, send_email, s3):
         with self.app.test_client():
             self.login()
 
             data_api_client.get_framework.return_value = self.framework(status='standstill')
             data_api_client.get_supplier_framework_info.return_value = self.supplier_framework(
                 on_framework=True)
-            file_is_empty.return_value = True
 
             res = self.client.post(
                 '/suppliers/frameworks/g-cloud-7/agreement',
@@ -2070,7 +2093,7 @@ class TestFrameworkAgreementDocumentDownload(BaseApplicationTest):
             assert res.status_code == 302
             assert res.location == 'http://asset-host/path?param=value'
             uploader.get_signed_url.assert_called_with(
-                'g-cloud-7/agreements/1234/1234-example.pdf')
+                'g-cloud-7/agreements/1234/1234-example.pdf', expires_in=60)
 
     def test_download_document_with_asset_url(self, S3, data_api_client):
         data_api_client.get_supplier_framework_info.return_value = self.supplier_framework()
@@ -2088,7 +2111,7 @@ class TestFrameworkAgreementDocumentDownload(BaseApplicationTest):
             assert res.status_code == 302
             assert res.location == 'https://example/path?param=value'
             uploader.get_signed_url.assert_called_with(
-                'g-cloud-7/agreements/1234/1234-example.pdf')
+                'g-cloud-7/agreements/1234/1234-example.pdf', expires_in=60)
 
 
 @mock.patch('dmutils.s3.S3')
@@ -2105,7 +2128,7 @@ class TestFrameworkDocumentDownload(BaseApplicationTest):
 
             assert res.status_code == 302
             assert res.location == 'http://asset-host/path?param=value'
-            uploader.get_signed_url.assert_called_with('g-cloud-7/communications/example.pdf')
+            uploader.get_signed_url.assert_called_with('g-cloud-7/communications/example.pdf', expires_in=60)
 
     def test_download_document_returns_404_if_url_is_None(self, S3):
         uploader = mock.Mock()
@@ -2638,8 +2661,12 @@ class TestSendClarificationQuestionEmail(BaseApplicationTest):
         assert response.status_code == 503
 
 
+def unanswered_for_each_draft(required, optional):
+    return lambda content_loader, framework_slug, drafts: [(required, optional)] * len(drafts)
+
+
 @mock.patch('app.main.views.frameworks.data_api_client', autospec=True)
-@mock.patch('app.main.views.frameworks.count_unanswered_questions')
+@mock.patch('app.main.views.frameworks.count_unanswered_questions_for_drafts')
 class TestG7ServicesList(BaseApplicationTest):
 
     def test_404_when_g7_pending_and_no_complete_services(self, count_unanswered, data_api_client):
@@ -2647,7 +2674,7 @@ class TestG7ServicesList(BaseApplicationTest):
             self.login()
         data_api_client.get_framework.return_value = self.framework(status='pending')
         data_api_client.find_draft_services.return_value = {'services': []}
-        count_unanswered.return_value = 0
+        count_unanswered.side_effect = unanswered_for_each_draft(0, 0)
         response = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/iaas')
         assert response.status_code == 404
 
@@ -2666,7 +2693,7 @@ class TestG7ServicesList(BaseApplicationTest):
             self.login()
         data_api_client.get_framework.return_value = self.framework(status='open')
         data_api_client.find_draft_services.return_value = {'services': []}
-        count_unanswered.return_value = 0
+        count_unanswered.side_effect = unanswered_for_each_draft(0, 0)
         response = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/iaas')
         assert response.status_code == 200
 
@@ -2691,7 +2718,7 @@ class TestG7ServicesList(BaseApplicationTest):
                 {'serviceName': 'draft', 'lotSlug': 'scs', 'status': 'submitted'},
             ]
         }
-        count_unanswered.return_value = 0, 1
+        count_unanswered.side_effect = unanswered_for_each_draft(0, 1)
 
         response = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs')
         doc = html.fromstring(response.get_data(as_text=True))
@@ -2707,7 +2734,7 @@ class TestG7ServicesList(BaseApplicationTest):
         with self.app.test_client():
             self.login()
 
-        count_unanswered.return_value = 3, 1
+        count_unanswered.side_effect = unanswered_for_each_draft(3, 1)
         data_api_client.get_framework.return_value = self.framework(status='open')
         data_api_client.find_draft_services.return_value = {
             'services': [
@@ -2728,7 +2755,7 @@ class TestG7ServicesList(BaseApplicationTest):
         with self.app.test_client():
             self.login()
 
-        count_unanswered.return_value = 0, 1
+        count_unanswered.side_effect = unanswered_for_each_draft(0, 1)
 
         data_api_client.get_framework.return_value = self.framework(status='open')
         data_api_client.find_draft_services.return_value = {
@@ -2746,7 +2773,7 @@ class TestG7ServicesList(BaseApplicationTest):
         with self.app.test_client():
             self.login()
 
-        count_unanswered.return_value = 0, 1
+        count_unanswered.side_effect = unanswered_for_each_draft(0, 1)
 
         data_api_client.get_framework.return_value = self.framework(status='open')
         data_api_client.find_draft_services.return_value = {
@@ -3196,7 +3223,7 @@ class TestSignatureUploadPage(BaseApplicationTest):
             res = self.client.post(
                 '/suppliers/frameworks/g-cloud-8/234/signature-upload',
                 data={
-                    'signature_page': (StringIO(b'asdf'), 'test.jpg'),
+                    'signature_page': (StringIO(b'\xff\xd8\xffasdf'), 'test.jpg'),
                 }
             )
 
@@ -3225,9 +3252,8 @@ class TestSignatureUploadPage(BaseApplicationTest):
             assert res.location == 'http://localhost/suppliers/frameworks/g-cloud-8/234/contract-review'
 
     @mock.patch('dmutils.s3.S3')
-    @mock.patch('app.main.views.frameworks.file_is_empty')
     def test_signature_upload_returns_400_if_file_is_empty(
-        self, file_is_empty, s3, return_supplier_framework, data_api_client
+        self, s3, return_supplier_framework, data_api_client
     ):
         with self.app.test_client():
             self.login()
@@ -3239,7 +3265,6 @@ class TestSignatureUploadPage(BaseApplicationTest):
                 on_framework=True
             )['frameworkInterest']
             s3.return_value.get_key.return_value = None
-            file_is_empty.return_value = True
 
             res = self.client.post(
                 '/suppliers/frameworks/g-cloud-8/234/signature-upload',
@@ -3252,9 +3277,8 @@ class TestSignatureUploadPage(BaseApplicationTest):
             assert 'The file must not be empty' in res.get_data(as_text=True)
 
     @mock.patch('dmutils.s3.S3')
-    @mock.patch('app.main.views.frameworks.file_is_image')
     def test_signature_upload_returns_400_if_file_is_not_image_or_pdf(
-        self, file_is_image, s3, return_supplier_framework, data_api_client
+        self, s3, return_supplier_framework, data_api_client
     ):
         with self.app.test_client():
             self.login()
@@ -3266,7 +3290,6 @@ class TestSignatureUploadPage(BaseApplicationTest):
                 on_framework=True
             )['frameworkInterest']
             s3.return_value.get_key.return_value = None
-            file_is_image.return_value = False
 
             res = self.client.post(
                 '/suppliers/frameworks/g-cloud-8/234/signature-upload',
@@ -3279,9 +3302,34 @@ class TestSignatureUploadPage(BaseApplicationTest):
             assert 'The file must be a PDF, JPG or PNG' in res.get_data(as_text=True)
 
     @mock.patch('dmutils.s3.S3')
-    @mock.patch('app.main.views.frameworks.file_is_less_than_5mb')
+    def test_signature_upload_returns_400_if_file_contents_are_not_the_format_of_its_extension(
+        self, s3, return_supplier_framework, data_api_client
+    ):
+        with self.app.test_client():
+            self.login()
+
+            data_api_client.get_framework.return_value = get_g_cloud_8()
+            data_api_client.get_framework_agreement.return_value = self.framework_agreement()
+            return_supplier_framework.return_value = self.supplier_framework(
+                framework_slug='g-cloud-8',
+                on_framework=True
+            )['frameworkInterest']
+            s3.return_value.get_key.return_value = None
+
+            res = self.client.post(
+                '/suppliers/frameworks/g-cloud-8/234/signature-upload',
+                data={
+                    'signature_page': (StringIO(b'\x89PNG\r\n\x1a\nimage'), 'test.pdf'),
+                }
+            )
+
+            assert res.status_code == 400
+            assert 'The file must be a PDF, JPG or PNG' in res.get_data(as_text=True)
+            assert s3.return_value.save.called is False
+
+    @mock.patch('dmutils.s3.S3')
     def test_signature_upload_returns_400_if_file_is_larger_than_5mb(
-        self, file_is_less_than_5mb, s3, return_supplier_framework, data_api_client
+        self, s3, return_supplier_framework, data_api_client
     ):
         with self.app.test_client():
             self.login()
@@ -3293,12 +3341,12 @@ class TestSignatureUploadPage(BaseApplicationTest):
                 on_framework=True
             )['frameworkInterest']
             s3.return_value.get_key.return_value = None
-            file_is_less_than_5mb.return_value = False
+            self.app.config['DM_MAX_UPLOAD_SIZE'] = 3
 
             res = self.client.post(
                 '/suppliers/frameworks/g-cloud-8/234/signature-upload',
                 data={
-                    'signature_page': (StringIO(b'asdf'), 'test.jpg'),
+                    'signature_page': (StringIO(b'\xff\xd8\xffasdf'), 'test.jpg'),
                 }
             )
 
@@ -3394,6 +3442,145 @@ class TestSignatureUploadPage(BaseApplicationTest):
                 assert res.status_code == 302
                 assert res.location == 'http://localhost/suppliers/frameworks/g-cloud-8/234/contract-review'
 
+    def _setup_direct_upload(self, return_supplier_framework, data_api_client):
+        self.app.config['DM_DIRECT_UPLOADS'] = True
+        data_api_client.get_framework.return_value = get_g_cloud_8()
+        data_api_client.get_framework_agreement.return_value = self.framework_agreement()
+        return_supplier_framework.return_value = self.supplier_framework(
+            framework_slug='g-cloud-8',
+            on_framework=True
+        )['frameworkInterest']
+
+    @mock.patch('dmutils.s3.S3')
+    @mock.patch('app.main.views.frameworks.direct_upload_form')
+    def test_signature_page_uploads_straight_to_s3_if_direct_uploads_are_on(
+        self, direct_upload_form, s3, return_supplier_framework, data_api_client
+    ):
+        self._setup_direct_upload(return_supplier_framework, data_api_client)
+        s3.return_value.get_key.return_value = None
+        direct_upload_form.return_value = {
+            'action': 'https://agreements.s3.amazonaws.com/',
+            'fields': [{'name': 'policy', 'value': 'signed-policy'}],
+        }
+
+        with self.app.test_client():
+            self.login()
+            res = self.client.get('/suppliers/frameworks/g-cloud-8/234/signature-upload')
+
+        assert res.status_code == 200
+        direct_upload_form.assert_called_once_with(
+            s3.return_value, 'g-cloud-8', 1234,
+            'http://localhost/suppliers/frameworks/g-cloud-8/234/signature-upload/complete'
+        )
+        document = html.fromstring(res.get_data(as_text=True))
+        form = document.xpath('//form[@action="https://agreements.s3.amazonaws.com/"]')[0]
+        assert form.xpath('.//input[@name="policy"]/@value') == ['signed-policy']
+        assert form.xpath('.//input[@type="file"]/@name') == ['file']
+        assert form.xpath('.//input[@name="csrf_token"]') == []
+
+    @mock.patch('dmutils.s3.S3')
+    @mock.patch('app.main.views.frameworks.move_direct_upload')
+    @mock.patch('app.main.views.frameworks.check_direct_upload')
+    def test_s3_redirect_after_a_direct_upload_asks_the_user_to_confirm_it(
+        self, check_direct_upload, move_direct_upload, s3, return_supplier_framework, data_api_client
+    ):
+        self._setup_direct_upload(return_supplier_framework, data_api_client)
+
+        with self.app.test_client():
+            self.login()
+            res = self.client.get(
+                '/suppliers/frameworks/g-cloud-8/234/signature-upload/complete'
+                '?bucket=agreements&key=direct-uploads/g-cloud-8/1234/abc/signature.pdf&etag=123'
+            )
+
+        assert res.status_code == 200
+        document = html.fromstring(res.get_data(as_text=True))
+        form = document.xpath('//form[@method="POST"]')[0]
+        assert form.xpath('@action') == ['/suppliers/frameworks/g-cloud-8/234/signature-upload/complete']
+        assert form.xpath('.//input[@name="key"]/@value') == ['direct-uploads/g-cloud-8/1234/abc/signature.pdf']
+        assert form.xpath('.//input[@name="etag"]/@value') == ['123']
+        assert form.xpath('.//input[@name="csrf_token"]')
+        assert check_direct_upload.called is False
+        assert move_direct_upload.called is False
+        assert data_api_client.update_framework_agreement.called is False
+
+    @mock.patch('dmutils.s3.S3')
+    @mock.patch('app.main.views.frameworks.move_direct_upload')
+    @mock.patch('app.main.views.frameworks.check_direct_upload')
+    @mock.patch('app.main.views.frameworks.generate_timestamped_document_upload_path')
+    def test_signature_page_uploaded_straight_to_s3_is_saved_to_the_agreement(
+        self, generate_timestamped_document_upload_path, check_direct_upload, move_direct_upload, s3,
+        return_supplier_framework, data_api_client
+    ):
+        self._setup_direct_upload(return_supplier_framework, data_api_client)
+        check_direct_upload.return_value = 'signature.pdf'
+        generate_timestamped_document_upload_path.return_value = 'my/path.pdf'
+
+        with self.app.test_client():
+            self.login()
+            res = self.client.post(
+                '/suppliers/frameworks/g-cloud-8/234/signature-upload/complete',
+                data={'key': 'direct-uploads/g-cloud-8/1234/abc/signature.pdf', 'etag': '123'}
+            )
+
+            assert res.status_code == 302
+            assert res.location == 'http://localhost/suppliers/frameworks/g-cloud-8/234/contract-review'
+            assert session['signature_page'] == 'signature.pdf'
+
+        check_direct_upload.assert_called_once_with(
+            s3.return_value, 'direct-uploads/g-cloud-8/1234/abc/signature.pdf', '123', 'g-cloud-8', 1234,
+            ('.pdf', '.jpg', '.jpeg', '.png')
+        )
+        generate_timestamped_document_upload_path.assert_called_once_with(
+            'g-cloud-8', 1234, 'agreements', 'signed-framework-agreement.pdf'
+        )
+        move_direct_upload.assert_called_once_with(
+            s3.return_value, 'direct-uploads/g-cloud-8/1234/abc/signature.pdf', '123', 'my/path.pdf',
+            acl='private',
+            download_filename='Supplier_Nme-1234-signed-signature-page.pdf',
+            disposition_type='inline'
+        )
+        data_api_client.update_framework_agreement.assert_called_once_with(
+            234, {"signedAgreementPath": 'my/path.pdf'}, 'email@email.com'
+        )
+
+    @mock.patch('dmutils.s3.S3')
+    @mock.patch('app.main.views.frameworks.direct_upload_form')
+    @mock.patch('app.main.views.frameworks.move_direct_upload')
+    @mock.patch('app.main.views.frameworks.check_direct_upload')
+    def test_invalid_signature_page_uploaded_straight_to_s3_returns_400(
+        self, check_direct_upload, move_direct_upload, direct_upload_form, s3, return_supplier_framework,
+        data_api_client
+    ):
+        self._setup_direct_upload(return_supplier_framework, data_api_client)
+        s3.return_value.get_key.return_value = None
+        check_direct_upload.side_effect = DirectUploadError('format')
+        direct_upload_form.return_value = {'action': 'https://agreements.s3.amazonaws.com/', 'fields': []}
+
+        with self.app.test_client():
+            self.login()
+            res = self.client.post(
+                '/suppliers/frameworks/g-cloud-8/234/signature-upload/complete',
+                data={'key': 'direct-uploads/g-cloud-8/1234/abc/signature.txt', 'etag': '123'}
+            )
+
+        assert res.status_code == 400
+        assert 'The file must be a PDF, JPG or PNG' in res.get_data(as_text=True)
+        assert move_direct_upload.called is False
+        assert data_api_client.update_framework_agreement.called is False
+
+    def test_signature_upload_complete_is_not_found_if_direct_uploads_are_off(
+        self, return_supplier_framework, data_api_client
+    ):
+        with self.app.test_client():
+            self.login()
+            res = self.client.get(
+                '/suppliers/frameworks/g-cloud-8/234/signature-upload/complete'
+                '?bucket=agreements&key=direct-uploads/g-cloud-8/1234/abc/signature.pdf&etag=123'
+            )
+
+        assert res.status_code == 404
+
 
 @mock.patch("app.main.views.frameworks.data_api_client")
 @mock.patch("app.main.views.frameworks.return_supplier_framework_info_if_on_framework_or_abort")
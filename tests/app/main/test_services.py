@@ -938,7 +938,7 @@ class TestEditDraftService(BaseApplicationTest):
             res = self.client.post(
                 '/suppliers/frameworks/g-cloud-7/submissions/scs/1/edit/service-definition',
                 data={
-                    'serviceDefinitionDocumentURL': (StringIO(b'doc'), 'document.pdf'),
+                    'serviceDefinitionDocumentURL': (StringIO(b'%PDF-1.4 doc'), 'document.pdf'),
                 }
             )
 
@@ -975,6 +975,87 @@ class TestEditDraftService(BaseApplicationTest):
 
         assert s3.return_value.save.called is False
 
+    def test_upload_questions_link_to_direct_uploads_if_they_are_on(self, data_api_client, s3):
+        self.app.config['DM_DIRECT_UPLOADS'] = True
+        data_api_client.get_framework.return_value = self.framework(status='open')
+        data_api_client.get_draft_service.return_value = self.empty_draft
+
+        res = self.client.get('/suppliers/frameworks/g-cloud-7/submissions/scs/1/edit/service-definition')
+        document = html.fromstring(res.get_data(as_text=True))
+
+        assert res.status_code == 200
+        assert document.xpath('//p[@class="direct-upload-link"]/a/@href') == [
+            '/suppliers/frameworks/g-cloud-7/submissions/scs/1/documents/serviceDefinitionDocumentURL'
+        ]
+        assert document.xpath('//input[@type="file"]') == []
+
+    @mock.patch('app.main.views.services.move_direct_upload')
+    @mock.patch('app.main.views.services.check_direct_upload')
+    def test_document_uploaded_straight_to_s3_is_saved_to_the_draft(
+        self, check_direct_upload, move_direct_upload, data_api_client, s3
+    ):
+        self.app.config['DM_DIRECT_UPLOADS'] = True
+        s3.return_value.bucket_short_name = 'submissions'
+        data_api_client.get_framework.return_value = self.framework(status='open')
+        data_api_client.get_draft_service.return_value = self.empty_draft
+        check_direct_upload.return_value = 'definition.pdf'
+        staging_key = 'direct-uploads/g-cloud-7/1234/abc/definition.pdf'
+
+        with freeze_time('2015-01-02 03:04:05'):
+            res = self.client.post(
+                '/suppliers/frameworks/g-cloud-7/submissions/scs/1/documents/serviceDefinitionDocumentURL/complete',
+                data={'key': staging_key, 'etag': '123'}
+            )
+
+        assert res.status_code == 302
+        assert res.location == \
+            'http://localhost/suppliers/frameworks/g-cloud-7/submissions/scs/1#service-definition'
+        check_direct_upload.assert_called_once_with(
+            s3.return_value, staging_key, '123', 'g-cloud-7', 1234, ('.pdf', '.pda', '.odt', '.ods', '.odp')
+        )
+        move_direct_upload.assert_called_once_with(
+            s3.return_value, staging_key, '123',
+            'g-cloud-7/submissions/1234/1-service-definition-document-2015-01-02-0304.pdf', acl='private'
+        )
+        data_api_client.update_draft_service.assert_called_once_with(
+            '1', {
+                'serviceDefinitionDocumentURL': 'http://localhost/suppliers/assets/g-cloud-7/submissions/1234/1-service-definition-document-2015-01-02-0304.pdf'  # noqa
+            }, 'email@email.com',
+            page_questions=['serviceDefinitionDocumentURL']
+        )
+
+    @mock.patch('app.main.views.services.move_direct_upload')
+    @mock.patch('app.main.views.services.check_direct_upload')
+    def test_s3_redirect_after_a_direct_upload_asks_the_user_to_confirm_it(
+        self, check_direct_upload, move_direct_upload, data_api_client, s3
+    ):
+        self.app.config['DM_DIRECT_UPLOADS'] = True
+        data_api_client.get_framework.return_value = self.framework(status='open')
+        data_api_client.get_draft_service.return_value = self.empty_draft
+        url = '/suppliers/frameworks/g-cloud-7/submissions/scs/1/documents/serviceDefinitionDocumentURL/complete'
+
+        res = self.client.get(url + '?bucket=submissions&key=direct-uploads/g-cloud-7/1234/abc/definition.pdf&etag=123')
+
+        assert res.status_code == 200
+        document = html.fromstring(res.get_data(as_text=True))
+        form = document.xpath('//form[@method="POST"]')[0]
+        assert form.xpath('@action') == [url]
+        assert form.xpath('.//input[@name="key"]/@value') == ['direct-uploads/g-cloud-7/1234/abc/definition.pdf']
+        assert form.xpath('.//input[@name="etag"]/@value') == ['123']
+        assert check_direct_upload.called is False
+        assert move_direct_upload.called is False
+        assert data_api_client.update_draft_service.called is False
+
+    def test_direct_upload_pages_are_not_found_if_direct_uploads_are_off(self, data_api_client, s3):
+        data_api_client.get_framework.return_value = self.framework(status='open')
+        data_api_client.get_draft_service.return_value = self.empty_draft
+
+        res = self.client.get(
+            '/suppliers/frameworks/g-cloud-7/submissions/scs/1/documents/serviceDefinitionDocumentURL'
+        )
+
+        assert res.status_code == 404
+
     def test_upload_question_not_accepted_as_form_data(self, data_api_client, s3):
         s3.return_value.bucket_short_name = 'submissions'
         data_api_client.get_framework.return_value = self.framework(status='open')
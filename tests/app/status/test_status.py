@@ -24,6 +24,7 @@ class TestStatus(BaseApplicationTest):
         json_data = json.loads(status_response.get_data().decode('utf-8'))
         assert "{}".format(json_data['status']) == "ok"
         assert "{}".format(json_data['api_status']['status']) == "ok"
+        assert json_data['caches']['frameworks']['hits'] == 0
 
     @mock.patch('app.status.views.data_api_client')
     def test_status_error(self, data_api_client):
@@ -0,0 +1,347 @@
+import copy
+import threading
+import time
+
+import mock
+import pytest
+import dmapiclient
+import requests
+from flask import Response
+from dmapiclient import HTTPError
+
+from app import create_app
+from app.api_client import PooledDataAPIClient, RequestCachedAPIClient, get_request_api_timings
+from app.circuit_breaker import ServiceUnavailable
+from app.single_flight import SingleFlight
+
+
+class StubDataAPIClient(object):
+    def __init__(self):
+        self.calls = []
+
+    def init_app(self, app):
+        pass
+
+    def get_framework(self, slug):
+        self.calls.append(('get_framework', slug))
+        return {'frameworks': {'slug': slug, 'lots': []}}
+
+    def find_services(self, supplier_id=None, framework=None):
+        self.calls.append(('find_services', supplier_id, framework))
+        return {'services': []}
+
+    def get_supplier(self, supplier_id):
+        raise HTTPError(mock.Mock(status_code=404))
+
+    def is_supplier_eligible_for_brief(self, supplier_id, brief_id):
+        self.calls.append(('is_supplier_eligible_for_brief', supplier_id, brief_id))
+        return True
+
+    def update_supplier(self, supplier_id, data, user):
+        self.calls.append(('update_supplier', supplier_id))
+        return {'suppliers': data}
+
+
+class TestRequestCachedAPIClient(object):
+    def setup_method(self, method):
+        self.app = create_app('test')
+        self.stub = StubDataAPIClient()
+        self.client = RequestCachedAPIClient(self.stub)
+        self.client.init_app(self.app)
+
+    def test_read_calls_are_made_once_per_request(self):
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+            self.client.get_framework('g-cloud-8')
+            self.client.get_framework('g-cloud-9')
+
+        assert self.stub.calls == [('get_framework', 'g-cloud-8'), ('get_framework', 'g-cloud-9')]
+
+    def test_cache_is_keyed_on_keyword_arguments(self):
+        with self.app.test_request_context('/'):
+            self.client.find_services(supplier_id=1234, framework='g-cloud-8')
+            self.client.find_services(framework='g-cloud-8', supplier_id=1234)
+            self.client.find_services(supplier_id=1234)
+
+        assert self.stub.calls == [
+            ('find_services', 1234, 'g-cloud-8'),
+            ('find_services', 1234, None),
+        ]
+
+    def test_cached_responses_can_be_modified_safely(self):
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')['frameworks']['lots'].append('iaas')
+            self.client.get_framework('g-cloud-8')['frameworks']['lots'].append('saas')
+
+            assert self.client.get_framework('g-cloud-8')['frameworks']['lots'] == []
+
+    def test_write_calls_clear_the_cache(self):
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+            self.client.update_supplier(1234, {}, 'email@email.com')
+            self.client.get_framework('g-cloud-8')
+
+        assert self.stub.calls == [
+            ('get_framework', 'g-cloud-8'),
+            ('update_supplier', 1234),
+            ('get_framework', 'g-cloud-8'),
+        ]
+
+    def test_listed_read_only_methods_are_cached_and_dont_clear_the_cache(self):
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+            self.client.is_supplier_eligible_for_brief(1234, 1)
+            self.client.is_supplier_eligible_for_brief(1234, 1)
+            self.client.get_framework('g-cloud-8')
+
+        assert self.stub.calls == [
+            ('get_framework', 'g-cloud-8'),
+            ('is_supplier_eligible_for_brief', 1234, 1),
+        ]
+
+    def test_cache_does_not_outlive_the_request(self):
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+
+        assert len(self.stub.calls) == 2
+
+    def test_calls_are_not_cached_outside_a_request(self):
+        self.client.get_framework('g-cloud-8')
+        self.client.get_framework('g-cloud-8')
+
+        assert len(self.stub.calls) == 2
+
+    def test_calls_with_unhashable_arguments_are_not_cached(self):
+        with self.app.test_request_context('/'):
+            self.client.find_services(supplier_id=[1234])
+            self.client.find_services(supplier_id=[1234])
+
+        assert len(self.stub.calls) == 2
+
+    def test_reads_made_by_concurrent_requests_share_a_call(self):
+        flights = SingleFlight(share=copy.deepcopy)
+        client = RequestCachedAPIClient(self.stub, flights)
+        release = threading.Event()
+        get_framework = self.stub.get_framework
+        self.stub.get_framework = lambda slug: release.wait(5) and get_framework(slug)
+        results = []
+
+        def request():
+            with self.app.test_request_context('/'):
+                results.append(client.get_framework('g-cloud-8'))
+
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while flights.stats()['coalesced'] < 2 and time.time() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert self.stub.calls == [('get_framework', 'g-cloud-8')]
+        assert results == [{'frameworks': {'slug': 'g-cloud-8', 'lots': []}}] * 3
+
+    def test_write_calls_stop_later_reads_sharing_earlier_calls(self):
+        flights = mock.Mock(spec=SingleFlight)
+        client = RequestCachedAPIClient(self.stub, flights)
+
+        with self.app.test_request_context('/'):
+            client.update_supplier(1234, {}, 'email@email.com')
+
+        flights.forget_all.assert_called_once_with()
+
+    def test_api_calls_are_timed(self):
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+            self.client.get_framework('g-cloud-8')
+            self.client.update_supplier(1234, {}, 'email@email.com')
+            with pytest.raises(HTTPError):
+                self.client.get_supplier(1234)
+
+            timings = get_request_api_timings()
+
+        assert [(name, status) for name, _, status in timings] == [
+            ('get_framework', 'ok'),
+            ('update_supplier', 'ok'),
+            ('get_supplier', 404),
+        ]
+        assert all(duration >= 0 for _, duration, _ in timings)
+
+    def test_server_timing_header_has_the_total_api_time(self):
+        with self.app.test_request_context('/'):
+            get_request_api_timings().extend([('get_framework', 0.25, 'ok'), ('get_supplier', 0.5, 'ok')])
+            response = self.client._report_request_api_timings(Response())
+
+        assert response.headers['Server-Timing'] == 'dataapi;dur=750.0;desc="Data API (2 calls)"'
+
+    def test_no_server_timing_header_without_api_calls(self):
+        with self.app.test_request_context('/'):
+            response = self.client._report_request_api_timings(Response())
+
+        assert 'Server-Timing' not in response.headers
+
+    @pytest.mark.parametrize('timings, logged', [
+        ([('get_framework', 0.25, 'ok')], False),
+        ([('get_framework', 0.25, 'ok'), ('get_supplier', 1.0, 404)], True),
+        ([('get_framework', 0.01, 'ok')] * 21, True),
+    ])
+    def test_slow_requests_are_logged(self, timings, logged):
+        with self.app.test_request_context('/'):
+            get_request_api_timings().extend(timings)
+            with mock.patch.object(self.app.logger, 'warning') as warning:
+                self.client._report_request_api_timings(Response())
+
+        assert warning.called is logged
+
+
+class TestPooledDataAPIClient(object):
+    def setup_method(self, method):
+        self.app = create_app('test')
+        self.app.config.update(
+            DM_DATA_API_URL='http://localhost:5000',
+            DM_DATA_API_POOL_SIZE=1,
+            DM_DATA_API_CONNECT_TIMEOUT=2,
+            DM_DATA_API_READ_TIMEOUT=20,
+        )
+        self.client = PooledDataAPIClient()
+        self.client.init_app(self.app)
+        self.session = self.client._create_session()
+        self.session.request = mock.Mock(**{'return_value.json.return_value': {'frameworks': {}}})
+        self.client._create_session = mock.Mock(return_value=self.session)
+
+    def test_calls_share_a_session_and_use_the_configured_timeouts(self):
+        with self.app.test_request_context('/'):
+            assert self.client.get_framework('g-cloud-8') == {'frameworks': {}}
+            self.client.get_framework('g-cloud-9')
+
+        assert self.client._create_session.call_count == 1
+        assert self.session.request.call_args_list[0] == mock.call(
+            'GET', 'http://localhost:5000/frameworks/g-cloud-8',
+            headers=mock.ANY, json=None, params=None, timeout=(2, 20)
+        )
+        assert self.client.connection_stats()['calls'] == 2
+
+    def test_calls_made_while_the_pool_is_busy_are_counted_as_saturated(self):
+        def request(*args, **kwargs):
+            if self.session.request.call_count == 1:
+                self.client.get_framework('g-cloud-9')
+            return mock.Mock(**{'json.return_value': {}})
+        self.session.request.side_effect = request
+
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+
+        stats = self.client.connection_stats()
+        assert (stats['calls'], stats['in_flight'], stats['peak_in_flight'], stats['saturated']) == (2, 0, 2, 1)
+
+    def test_errors_are_raised_as_api_errors(self):
+        self.session.request.return_value.raise_for_status.side_effect = requests.HTTPError(
+            response=mock.Mock(status_code=503, **{'json.return_value': {'error': 'unavailable'}})
+        )
+
+        with self.app.test_request_context('/'), pytest.raises(HTTPError) as e:
+            self.client.get_framework('g-cloud-8')
+
+        assert e.value.status_code == 503
+        assert self.client.connection_stats()['in_flight'] == 0
+
+    def test_calls_to_failing_endpoints_fail_straight_away(self):
+        self.app.config.update(DM_DATA_API_CIRCUIT_WINDOW=2, DM_DATA_API_CIRCUIT_MINIMUM_CALLS=2)
+        self.client.init_app(self.app)
+        self.session.request.return_value.raise_for_status.side_effect = requests.HTTPError(
+            response=mock.Mock(status_code=503, **{'json.return_value': {'error': 'unavailable'}})
+        )
+
+        with self.app.test_request_context('/'):
+            for _ in range(2):
+                with pytest.raises(HTTPError):
+                    self.client.get_framework('g-cloud-8')
+            with pytest.raises(ServiceUnavailable):
+                self.client.get_framework('g-cloud-8')
+
+            # other families of endpoints are still called
+            self.session.request.return_value.raise_for_status.side_effect = None
+            self.client.get_supplier(1234)
+
+        assert self.session.request.call_count == 3
+        assert self.client.endpoint_stats()['frameworks']['circuit']['state'] == 'open'
+        assert self.client.endpoint_stats()['suppliers']['circuit']['state'] == 'closed'
+
+    def test_not_found_errors_dont_open_the_circuit(self):
+        self.app.config.update(DM_DATA_API_CIRCUIT_WINDOW=2, DM_DATA_API_CIRCUIT_MINIMUM_CALLS=2)
+        self.client.init_app(self.app)
+        self.session.request.return_value.raise_for_status.side_effect = requests.HTTPError(
+            response=mock.Mock(status_code=404, **{'json.return_value': {'error': 'not found'}})
+        )
+
+        with self.app.test_request_context('/'):
+            for _ in range(3):
+                with pytest.raises(HTTPError):
+                    self.client.get_framework('g-cloud-8')
+
+        assert self.client.endpoint_stats()['frameworks']['circuit']['state'] == 'closed'
+
+    def test_request_override_was_written_for_the_installed_dmapiclient(self):
+        # PooledDataAPIClient._request replaces dmapiclient's private one, so it has to be checked on upgrade
+        assert dmapiclient.__version__ == '7.10.0'
+
+    def test_concurrency_is_limited_to_the_pool_size_by_default(self):
+        self.app.config.update(DM_DATA_API_CONCURRENCY_LIMIT=None)
+        self.client.init_app(self.app)
+
+        assert self.client.endpoint_stats()['frameworks']['bulkhead']['limit'] == 1
+
+    def test_concurrent_calls_over_the_concurrency_limit_wait_for_a_free_slot(self):
+        self.app.config.update(DM_DATA_API_CONCURRENCY_LIMIT=2, DM_DATA_API_CONCURRENCY_TIMEOUT=5)
+        self.client.init_app(self.app)
+        release = threading.Event()
+
+        def request(*args, **kwargs):
+            release.wait(5)
+            return mock.Mock(**{'json.return_value': {'frameworks': {}}})
+        self.session.request.side_effect = request
+
+        results = []
+
+        def call():
+            with self.app.test_request_context('/'):
+                results.append(self.client.get_framework('g-cloud-8'))
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while self.client.endpoint_stats()['frameworks']['bulkhead']['waited'] < 3:
+            assert time.time() < deadline
+            time.sleep(0.001)
+        assert self.client.endpoint_stats()['frameworks']['bulkhead']['in_use'] == 2
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert results == [{'frameworks': {}}] * 5
+        assert self.client.endpoint_stats()['frameworks']['bulkhead']['rejected'] == 0
+
+    def test_calls_over_the_concurrency_limit_fail_straight_away_without_a_timeout(self):
+        self.app.config.update(DM_DATA_API_CONCURRENCY_LIMIT=1, DM_DATA_API_CONCURRENCY_TIMEOUT=0)
+        self.client.init_app(self.app)
+
+        def request(*args, **kwargs):
+            if self.session.request.call_count == 1:
+                with pytest.raises(ServiceUnavailable):
+                    self.client.get_framework('g-cloud-9')
+                self.client.get_supplier(1234)
+            return mock.Mock(**{'json.return_value': {}})
+        self.session.request.side_effect = request
+
+        with self.app.test_request_context('/'):
+            self.client.get_framework('g-cloud-8')
+
+        assert self.session.request.call_count == 2
+        assert self.client.endpoint_stats()['frameworks']['bulkhead'] == {
+            'in_use': 0, 'waited': 0, 'rejected': 1, 'limit': 1
+        }
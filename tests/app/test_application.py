@@ -1,9 +1,12 @@
 # coding=utf-8
 
+import time
+
 import mock
 from .helpers import BaseApplicationTest
 from dmapiclient.errors import HTTPError
 from app.main.helpers.frameworks import question_references
+from app import data_api_client, load_user, user_cache, SESSION_REFRESHED_AT_KEY
 
 
 class TestApplication(BaseApplicationTest):
@@ -60,6 +63,79 @@ class TestApplication(BaseApplicationTest):
             'out more about cookies</a></p>' in res.get_data(as_text=True)
 
 
+class TestRefreshSession(BaseApplicationTest):
+    def get_with_session(self, **session_values):
+        with self.client.session_transaction() as session:
+            session.update(session_values)
+        return self.client.get('/suppliers/_status?ignore-dependencies')
+
+    def test_sessions_are_not_created_for_anonymous_users(self):
+        res = self.client.get('/suppliers/_status?ignore-dependencies')
+
+        assert self.get_cookie_by_name(res, 'dm_session') is None
+
+    def test_recently_refreshed_sessions_are_not_sent_again(self):
+        res = self.get_with_session(user_id=123, **{SESSION_REFRESHED_AT_KEY: int(time.time()) - 60})
+
+        assert self.get_cookie_by_name(res, 'dm_session') is None
+
+    def test_sessions_are_refreshed_once_part_of_their_lifetime_has_passed(self):
+        res = self.get_with_session(user_id=123, **{SESSION_REFRESHED_AT_KEY: int(time.time()) - 4 * 3600 // 10})
+
+        assert self.get_cookie_by_name(res, 'dm_session') is not None
+
+    def test_sessions_are_refreshed_on_every_request_without_a_refresh_fraction(self):
+        self.app.config['DM_SESSION_REFRESH_FRACTION'] = 0
+
+        res = self.get_with_session(user_id=123, **{SESSION_REFRESHED_AT_KEY: int(time.time())})
+
+        assert self.get_cookie_by_name(res, 'dm_session') is not None
+
+
+class TestLoadUser(BaseApplicationTest):
+    def setup_method(self, method):
+        super(TestLoadUser, self).setup_method(method)
+        user_cache.configure(ttl=30, max_size=10)
+
+    def teardown_method(self, method):
+        user_cache.configure(ttl=0)
+        super(TestLoadUser, self).teardown_method(method)
+
+    def test_users_are_loaded_from_the_api_once(self):
+        with mock.patch.object(data_api_client, 'get_user') as get_user:
+            get_user.return_value = self.user(123, "email@email.com", 1234, u'Supplier Name', u'Name')
+
+            assert load_user(u'123').email_address == "email@email.com"
+            assert load_user(u'123') is load_user(u'123')
+
+        get_user.assert_called_once_with(user_id=123)
+        assert user_cache.stats()['hits'] == 2
+
+    def test_users_who_cannot_log_in_are_not_cached(self):
+        with mock.patch.object(data_api_client, 'get_user') as get_user:
+            get_user.return_value = self.user(123, "email@email.com", 1234, u'Supplier Name', u'Name', active=False)
+
+            assert load_user(u'123') is None
+            assert load_user(u'123') is None
+
+        assert get_user.call_count == 2
+
+    @mock.patch('app.main.views.users.data_api_client')
+    def test_deactivated_users_are_removed_from_the_cache(self, users_data_api_client):
+        user_cache.set(1, 'Don')
+        users_data_api_client.get_user.return_value = {
+            'users': {'id': 1, 'name': 'Don', 'emailAddress': 'don@scdp.com', 'role': 'supplier',
+                      'supplier': {'supplierId': 1234}}
+        }
+
+        with self.app.test_client():
+            self.login()
+            res = self.client.post('/suppliers/users/1/deactivate')
+
+        assert res.status_code == 302
+        assert user_cache.get(1) is None
+
+
 class TestQuestionReferences(object):
 
     def get_question_mock(self, id):
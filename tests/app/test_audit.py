@@ -0,0 +1,129 @@
+import os
+import stat
+
+import mock
+import pytest
+from flask import Flask
+from dmapiclient import HTTPError
+from dmapiclient.audit import AuditTypes
+
+from app.audit import AuditEventWriter
+
+
+EVENT = dict(
+    audit_type=AuditTypes.invite_user,
+    user='supplier@example.com',
+    object_type='suppliers',
+    object_id=1234,
+    data={'invitedEmail': 'colleague@example.com'},
+)
+
+
+@pytest.fixture
+def app(tmpdir):
+    app = Flask(__name__)
+    app.config.update(
+        DM_AUDIT_EVENT_QUEUE_SIZE=2,
+        DM_AUDIT_EVENT_BATCH_SIZE=10,
+        DM_AUDIT_EVENT_FLUSH_INTERVAL=1,
+        DM_AUDIT_EVENT_SPILL_DIR=str(tmpdir.join('audit-events')),
+    )
+    return app
+
+
+@pytest.yield_fixture
+def writer(app):
+    writer = AuditEventWriter()
+    with mock.patch('app.audit.atexit'):
+        writer.init_app(app, mock.Mock())
+        # the flusher isn't started, so the tests can flush the queue themselves
+        writer._start_flusher = mock.Mock()
+        yield writer
+
+
+class TestAuditEventWriter(object):
+    def test_the_spill_directory_is_only_accessible_by_the_apps_user(self, app, writer):
+        for folder in ['', 'tmp', 'events']:
+            path = os.path.join(app.config['DM_AUDIT_EVENT_SPILL_DIR'], folder)
+            assert stat.S_IMODE(os.stat(path).st_mode) == stat.S_IRWXU
+
+    def test_spill_directories_belonging_to_another_user_are_refused(self, app):
+        os.mkdir(app.config['DM_AUDIT_EVENT_SPILL_DIR'])
+
+        with mock.patch('os.getuid', return_value=os.getuid() + 1), pytest.raises(RuntimeError):
+            AuditEventWriter().init_app(app, mock.Mock())
+
+    def test_the_queue_is_flushed_at_exit_once_however_many_apps_are_set_up(self, app):
+        writer = AuditEventWriter()
+
+        with mock.patch('app.audit.atexit') as atexit:
+            writer.init_app(app, mock.Mock())
+            writer.init_app(app, mock.Mock())
+
+        atexit.register.assert_called_once_with(writer.flush)
+
+    def test_events_are_created_during_the_request_without_a_queue(self, app, writer):
+        app.config['DM_AUDIT_EVENT_QUEUE_SIZE'] = 0
+        writer.init_app(app, mock.Mock())
+        data_api_client = mock.Mock()
+
+        writer.record(data_api_client, **EVENT)
+
+        data_api_client.create_audit_event.assert_called_once_with(**EVENT)
+
+    def test_events_are_queued_and_created_when_flushed(self, writer):
+        data_api_client = mock.Mock()
+
+        writer.record(data_api_client, **EVENT)
+        assert data_api_client.create_audit_event.called is False
+        assert writer.stats()['queued'] == 1
+
+        assert writer.flush() == 1
+        data_api_client.create_audit_event.assert_called_once_with(**EVENT)
+        assert writer.stats()['queued'] == 0
+
+    def test_events_that_dont_fit_in_the_queue_are_spilled(self, writer):
+        data_api_client = mock.Mock()
+
+        for _ in range(3):
+            writer.record(data_api_client, **EVENT)
+
+        assert writer.stats()['queued'] == 2
+        assert writer.stats()['spilled_pending'] == 1
+
+    def test_events_that_dont_fit_in_the_queue_are_created_without_a_spill_directory(self, app, writer):
+        app.config['DM_AUDIT_EVENT_SPILL_DIR'] = None
+        writer.init_app(app, mock.Mock())
+        data_api_client = mock.Mock()
+
+        for _ in range(3):
+            writer.record(data_api_client, **EVENT)
+
+        assert data_api_client.create_audit_event.call_count == 1
+        assert writer.stats()['queued'] == 2
+
+    def test_events_are_spilled_if_the_api_fails_and_created_later(self, app, writer):
+        data_api_client = mock.Mock()
+        data_api_client.create_audit_event.side_effect = HTTPError()
+
+        writer.record(data_api_client, **EVENT)
+        writer.record(data_api_client, **EVENT)
+        assert writer.flush() == 0
+        assert data_api_client.create_audit_event.call_count == 1
+        assert writer.stats()['spilled_pending'] == 2
+
+        with app.app_context():
+            writer._send_spilled()
+
+        assert writer._data_api_client.create_audit_event.call_args_list == [mock.call(**EVENT)] * 2
+        assert writer.stats()['spilled_pending'] == 0
+
+    def test_spilled_events_are_kept_if_the_api_is_still_failing(self, app, writer):
+        writer._spill(EVENT)
+        writer._data_api_client.create_audit_event.side_effect = HTTPError()
+
+        with app.app_context(), pytest.raises(HTTPError):
+            writer._send_spilled()
+
+        assert writer.stats()['spilled_pending'] == 1
+        assert os.listdir(os.path.join(app.config['DM_AUDIT_EVENT_SPILL_DIR'], 'tmp')) == []
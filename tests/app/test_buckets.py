@@ -0,0 +1,68 @@
+import mock
+import pytest
+from flask import Flask
+
+from app.buckets import BucketPool
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['DM_S3_POOL_SIZE'] = 1
+    return app
+
+
+@pytest.fixture
+def pool(app):
+    pool = BucketPool()
+    pool.init_app(app)
+    return pool
+
+
+@mock.patch('dmutils.s3.S3')
+class TestBucketPool(object):
+    def test_clients_are_reused_within_a_request(self, S3, app, pool):
+        S3.side_effect = lambda bucket_name: mock.Mock()
+
+        with app.test_request_context():
+            assert pool.get('agreements') is pool.get('agreements')
+            assert pool.get('agreements') is not pool.get('submissions')
+            assert pool.stats()['in_use'] == 2
+
+        assert S3.call_args_list == [mock.call('agreements'), mock.call('submissions')]
+
+    def test_clients_are_reused_by_later_requests(self, S3, app, pool):
+        with app.test_request_context():
+            first = pool.get('agreements')
+        with app.test_request_context():
+            assert pool.get('agreements') is first
+
+        assert S3.call_count == 1
+        stats = pool.stats()
+        assert (stats['created'], stats['reused'], stats['in_use'], stats['idle']) == (1, 1, 0, 1)
+
+    def test_concurrent_requests_get_their_own_clients(self, S3, app, pool):
+        S3.side_effect = lambda bucket_name: mock.Mock()
+
+        with app.test_request_context():
+            first = pool.get('agreements')
+            # each worker thread's request has its own app context
+            with app.app_context(), app.test_request_context():
+                second = pool.get('agreements')
+
+        assert first is not second
+        # only one idle client is kept, so the other is closed
+        assert pool.stats()['idle'] == 1
+        assert pool.stats()['discarded'] == 1
+        assert first.bucket.connection.close.called or second.bucket.connection.close.called
+
+    def test_a_new_client_is_created_each_time_without_a_pool(self, S3, app, pool):
+        app.config['DM_S3_POOL_SIZE'] = 0
+        pool.init_app(app)
+
+        with app.test_request_context():
+            pool.get('agreements')
+            pool.get('agreements')
+
+        assert S3.call_count == 2
+        assert pool.stats()['idle'] == 0
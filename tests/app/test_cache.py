@@ -0,0 +1,101 @@
+from app.cache import TTLCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(object):
+    def setup_method(self, method):
+        self.clock = FakeClock()
+        self.cache = TTLCache(ttl=60, max_size=2, clock=self.clock)
+
+    def test_get_returns_cached_value(self):
+        self.cache.set('g-cloud-8', {'status': 'live'})
+
+        assert self.cache.get('g-cloud-8') == {'status': 'live'}
+        assert self.cache.get('g-cloud-9') is None
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.set('g-cloud-8', 'live')
+        self.clock.now += 59
+        assert self.cache.get('g-cloud-8') == 'live'
+
+        self.clock.now += 1
+        assert self.cache.get('g-cloud-8') is None
+        assert len(self.cache) == 0
+
+    def test_entries_never_expire_without_ttl(self):
+        cache = TTLCache(ttl=None, clock=self.clock)
+        cache.set('g-cloud-8', 'live')
+        self.clock.now += 10 ** 9
+
+        assert cache.get('g-cloud-8') == 'live'
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('g-cloud-7', 'expired')
+        self.cache.set('g-cloud-8', 'live')
+        self.cache.get('g-cloud-7')
+        self.cache.set('g-cloud-9', 'open')
+
+        assert self.cache.get('g-cloud-7') == 'expired'
+        assert self.cache.get('g-cloud-8') is None
+        assert self.cache.get('g-cloud-9') == 'open'
+        assert self.cache.stats()['evictions'] == 1
+
+    def test_zero_ttl_disables_cache(self):
+        cache = TTLCache(ttl=0)
+        cache.set('g-cloud-8', 'live')
+
+        assert cache.get('g-cloud-8') is None
+        assert len(cache) == 0
+
+    def test_get_or_set_only_loads_on_a_miss(self):
+        loads = []
+
+        def load():
+            loads.append(1)
+            return 'live'
+
+        assert self.cache.get_or_set('g-cloud-8', load) == 'live'
+        assert self.cache.get_or_set('g-cloud-8', load) == 'live'
+        assert len(loads) == 1
+
+    def test_invalidate_and_clear(self):
+        self.cache.set('g-cloud-8', 'live')
+        self.cache.set('g-cloud-9', 'open')
+
+        self.cache.invalidate('g-cloud-8')
+        assert self.cache.get('g-cloud-8') is None
+        assert self.cache.get('g-cloud-9') == 'open'
+
+        self.cache.clear()
+        assert self.cache.get('g-cloud-9') is None
+
+    def test_stats_count_hits_and_misses(self):
+        self.cache.set('g-cloud-8', 'live')
+        self.cache.get('g-cloud-8')
+        self.cache.get('g-cloud-8')
+        self.cache.get('g-cloud-9')
+
+        assert self.cache.stats() == {
+            'size': 1,
+            'hits': 2,
+            'misses': 1,
+            'evictions': 0,
+            'hit_rate': 2.0 / 3,
+        }
+
+    def test_configure_resets_the_cache(self):
+        self.cache.set('g-cloud-8', 'live')
+        self.cache.get('g-cloud-8')
+
+        self.cache.configure(ttl=10, max_size=5)
+
+        assert len(self.cache) == 0
+        assert self.cache.stats()['hits'] == 0
+        assert self.cache.ttl == 10
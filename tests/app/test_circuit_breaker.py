@@ -0,0 +1,170 @@
+import threading
+
+import pytest
+
+from app.circuit_breaker import Bulkhead, CircuitBreaker, ServiceUnavailable
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CallFailed(Exception):
+    pass
+
+
+def call(breaker, fails=False):
+    with breaker.guard():
+        if fails:
+            raise CallFailed()
+
+
+def failed_call(breaker):
+    with pytest.raises(CallFailed):
+        call(breaker, fails=True)
+
+
+class TestCircuitBreaker(object):
+    def setup_method(self, method):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            'frameworks', window=4, minimum_calls=4, failure_rate=0.5, reset_timeout=30, clock=self.clock
+        )
+
+    def open_breaker(self):
+        for _ in range(4):
+            failed_call(self.breaker)
+        assert self.breaker.state == 'open'
+
+    def test_breaker_opens_once_enough_of_the_recent_calls_have_failed(self):
+        call(self.breaker)
+        failed_call(self.breaker)
+        call(self.breaker)
+        assert self.breaker.state == 'closed'
+
+        failed_call(self.breaker)
+
+        assert self.breaker.state == 'open'
+        assert self.breaker.stats()['opened'] == 1
+
+    def test_breaker_stays_closed_until_the_minimum_number_of_calls(self):
+        failed_call(self.breaker)
+        failed_call(self.breaker)
+        failed_call(self.breaker)
+
+        assert self.breaker.state == 'closed'
+
+    def test_only_the_outcomes_of_the_last_calls_count(self):
+        failed_call(self.breaker)
+        for _ in range(4):
+            call(self.breaker)
+        failed_call(self.breaker)
+
+        assert self.breaker.state == 'closed'
+        assert self.breaker.stats()['recent_failures'] == 1
+
+    def test_calls_fail_straight_away_while_the_breaker_is_open(self):
+        self.open_breaker()
+        self.clock.now += 29
+
+        with pytest.raises(ServiceUnavailable) as e:
+            call(self.breaker)
+
+        assert e.value.status_code == 503
+        assert self.breaker.stats()['rejected'] == 1
+
+    def test_a_successful_probe_closes_the_breaker(self):
+        self.open_breaker()
+        self.clock.now += 30
+
+        call(self.breaker)
+
+        assert self.breaker.state == 'closed'
+        call(self.breaker)
+
+    def test_a_failed_probe_opens_the_breaker_again(self):
+        self.open_breaker()
+        self.clock.now += 30
+
+        failed_call(self.breaker)
+
+        assert self.breaker.state == 'open'
+        with pytest.raises(ServiceUnavailable):
+            call(self.breaker)
+
+    def test_only_one_probe_is_made_at_a_time(self):
+        self.open_breaker()
+        self.clock.now += 30
+
+        with self.breaker.guard():
+            assert self.breaker.state == 'half_open'
+            with pytest.raises(ServiceUnavailable):
+                call(self.breaker)
+
+        assert self.breaker.state == 'closed'
+
+    def test_exceptions_that_arent_failures_count_as_successes(self):
+        breaker = CircuitBreaker('frameworks', window=1, is_failure=lambda e: not isinstance(e, CallFailed))
+
+        failed_call(breaker)
+
+        assert breaker.state == 'closed'
+
+    def test_breaker_never_opens_without_a_window(self):
+        breaker = CircuitBreaker('frameworks', window=0)
+
+        for _ in range(10):
+            failed_call(breaker)
+
+        assert breaker.state == 'closed'
+
+
+class TestBulkhead(object):
+    def test_calls_over_the_limit_fail_straight_away(self):
+        bulkhead = Bulkhead('frameworks', limit=1)
+
+        with bulkhead:
+            with pytest.raises(ServiceUnavailable):
+                with bulkhead:
+                    pass
+
+        with bulkhead:
+            pass
+        assert bulkhead.stats() == {'in_use': 0, 'waited': 0, 'rejected': 1, 'limit': 1}
+
+    def test_calls_over_the_limit_wait_for_a_call_to_finish(self):
+        bulkhead = Bulkhead('frameworks', limit=1, timeout=5)
+        entered = threading.Event()
+
+        def call():
+            with bulkhead:
+                entered.set()
+
+        with bulkhead:
+            thread = threading.Thread(target=call)
+            thread.start()
+            assert not entered.wait(0.05)
+        thread.join(5)
+
+        assert entered.is_set()
+        assert bulkhead.stats() == {'in_use': 0, 'waited': 1, 'rejected': 0, 'limit': 1}
+
+    def test_calls_that_wait_too_long_fail(self):
+        bulkhead = Bulkhead('frameworks', limit=1, timeout=0.01)
+
+        with bulkhead:
+            with pytest.raises(ServiceUnavailable):
+                with bulkhead:
+                    pass
+
+        assert bulkhead.stats() == {'in_use': 0, 'waited': 1, 'rejected': 1, 'limit': 1}
+
+    def test_calls_are_not_limited_without_a_limit(self):
+        bulkhead = Bulkhead('frameworks', limit=0)
+
+        with bulkhead, bulkhead, bulkhead:
+            assert bulkhead.stats()['in_use'] == 3
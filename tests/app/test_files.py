@@ -0,0 +1,41 @@
+import os
+import stat
+
+import mock
+import pytest
+
+from app.files import make_private_directory
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+class TestMakePrivateDirectory(object):
+    def test_directories_are_created_for_the_apps_user_only(self, tmpdir):
+        directory = str(tmpdir.join('var', 'outbox'))
+
+        make_private_directory(directory)
+
+        assert mode(directory) == stat.S_IRWXU
+
+    def test_existing_directories_are_made_private(self, tmpdir):
+        directory = tmpdir.mkdir('outbox')
+        directory.chmod(0o777)
+
+        make_private_directory(str(directory))
+
+        assert mode(str(directory)) == stat.S_IRWXU
+
+    def test_directories_belonging_to_another_user_are_refused(self, tmpdir):
+        directory = str(tmpdir.mkdir('outbox'))
+
+        with mock.patch('os.getuid', return_value=os.getuid() + 1), pytest.raises(RuntimeError):
+            make_private_directory(directory)
+
+    def test_links_to_other_directories_are_refused(self, tmpdir):
+        directory = str(tmpdir.join('outbox'))
+        os.symlink(str(tmpdir.mkdir('elsewhere')), directory)
+
+        with pytest.raises(RuntimeError):
+            make_private_directory(directory)
@@ -0,0 +1,200 @@
+import json
+import os
+import time
+
+import mock
+import pytest
+from flask import Flask
+from dmutils.email import MandrillException
+
+from app.outbox import EmailOutbox
+
+
+MESSAGE = dict(
+    to_email_addresses=['supplier@example.com'],
+    email_body='<p>Hello</p>',
+    subject='Your clarification question',
+    from_email='do-not-reply@example.com',
+    from_name='Digital Marketplace Admin',
+    tags=['clarification-question'],
+)
+EMAIL_ARGS = dict(MESSAGE, api_key='MANDRILL')
+
+
+@pytest.fixture
+def app(tmpdir):
+    app = Flask(__name__)
+    app.config.update(
+        DM_EMAIL_OUTBOX_DIR=str(tmpdir.join('outbox')),
+        # senders aren't started, so the tests can send pending emails themselves
+        DM_EMAIL_OUTBOX_SENDERS=0,
+        DM_EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+        DM_EMAIL_OUTBOX_RETRY_DELAY=0,
+        DM_EMAIL_TRANSPORT='file',
+        DM_EMAIL_FILE_TRANSPORT_DIR=str(tmpdir.join('sent')),
+        DM_MANDRILL_API_KEY='MANDRILL',
+    )
+    return app
+
+
+def sent_emails(app):
+    directory = app.config['DM_EMAIL_FILE_TRANSPORT_DIR']
+    if not os.path.exists(directory):
+        return []
+    emails = []
+    for filename in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, filename)) as f:
+            emails.append(json.load(f))
+    return emails
+
+
+class TestEmailOutbox(object):
+    def test_emails_are_queued_and_sent_later(self, app):
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with app.app_context():
+            outbox.send_email(reply_to='buyer@example.com', **EMAIL_ARGS)
+            assert sent_emails(app) == []
+            assert outbox.stats()['pending'] == 1
+
+            assert outbox.send_pending() == 1
+
+        assert sent_emails(app) == [dict(MESSAGE, reply_to='buyer@example.com')]
+        assert outbox.stats()['pending'] == 0
+        assert outbox.stats()['queued'] == outbox.stats()['sent'] == 1
+
+    def test_emails_are_sent_during_the_request_without_an_outbox_directory(self, app):
+        app.config['DM_EMAIL_OUTBOX_DIR'] = None
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with app.app_context():
+            outbox.send_email(**EMAIL_ARGS)
+
+        assert sent_emails(app) == [MESSAGE]
+
+    def test_errors_are_raised_without_an_outbox_directory(self, app):
+        app.config.update(DM_EMAIL_OUTBOX_DIR=None, DM_EMAIL_TRANSPORT='mandrill')
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with mock.patch('app.outbox.email.send_email', side_effect=MandrillException('Failed')):
+            with app.app_context(), pytest.raises(MandrillException):
+                outbox.send_email(**EMAIL_ARGS)
+
+    def test_failed_emails_are_retried(self, app):
+        app.config['DM_EMAIL_TRANSPORT'] = 'mandrill'
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with mock.patch('app.outbox.email.send_email', side_effect=[MandrillException('Failed'), None]) as send_email:
+            with app.app_context():
+                outbox.send_email(**EMAIL_ARGS)
+                assert outbox.send_pending() == 2
+
+        assert send_email.call_args_list == [mock.call(**EMAIL_ARGS)] * 2
+        assert outbox.stats()['retried'] == outbox.stats()['sent'] == 1
+
+    def test_emails_are_not_retried_until_they_are_due(self, app):
+        app.config.update(DM_EMAIL_TRANSPORT='mandrill', DM_EMAIL_OUTBOX_RETRY_DELAY=60)
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with mock.patch('app.outbox.email.send_email', side_effect=MandrillException('Failed')) as send_email:
+            with app.app_context():
+                outbox.send_email(**EMAIL_ARGS)
+                assert outbox.send_pending() == 1
+
+        assert send_email.call_count == 1
+        assert outbox.stats()['pending'] == 1
+
+    def test_emails_are_moved_to_failed_after_the_last_attempt(self, app):
+        app.config['DM_EMAIL_TRANSPORT'] = 'mandrill'
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with mock.patch('app.outbox.email.send_email', side_effect=MandrillException('Failed')) as send_email:
+            with app.app_context():
+                outbox.send_email(**EMAIL_ARGS)
+                outbox.send_pending()
+
+        assert send_email.call_count == 2
+        stats = outbox.stats()
+        assert stats['pending'] == 0
+        assert stats['failed'] == stats['failed_total'] == 1
+
+        failed_folder = os.path.join(app.config['DM_EMAIL_OUTBOX_DIR'], 'failed')
+        with open(os.path.join(failed_folder, os.listdir(failed_folder)[0])) as f:
+            assert json.load(f) == {'message': MESSAGE, 'attempts': 2, 'last_error': 'Failed'}
+
+    def test_emails_queued_by_another_worker_are_sent(self, app):
+        first = EmailOutbox()
+        first.init_app(app)
+        second = EmailOutbox()
+        second.init_app(app)
+
+        with app.app_context():
+            first.send_email(**EMAIL_ARGS)
+            assert second.send_pending() == 1
+            assert first.send_pending() == 0
+
+        assert sent_emails(app) == [MESSAGE]
+
+    def test_abandoned_emails_are_sent_again(self, app):
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+        outbox.abandoned_after = -1
+
+        with app.app_context():
+            outbox.send_email(**EMAIL_ARGS)
+            outbox._claim_next()  # claimed by a worker that stopped before sending it
+            assert outbox.send_pending() == 0
+
+            outbox._recover_abandoned()
+            assert outbox.send_pending() == 1
+
+        assert sent_emails(app) == [MESSAGE]
+
+    def test_the_api_key_is_not_written_to_the_outbox(self, app):
+        app.config.update(DM_EMAIL_TRANSPORT='mandrill', DM_MANDRILL_API_KEY='CONFIGURED')
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with mock.patch('app.outbox.email.send_email') as send_email:
+            with app.app_context():
+                outbox.send_email(**dict(EMAIL_ARGS, api_key='PASSED'))
+                pending_folder = os.path.join(app.config['DM_EMAIL_OUTBOX_DIR'], 'pending')
+                with open(os.path.join(pending_folder, os.listdir(pending_folder)[0])) as f:
+                    assert 'PASSED' not in f.read()
+
+                outbox.send_pending()
+
+        send_email.assert_called_once_with(api_key='CONFIGURED', **MESSAGE)
+
+    def test_emails_that_were_pending_for_a_long_time_are_not_abandoned_when_claimed(self, app):
+        outbox = EmailOutbox()
+        outbox.init_app(app)
+
+        with app.app_context():
+            outbox.send_email(**EMAIL_ARGS)
+            pending_folder = os.path.join(app.config['DM_EMAIL_OUTBOX_DIR'], 'pending')
+            pending_path = os.path.join(pending_folder, os.listdir(pending_folder)[0])
+            queued_at = time.time() - outbox.abandoned_after - 60
+            os.utime(pending_path, (queued_at, queued_at))
+
+            sending_path = outbox._claim_next()
+            outbox._recover_abandoned()
+
+        assert os.path.exists(sending_path)
+        assert os.listdir(pending_folder) == []
+
+    def test_senders_are_started_when_the_outbox_is_set_up(self, app):
+        app.config['DM_EMAIL_OUTBOX_SENDERS'] = 2
+        outbox = EmailOutbox()
+
+        with mock.patch('app.outbox.threading.Thread') as Thread:
+            outbox.init_app(app)
+
+        assert Thread.call_count == 2
+        assert Thread.return_value.start.call_count == 2
@@ -0,0 +1,155 @@
+import json
+from datetime import timedelta
+
+import mock
+import pytest
+from flask import Flask, request, session
+from werkzeug.http import parse_cookie
+
+from app import sessions
+from app.sessions import MemorySessionStore, SQLiteSessionStore, ServerSideSessionInterface
+
+
+def create_session_app(store):
+    app = Flask(__name__)
+    app.secret_key = 'verySecretKey'
+    app.permanent_session_lifetime = timedelta(hours=4)
+    app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route('/session', methods=['GET', 'POST', 'DELETE'])
+    def session_view():
+        if request.method == 'POST':
+            session.update(request.form.to_dict())
+        elif request.method == 'DELETE':
+            session.clear()
+        return json.dumps(dict(session))
+
+    return app
+
+
+def session_cookie(response):
+    for cookie in response.headers.getlist('Set-Cookie'):
+        cookie = parse_cookie(cookie)
+        if 'session' in cookie:
+            return cookie['session']
+
+
+def open_session(app, cookie):
+    with app.test_request_context(headers={'Cookie': 'session={}'.format(cookie)}):
+        return app.session_interface.open_session(app, request)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmpdir):
+    if request.param == 'memory':
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmpdir.join('sessions.db')))
+
+
+class TestServerSideSessionInterface(object):
+    def test_sessions_are_kept_between_requests(self, store):
+        client = create_session_app(store).test_client()
+
+        client.post('/session', data={'user_id': '123'})
+
+        assert json.loads(client.get('/session').get_data(as_text=True)) == {'user_id': '123'}
+        assert len(store) == 1
+
+    def test_the_cookie_only_holds_a_signed_session_id(self, store):
+        client = create_session_app(store).test_client()
+
+        cookie = session_cookie(client.post('/session', data={'user_id': '123'}))
+
+        assert '123' not in cookie
+        assert store.load(cookie.rsplit('.', 1)[0]) is not None
+
+    def test_unchanged_sessions_are_not_saved_again(self, store):
+        client = create_session_app(store).test_client()
+        client.post('/session', data={'user_id': '123'})
+
+        with mock.patch.object(store, 'save') as save:
+            res = client.get('/session')
+
+        assert session_cookie(res) is None
+        assert not save.called
+
+    def test_a_tampered_session_id_starts_a_new_session(self, store):
+        app = create_session_app(store)
+        cookie = session_cookie(app.test_client().post('/session', data={'user_id': '123'}))
+        session_id, signature = cookie.rsplit('.', 1)
+
+        assert open_session(app, cookie) == {'user_id': '123'}
+        assert open_session(app, '{}.{}x'.format(session_id, signature)) == {}
+
+    def test_expired_sessions_are_not_loaded(self, store):
+        app = create_session_app(store)
+        client = app.test_client()
+        app.permanent_session_lifetime = timedelta(seconds=-1)
+        client.post('/session', data={'user_id': '123'})
+        app.permanent_session_lifetime = timedelta(hours=4)
+
+        assert json.loads(client.get('/session').get_data(as_text=True)) == {}
+
+    def test_a_new_session_id_is_used_when_the_user_logs_in_or_out(self, store):
+        client = create_session_app(store).test_client()
+        anonymous_cookie = session_cookie(client.post('/session', data={'next': '/suppliers'}))
+
+        logged_in_cookie = session_cookie(client.post('/session', data={'user_id': '123'}))
+        logged_out_cookie = session_cookie(client.post('/session', data={'user_id': ''}))
+
+        session_ids = [cookie.rsplit('.', 1)[0] for cookie in (anonymous_cookie, logged_in_cookie, logged_out_cookie)]
+        assert len(set(session_ids)) == 3
+        assert store.load(session_ids[0]) is None
+        assert store.load(session_ids[1]) is None
+        assert len(store) == 1
+
+    def test_the_session_id_is_kept_while_the_user_stays_the_same(self, store):
+        client = create_session_app(store).test_client()
+        cookie = session_cookie(client.post('/session', data={'user_id': '123'}))
+
+        assert session_cookie(client.post('/session', data={'next': '/suppliers'})) == cookie
+
+    def test_emptied_sessions_are_removed_from_the_store(self, store):
+        client = create_session_app(store).test_client()
+        client.post('/session', data={'user_id': '123'})
+
+        res = client.delete('/session')
+
+        assert len(store) == 0
+        assert session_cookie(res) == ''
+
+
+class TestSQLiteSessionStore(object):
+    def test_sessions_are_shared_between_workers(self, tmpdir):
+        path = str(tmpdir.join('sessions.db'))
+        first_worker = create_session_app(SQLiteSessionStore(path))
+        second_worker = create_session_app(SQLiteSessionStore(path))
+
+        cookie = session_cookie(first_worker.test_client().post('/session', data={'user_id': '123'}))
+        assert open_session(second_worker, cookie) == {'user_id': '123'}
+
+
+class TestInitApp(object):
+    def test_sessions_are_kept_in_cookies_by_default(self):
+        app = Flask(__name__)
+        app.config.update(DM_SESSION_STORE=None)
+
+        sessions.init_app(app)
+
+        assert isinstance(app.session_interface, sessions.ChangedSessionInterface)
+
+    def test_the_sqlite_store_is_created_at_the_configured_path(self, tmpdir):
+        app = Flask(__name__)
+        app.config.update(DM_SESSION_STORE='sqlite', DM_SESSION_STORE_PATH=str(tmpdir.join('db', 'sessions.db')))
+
+        sessions.init_app(app)
+
+        assert isinstance(app.session_interface.store, SQLiteSessionStore)
+        assert tmpdir.join('db', 'sessions.db').check()
+
+    def test_unknown_stores_are_rejected(self):
+        app = Flask(__name__)
+        app.config.update(DM_SESSION_STORE='redis')
+
+        with pytest.raises(ValueError):
+            sessions.init_app(app)
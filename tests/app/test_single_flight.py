@@ -0,0 +1,114 @@
+import copy
+import threading
+import time
+
+from app.single_flight import SingleFlight
+
+
+class BlockedCall(object):
+    """A call that doesn't return until it's released, so other threads can join it."""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def call_in_threads(flights, key, call, count):
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = flights.do(key, call)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(5)
+
+
+class TestSingleFlight(object):
+    def test_concurrent_calls_with_the_same_key_share_one_call(self):
+        flights = SingleFlight(share=copy.deepcopy)
+        call = BlockedCall(result={'frameworks': {'slug': 'g-cloud-8'}})
+
+        threads, results = call_in_threads(flights, 'g-cloud-8', call, 5)
+        wait_for(lambda: flights.stats()['coalesced'] == 4)
+        call.release.set()
+        join(threads)
+
+        assert call.calls == 1
+        assert results == [{'frameworks': {'slug': 'g-cloud-8'}}] * 5
+        # each thread gets its own copy, apart from the one that made the call
+        assert len(set(id(result) for result in results)) == 5
+        assert flights.stats() == {'calls': 1, 'coalesced': 4, 'in_flight': 0}
+
+    def test_calls_with_different_keys_are_not_shared(self):
+        flights = SingleFlight()
+        call = BlockedCall()
+
+        first_threads, _ = call_in_threads(flights, 'g-cloud-8', call, 1)
+        second_threads, _ = call_in_threads(flights, 'g-cloud-9', call, 1)
+        wait_for(lambda: flights.stats()['in_flight'] == 2)
+        call.release.set()
+        join(first_threads + second_threads)
+
+        assert call.calls == 2
+
+    def test_exceptions_are_raised_in_every_waiting_thread(self):
+        flights = SingleFlight()
+        error = ValueError("API unavailable")
+        call = BlockedCall(error=error)
+
+        threads, results = call_in_threads(flights, 'g-cloud-8', call, 3)
+        wait_for(lambda: flights.stats()['coalesced'] == 2)
+        call.release.set()
+        join(threads)
+
+        assert results == [error] * 3
+
+    def test_calls_after_a_call_has_finished_are_made_again(self):
+        flights = SingleFlight()
+        calls = []
+
+        flights.do('g-cloud-8', lambda: calls.append(1))
+        flights.do('g-cloud-8', lambda: calls.append(2))
+
+        assert calls == [1, 2]
+        assert flights.stats()['coalesced'] == 0
+
+    def test_calls_started_after_forget_all_dont_wait_for_earlier_calls(self):
+        flights = SingleFlight()
+        call = BlockedCall(result='before')
+
+        threads, results = call_in_threads(flights, 'g-cloud-8', call, 1)
+        wait_for(lambda: flights.stats()['in_flight'] == 1)
+        flights.forget_all()
+
+        assert flights.do('g-cloud-8', lambda: 'after') == 'after'
+        call.release.set()
+        join(threads)
+        assert results == ['before']
+        assert flights.stats() == {'calls': 2, 'coalesced': 0, 'in_flight': 0}
@@ -0,0 +1,65 @@
+import os
+import stat
+
+import jinja2
+import mock
+import pytest
+
+from app.templating import SharedFileSystemBytecodeCache, ProfilingLoader, TemplateProfile
+
+
+@pytest.fixture
+def template_folder(tmpdir):
+    folder = tmpdir.mkdir('templates')
+    folder.mkdir('macros').join('submission.html').write('{% macro answer(value) %}<b>{{ value }}</b>{% endmacro %}')
+    folder.join('partial.html').write('{{ name }}')
+    folder.join('page.html').write(
+        '{% import "macros/submission.html" as submission %}'
+        '{{ submission.answer(1) }}{{ submission.answer(2) }}{% include "partial.html" %}'
+    )
+    return str(folder)
+
+
+class TestSharedFileSystemBytecodeCache(object):
+    def test_compiled_templates_are_shared_through_the_cache_directory(self, tmpdir, template_folder):
+        cache_dir = str(tmpdir.join('cache'))
+        first = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(template_folder), bytecode_cache=SharedFileSystemBytecodeCache(cache_dir)
+        )
+        first.get_template('partial.html')
+
+        second = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(template_folder), bytecode_cache=SharedFileSystemBytecodeCache(cache_dir)
+        )
+
+        assert len(os.listdir(cache_dir)) == 1
+        assert second.get_template('partial.html').render(name='Supplier') == 'Supplier'
+        assert len(os.listdir(cache_dir)) == 1
+
+    def test_the_cache_directory_is_only_accessible_by_its_owner(self, tmpdir):
+        cache_dir = tmpdir.mkdir('cache')
+        cache_dir.chmod(0o777)
+
+        SharedFileSystemBytecodeCache(str(cache_dir))
+
+        assert stat.S_IMODE(os.stat(str(cache_dir)).st_mode) == stat.S_IRWXU
+
+    def test_directories_belonging_to_another_user_are_refused(self, tmpdir):
+        cache_dir = str(tmpdir.mkdir('cache'))
+
+        with mock.patch('os.getuid', return_value=os.getuid() + 1), pytest.raises(RuntimeError):
+            SharedFileSystemBytecodeCache(cache_dir)
+
+
+class TestProfilingLoader(object):
+    def test_templates_partials_and_macros_are_profiled(self, template_folder):
+        profile = TemplateProfile()
+        env = jinja2.Environment(loader=ProfilingLoader(jinja2.FileSystemLoader(template_folder), profile))
+
+        assert env.get_template('page.html').render(name='Supplier') == '<b>1</b><b>2</b>Supplier'
+
+        stats = profile.stats()
+        assert stats['page.html']['count'] == 1
+        assert stats['partial.html']['count'] == 1
+        assert stats['macros/submission.html:answer']['count'] == 2
+        assert stats['page.html']['total'] >= stats['partial.html']['total']
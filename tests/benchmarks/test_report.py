@@ -0,0 +1,30 @@
+from benchmarks.report import build_report, find_regressions, flatten_timings
+
+
+def test_flatten_timings():
+    assert flatten_timings({'create_app': {'first': 1.0, 'median': 0.5}, 'import_app': 2.0}) == {
+        'create_app.first': 1.0,
+        'create_app.median': 0.5,
+        'import_app': 2.0,
+    }
+
+
+def test_find_regressions_flags_timings_slower_than_the_tolerance():
+    baseline = build_report('startup', {'create_app': {'median': 1.0}, 'import_app': 1.0})
+    report = build_report('startup', {'create_app': {'median': 1.2}, 'import_app': 1.3})
+
+    assert find_regressions(report, baseline, tolerance=0.25, min_slowdown=0.005) == [('import_app', 1.0, 1.3)]
+
+
+def test_find_regressions_ignores_small_slowdowns():
+    baseline = build_report('startup', {'template_loader': 0.001})
+    report = build_report('startup', {'template_loader': 0.004})
+
+    assert find_regressions(report, baseline, tolerance=0.25, min_slowdown=0.005) == []
+
+
+def test_find_regressions_ignores_timings_missing_from_the_baseline():
+    baseline = build_report('startup', {})
+    report = build_report('startup', {'content': {'g-cloud-9': {'edit_submission': 10.0}}})
+
+    assert find_regressions(report, baseline, tolerance=0.25, min_slowdown=0.005) == []